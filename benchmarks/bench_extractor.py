@@ -0,0 +1,217 @@
+"""
+End-to-end extractor throughput: fetch_all -> normalize_rows -> write_landing against the mock WMS API.
+
+    python -m benchmarks.bench_extractor --sizes 10000,100000 --lines-per-order 2 --out bench.json
+
+By default the mock runs in-process on a free localhost port and is reseeded for every size, so
+peak RSS includes the mock's own data; pass --base-url to measure against an external mock instead.
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from services.extractor.app import extract
+from services.extractor.app.http_client import build_session
+from services.extractor.app.normalize import NORMALIZE_ENGINES, normalize_rows
+from services.extractor.app.writer_landing import write_landing
+
+logger = logging.getLogger(__name__)
+
+ENTITY_KEY = {"ib_receipts": "ib", "ob_orders": "ob"}
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_mock() -> tuple[str, Any]:
+    import uvicorn
+    from services.mock_wms_api.app import main as mock
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(mock.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="mock-wms-api", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def run_once(
+    base_url: str,
+    entity: str,
+    limit: int,
+    max_workers: int,
+    pagination: str,
+    output_format: str,
+    landing_root: Path,
+    normalize_engine: str = "pandas",
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    real_get_json = extract.get_json
+
+    def timed_get_json(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return real_get_json(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    session = build_session(pool_maxsize=max_workers)
+    run_id = f"bench-{time.time_ns()}"
+    now = datetime.now(timezone.utc)
+
+    extract.get_json = timed_get_json
+    try:
+        t0 = time.perf_counter()
+        rows = extract.fetch_all(
+            session=session,
+            base_url=base_url,
+            entity=entity,
+            updated_after=datetime(1970, 1, 1, tzinfo=timezone.utc),
+            limit=limit,
+            request_timeout_seconds=60,
+            max_workers=max_workers,
+            pagination=pagination,
+        )
+    finally:
+        extract.get_json = real_get_json
+
+    t1 = time.perf_counter()
+    df = normalize_rows(
+        rows=rows, entity=entity, run_id=run_id, extracted_at=now, watermark_effective=now, engine=normalize_engine
+    )
+    t2 = time.perf_counter()
+    write_landing(df=df, landing_root=landing_root, entity=entity, run_id=run_id, output_format=output_format)
+    t3 = time.perf_counter()
+
+    total_s = t3 - t0
+    return {
+        "rows": len(rows),
+        "pages": len(latencies),
+        "seconds": round(total_s, 4),
+        "rows_per_sec": round(len(rows) / total_s, 1) if total_s else None,
+        "stage_seconds": {
+            "fetch": round(t1 - t0, 4),
+            "normalize": round(t2 - t1, 4),
+            "write": round(t3 - t2, 4),
+        },
+        "page_latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p99": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        },
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", default="10000,100000", help="comma separated seed sizes, e.g. 10000,100000,1000000")
+    p.add_argument("--lines-per-order", type=int, default=2, dest="lines_per_order")
+    p.add_argument("--entity", default="ob_orders", choices=sorted(ENTITY_KEY))
+    p.add_argument("--limit", type=int, default=500)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--pagination", default="offset", choices=extract.PAGINATION_MODES)
+    p.add_argument("--format", default="parquet", choices=["parquet", "csv", "arrow"], dest="output_format")
+    p.add_argument("--normalize-engine", default="arrow", choices=NORMALIZE_ENGINES, dest="normalize_engine")
+    p.add_argument("--base-url", default=None, dest="base_url", help="use a running mock instead of an in-process one")
+    p.add_argument("--out", default=None, help="write JSON results here instead of stdout")
+    return p.parse_args(args)
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    args = parse_args(args)
+
+    results = []
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        from services.mock_wms_api.app import main as mock
+        base_url, server = _start_mock()
+
+    try:
+        sizes = [int(x) for x in args.sizes.split(",") if x.strip()] if args.base_url is None else [None]
+        for size in sizes:
+            if size is not None:
+                seed_started = time.perf_counter()
+                n = {"ib": 0, "ob": 0}
+                n[ENTITY_KEY[args.entity]] = size
+                mock.reset_data(n["ib"], n["ob"], args.lines_per_order)
+                logger.warning("seeded %s %s rows in %.1fs", size, args.entity, time.perf_counter() - seed_started)
+
+            rss_before = _rss_mb()
+            with tempfile.TemporaryDirectory(prefix="bench-landing-") as tmp:
+                res = run_once(
+                    base_url=base_url,
+                    entity=args.entity,
+                    limit=args.limit,
+                    max_workers=args.workers,
+                    pagination=args.pagination,
+                    output_format=args.output_format,
+                    landing_root=Path(tmp),
+                    normalize_engine=args.normalize_engine,
+                )
+            res["size"] = size
+            res["rss_before_mb"] = round(rss_before, 1)
+            results.append(res)
+            logger.warning("size=%s rows/sec=%s p50=%sms p99=%sms", size, res["rows_per_sec"],
+                           res["page_latency_ms"]["p50"], res["page_latency_ms"]["p99"])
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    report = {
+        "benchmark": "extractor_throughput",
+        "commit": _git_commit(),
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,9 @@
 import os
+import importlib.util
 import logging
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +20,27 @@ class Config:
     request_timeout_seconds: int
     default_start_time: str
     landing_root: Path
+    fetch_concurrency: int
+    pagination_mode: str
+    landing_part_rows: int
+    entity_parallelism: str
+    adaptive_page_size: bool
+    limit_min: int
+    limit_max: int
+    page_target_latency_ms: int
+    rate_limit_per_second: float
+    rate_limit_burst: int
+    circuit_failure_threshold: int
+    circuit_reset_seconds: int
+    normalize_engine: str
+    landing_lines_mode: str
+    landing_lines_explode: bool
+    change_cache: bool
+    arrow_compression: str
+    extract_checkpoint: bool
+    payload_hash: str
+    payload_hash_legacy: Optional[str]
+    staging_load_mode: str
     
     
 def _env_int(name: str, default: int) -> int:
@@ -27,6 +50,23 @@ def _env_int(name: str, default: int) -> int:
     except ValueError as e:
         raise RuntimeError(f" ENV var {name} must be int, got {raw}") from e
     
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, str(default))
+    try:
+        return float(raw)
+    except ValueError as e:
+        raise RuntimeError(f" ENV var {name} must be float, got {raw}") from e
+    
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    if raw.lower().strip() in ("1", "true", "yes", "on"):
+        return True
+    if raw.lower().strip() in ("0", "false", "no", "off", ""):
+        return False
+    raise RuntimeError(f" ENV var {name} must be bool, got {raw}")
+    
 def load_config() -> Config:
     wms_base_url = os.getenv("WMS_BASE_URL","http://localhost:8000").rstrip("/")
     
@@ -36,14 +76,90 @@ def load_config() -> Config:
         
     pipeline_name = os.getenv("PIPELINE_NAME","wms_dw")
     limit = _env_int("LIMIT", 500)
+    adaptive_page_size = _env_bool("ADAPTIVE_PAGE_SIZE", False)
+    limit_min = _env_int("LIMIT_MIN", 50)
+    limit_max = _env_int("LIMIT_MAX", 5000)
+    page_target_latency_ms = _env_int("PAGE_TARGET_LATENCY_MS", 1000)
     lookback_seconds = _env_int("LOOKBACK_SECONDS", 120)
     output_format = os.getenv("OUTPUT_FORMAT", "parquet").lower().strip()
     
-    if output_format not in ("csv", "parquet"):
+    if output_format not in ("csv", "parquet", "arrow"):
         output_format = "parquet"
         logger.warning(f"Output_format is error, auto using parquet")
     
     request_timeout_seconds = _env_int("REQUEST_TIMEOUT_SECONDS", 20)
+    rate_limit_per_second = _env_float("RATE_LIMIT_PER_SECOND", 0.0)
+    rate_limit_burst = _env_int("RATE_LIMIT_BURST", 1)
+    circuit_failure_threshold = _env_int("CIRCUIT_FAILURE_THRESHOLD", 0)
+    circuit_reset_seconds = _env_int("CIRCUIT_RESET_SECONDS", 30)
+    fetch_concurrency = max(_env_int("FETCH_CONCURRENCY", 1), 1)
+    pagination_mode = os.getenv("PAGINATION_MODE", "offset").lower().strip()
+    
+    if pagination_mode not in ("offset", "cursor"):
+        pagination_mode = "offset"
+        logger.warning(f"Pagination_mode is error, auto using offset")
+    
+    landing_part_rows = max(_env_int("LANDING_PART_ROWS", 0), 0)
+    entity_parallelism = os.getenv("ENTITY_PARALLELISM", "none").lower().strip()
+    
+    if entity_parallelism not in ("none", "threads", "processes"):
+        entity_parallelism = "none"
+        logger.warning(f"Entity_parallelism is error, auto using none")
+    
+    normalize_engine = os.getenv("NORMALIZE_ENGINE", "pandas").lower().strip()
+    
+    if normalize_engine not in ("pandas", "arrow"):
+        normalize_engine = "pandas"
+        logger.warning(f"Normalize_engine is error, auto using pandas")
+    
+    landing_lines_mode = os.getenv("LANDING_LINES_MODE", "json").lower().strip()
+    
+    if landing_lines_mode not in ("json", "nested"):
+        landing_lines_mode = "json"
+        logger.warning(f"Landing_lines_mode is error, auto using json")
+    
+    if landing_lines_mode == "nested" and output_format == "csv":
+        landing_lines_mode = "json"
+        logger.warning(f"Landing_lines_mode nested needs parquet or arrow, auto using json")
+    
+    landing_lines_explode = _env_bool("LANDING_LINES_EXPLODE", False)
+    
+    if landing_lines_explode and landing_lines_mode != "nested":
+        landing_lines_explode = False
+        logger.warning(f"Landing_lines_explode needs LANDING_LINES_MODE=nested, auto disabled")
+    
+    change_cache = _env_bool("CHANGE_CACHE", False)
+    
+    arrow_compression = os.getenv("ARROW_COMPRESSION", "uncompressed").lower().strip()
+    
+    if arrow_compression not in ("uncompressed", "lz4", "zstd"):
+        arrow_compression = "uncompressed"
+        logger.warning(f"Arrow_compression is error, auto using uncompressed")
+    
+    extract_checkpoint = _env_bool("EXTRACT_CHECKPOINT", False)
+    
+    payload_hash = os.getenv("PAYLOAD_HASH", "sha256").lower().strip()
+    
+    if payload_hash not in ("sha256", "blake2b128", "xxh128"):
+        payload_hash = "sha256"
+        logger.warning(f"Payload_hash is error, auto using sha256")
+    
+    # algorithm of the digests already stored, checked as well until every re-stageable run uses the new one
+    payload_hash_legacy = os.getenv("PAYLOAD_HASH_LEGACY", "").lower().strip() or None
+    
+    if payload_hash_legacy not in (None, "sha256", "blake2b128", "xxh128"):
+        payload_hash_legacy = None
+        logger.warning(f"Payload_hash_legacy is error, auto disabled")
+    
+    # fail at startup, not partway through a staging run
+    if "xxh128" in (payload_hash, payload_hash_legacy) and importlib.util.find_spec("xxhash") is None:
+        raise RuntimeError("PAYLOAD_HASH=xxh128 needs the xxhash package")
+    
+    staging_load_mode = os.getenv("STAGING_LOAD_MODE", "insert").lower().strip()
+    
+    if staging_load_mode not in ("insert", "copy"):
+        staging_load_mode = "insert"
+        logger.warning(f"Staging_load_mode is error, auto using insert")
     
     default_start_time = os.getenv("DEFAULT_START_TIME", "1970-01-01T00:00:00Z")
     landing_root_env = os.getenv("LANDING_ROOT")
@@ -61,5 +177,26 @@ def load_config() -> Config:
         output_format = output_format,
         request_timeout_seconds = request_timeout_seconds,
         default_start_time= default_start_time,
-        landing_root= landing_root
+        landing_root= landing_root,
+        fetch_concurrency= fetch_concurrency,
+        pagination_mode= pagination_mode,
+        landing_part_rows= landing_part_rows,
+        entity_parallelism= entity_parallelism,
+        adaptive_page_size= adaptive_page_size,
+        limit_min= limit_min,
+        limit_max= limit_max,
+        page_target_latency_ms= page_target_latency_ms,
+        rate_limit_per_second= rate_limit_per_second,
+        rate_limit_burst= rate_limit_burst,
+        circuit_failure_threshold= circuit_failure_threshold,
+        circuit_reset_seconds= circuit_reset_seconds,
+        normalize_engine= normalize_engine,
+        landing_lines_mode= landing_lines_mode,
+        landing_lines_explode= landing_lines_explode,
+        change_cache= change_cache,
+        arrow_compression= arrow_compression,
+        extract_checkpoint= extract_checkpoint,
+        payload_hash= payload_hash,
+        payload_hash_legacy= payload_hash_legacy,
+        staging_load_mode= staging_load_mode
     )
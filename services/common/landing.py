@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+SUCCESS_MARKER = "_SUCCESS"
+
+COMPACTED_DIR = "_compacted"
+
+@dataclass(frozen=True)
+class ParquetLayout:
+    compression: str = "zstd"
+    compression_level: Optional[int] = 3
+    row_group_rows: int = 64_000
+    # rows are written in this order and the files declare it (sorting_columns), so readers can prune row groups
+    sort_by: tuple[str, ...] = ("updated_at", "id")
+    bloom_filter_columns: tuple[str, ...] = ("id",)
+    # unique per row, a dictionary page would only be built and thrown away
+    plain_columns: tuple[str, ...] = ("id", "lines_json")
+    write_page_index: bool = True
+
+_LINES_LAYOUT = ParquetLayout(
+    sort_by=("parent_updated_at", "parent_id", "line_no"),
+    bloom_filter_columns=("parent_id",),
+    plain_columns=("line_id",),
+)
+
+PARQUET_LAYOUT = {
+    "ib_receipts": ParquetLayout(),
+    "ob_orders": ParquetLayout(),
+    "ib_receipts_lines": _LINES_LAYOUT,
+    "ob_orders_lines": _LINES_LAYOUT,
+}
+
+def parquet_layout(dataset: str) -> ParquetLayout:
+    return PARQUET_LAYOUT.get(dataset, ParquetLayout())
+
+def run_dir(landing_root: Path, entity: str, run_id: str) -> Path:
+    return landing_root / entity / f"run_id={run_id}"
+
+def compacted_dir(landing_root: Path, entity: str, day: str) -> Path:
+    # day partitions (UTC date of updated_at) written by the compaction job, beside the per-run directories
+    return landing_root / COMPACTED_DIR / entity / f"date={day}"
+
+def lines_dataset(entity: str) -> str:
+    # sibling dataset holding one row per line item of `entity`
+    return f"{entity}_lines"
+
+def part_name(part_no: int, ext: str) -> str:
+    return f"part-{part_no:03d}.{ext}"
+
+def part_number(p: Path) -> int:
+    # part_name pads to at least 3 digits, so part-1001 is longer than part-999
+    return int(p.name.split(".", 1)[0].split("-", 1)[1])
+
+def is_part_file(p: Path) -> bool:
+    return p.name.startswith("part-") and ".tmp." not in p.name
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from services.common.landing import SUCCESS_MARKER
+
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+
+def _sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _iso(ts: Any) -> Optional[str]:
+    if ts is None or pd.isna(ts):
+        return None
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")).isoformat()
+
+def _fingerprint(fields: list[str]) -> str:
+    return hashlib.sha256("\n".join(fields).encode("utf-8")).hexdigest()[:16]
+
+def _parquet_stats(p: Path) -> dict[str, Any]:
+    # footer only: row count, schema and per-row-group min/max, no data pages are read
+    meta = pq.read_metadata(p)
+    schema = meta.schema.to_arrow_schema()
+    fields = [f"{f.name}:{f.type}" for f in schema]
+    lo = hi = None
+    if "updated_at" in schema.names:
+        idx = schema.get_field_index("updated_at")
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(idx).statistics
+            if stats is None or not stats.has_min_max:
+                continue
+            lo = stats.min if lo is None else min(lo, stats.min)
+            hi = stats.max if hi is None else max(hi, stats.max)
+    return {"rows": meta.num_rows, "min_updated_at": _iso(lo), "max_updated_at": _iso(hi), "fields": fields}
+
+def _arrow_stats(p: Path) -> dict[str, Any]:
+    # memory-mapped, an uncompressed file is scanned for min/max without copying it
+    with pa.memory_map(str(p)) as source:
+        table = pa.ipc.open_file(source).read_all()
+        fields = [f"{f.name}:{f.type}" for f in table.schema]
+        lo = hi = None
+        if "updated_at" in table.column_names and table.num_rows:
+            mm = pc.min_max(table["updated_at"])
+            lo, hi = mm["min"].as_py(), mm["max"].as_py()
+        return {"rows": table.num_rows, "min_updated_at": _iso(lo), "max_updated_at": _iso(hi), "fields": fields}
+
+def _csv_stats(p: Path) -> dict[str, Any]:
+    header = pd.read_csv(p, nrows=0)
+    fields = [f"{c}:csv" for c in header.columns]
+    if "updated_at" not in header.columns:
+        rows = len(pd.read_csv(p, usecols=[0])) if len(header.columns) else 0
+        return {"rows": rows, "min_updated_at": None, "max_updated_at": None, "fields": fields}
+    ts = pd.to_datetime(pd.read_csv(p, usecols=["updated_at"])["updated_at"], utc=True, errors="coerce")
+    return {"rows": len(ts), "min_updated_at": _iso(ts.min()), "max_updated_at": _iso(ts.max()), "fields": fields}
+
+def file_stats(p: Path) -> dict[str, Any]:
+    try:
+        if p.suffix == ".parquet":
+            stats = _parquet_stats(p)
+        elif p.suffix == ".arrow":
+            stats = _arrow_stats(p)
+        else:
+            stats = _csv_stats(p)
+    except pd.errors.EmptyDataError:
+        stats = {"rows": 0, "min_updated_at": None, "max_updated_at": None, "fields": []}
+    fields = stats.pop("fields")
+    return {
+        "name": p.name,
+        "bytes": p.stat().st_size,
+        "sha256": _sha256(p),
+        "schema_fingerprint": _fingerprint(fields),
+        **stats,
+    }
+
+def build_manifest(entity: str, run_id: Optional[str], parts: list[Path]) -> dict[str, Any]:
+    files = [file_stats(p) for p in parts]
+    lows = [f["min_updated_at"] for f in files if f["min_updated_at"]]
+    highs = [f["max_updated_at"] for f in files if f["max_updated_at"]]
+    # empty parts carry no columns, they must not make a run look like it changed schema
+    prints = sorted({f["schema_fingerprint"] for f in files if f["rows"]})
+    return {
+        "version": MANIFEST_VERSION,
+        "entity": entity,
+        "run_id": run_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "rows": sum(f["rows"] for f in files),
+        "min_updated_at": min(lows, key=pd.Timestamp) if lows else None,
+        "max_updated_at": max(highs, key=pd.Timestamp) if highs else None,
+        "schema_fingerprint": prints[0] if len(prints) == 1 else None,
+        "files": files,
+    }
+
+def write_manifest(path: Path, manifest: dict[str, Any]) -> Path:
+    final_path = path / MANIFEST_NAME
+    tmp_path = path / f"{MANIFEST_NAME}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp_path.replace(final_path)
+    return final_path
+
+def read_manifest(path: Path) -> Optional[dict[str, Any]]:
+    p = path / MANIFEST_NAME
+    if not p.exists():
+        return None
+    return json.loads(p.read_text(encoding="utf-8"))
+
+def validate_manifest(path: Path, manifest: dict[str, Any], checksums: bool = False) -> None:
+    """Raises if a listed file is missing or differs in size (and sha256 when `checksums`)."""
+    for f in manifest["files"]:
+        p = path / f["name"]
+        if not p.exists():
+            raise RuntimeError(f"Landing file listed in manifest is missing: {p}")
+        if p.stat().st_size != f["bytes"]:
+            raise RuntimeError(f"Landing file size mismatch: {p} expected={f['bytes']} actual={p.stat().st_size}")
+        if checksums and _sha256(p) != f["sha256"]:
+            raise RuntimeError(f"Landing file checksum mismatch: {p}")
+
+def select_runs(
+    landing_root: Path,
+    entity: str,
+    updated_from: Optional[datetime] = None,
+    updated_to: Optional[datetime] = None,
+    skip_empty: bool = True
+) -> list[str]:
+    """Committed run_ids whose [min, max] updated_at overlaps the range, decided from manifests alone."""
+    base = landing_root / entity
+    if not base.exists():
+        return []
+
+    selected = []
+    for d in sorted(base.glob("run_id=*")):
+        if not (d / SUCCESS_MARKER).exists():
+            continue
+        manifest = read_manifest(d)
+        if manifest is None:
+            # runs landed before manifests existed cannot be pruned, keep them
+            selected.append(d.name.split("=", 1)[1])
+            continue
+        if manifest["rows"] == 0:
+            if not skip_empty:
+                selected.append(manifest["run_id"])
+            continue
+        if updated_from is not None and pd.Timestamp(manifest["max_updated_at"]) < pd.Timestamp(updated_from):
+            continue
+        if updated_to is not None and pd.Timestamp(manifest["min_updated_at"]) > pd.Timestamp(updated_to):
+            continue
+        selected.append(manifest["run_id"])
+    return selected
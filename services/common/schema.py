@@ -0,0 +1,176 @@
+import pandas as pd
+import pyarrow as pa
+
+# logical column types -> pandas dtype; "date" stays python datetime.date objects like normalize produced
+PANDAS_DTYPE = {
+    "string": "string",
+    "category": "category",
+    "int32": "Int32",
+    "int64": "Int64",
+    "float64": "float64",
+    "timestamp": "datetime64[ns, UTC]",
+    "date": "object",
+}
+
+# arrow type used when building columns from API rows; timestamps/dates arrive as ISO strings
+ARROW_INPUT_TYPE = {
+    "string": pa.string(),
+    "category": pa.string(),
+    "int32": pa.int32(),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "timestamp": pa.string(),
+    "date": pa.string(),
+}
+
+# arrow type a column is stored with when it is built by hand (nested lines, exploded lines)
+ARROW_OUTPUT_TYPE = {
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "int32": pa.int32(),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "timestamp": pa.timestamp("ns", tz="UTC"),
+    "date": pa.date32(),
+}
+
+META_SCHEMA = {
+    "_run_id": "category",
+    "_extracted_at": "timestamp",
+    "_watermark_effective": "timestamp",
+}
+
+ENTITY_SCHEMA = {
+    "ib_receipts": {
+        "id": "string",
+        "po_code": "string",
+        "po_date": "date",
+        "status": "category",
+        "note": "string",
+        "processed_by": "category",
+        "contact_name": "string",
+        "contact_phone": "string",
+        "client_id": "int64",
+        "warehouse_id": "int64",
+        "created_by": "category",
+        "created_at": "timestamp",
+        "updated_by": "category",
+        "updated_at": "timestamp",
+        "finished_at": "timestamp",
+        "lines_json": "string",
+        **META_SCHEMA,
+    },
+    "ob_orders": {
+        "id": "string",
+        "so_code": "string",
+        "expected_delivery_date": "date",
+        "actual_delivery_date": "date",
+        "customer_id": "int64",
+        "shipping_address_id": "int64",
+        "total_amount": "float64",
+        "actual_amount": "float64",
+        "note": "string",
+        "client_id": "int64",
+        "warehouse_id": "int64",
+        "status": "category",
+        "total_cod_amount": "float64",
+        "total_weight": "float64",
+        "total_volume": "float64",
+        "created_by": "category",
+        "created_at": "timestamp",
+        "updated_by": "category",
+        "updated_at": "timestamp",
+        "lines_json": "string",
+        **META_SCHEMA,
+    },
+}
+
+# fields of the items in `lines`; undeclared fields are kept with their inferred type
+LINE_SCHEMA = {
+    "ib_receipts": {
+        "line_id": "string",
+        "product_id": "int64",
+        "sku": "category",
+        "qty_unit_id": "int64",
+        "expected_qty": "int64",
+        "actual_qty": "int64",
+    },
+    "ob_orders": {
+        "line_id": "string",
+        "product_id": "int64",
+        "sku": "category",
+        "qty": "int64",
+    },
+}
+
+def entity_schema(entity: str) -> dict[str, str]:
+    # unknown entities get only the metadata columns; everything else keeps the suffix heuristics
+    return ENTITY_SCHEMA.get(entity, META_SCHEMA)
+
+def column_kind(schema: dict[str, str], col: str) -> str | None:
+    kind = schema.get(col)
+    if kind is not None:
+        return kind
+    if col.endswith("_at"):
+        return "timestamp"
+    if col.endswith("_date"):
+        return "date"
+    return None
+
+def cast_column(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "timestamp":
+        if isinstance(s.dtype, pd.DatetimeTZDtype):
+            return s if str(s.dtype) == PANDAS_DTYPE["timestamp"] else s.dt.tz_convert("UTC").astype(PANDAS_DTYPE["timestamp"])
+        return pd.to_datetime(s, utc=True, errors="coerce").astype(PANDAS_DTYPE["timestamp"])
+    if kind == "date":
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in ("date", "empty"):
+            return s
+        return pd.to_datetime(s, errors="coerce").dt.date.astype("object")
+    if str(s.dtype) == PANDAS_DTYPE[kind]:
+        return s
+    return s.astype(PANDAS_DTYPE[kind])
+
+def apply_schema(df: pd.DataFrame, entity: str) -> pd.DataFrame:
+    schema = entity_schema(entity)
+    for c in df.columns:
+        kind = column_kind(schema, c)
+        if kind is None:
+            continue
+        s = df[c]
+        cast = cast_column(s, kind)
+        if cast is not s:
+            df[c] = cast
+    return df
+
+# per-item source keys in source order: the struct has the union of the part's item keys, so without them an item
+# read back gains null fields it never had and its keys come out in struct order
+LINE_KEYS_FIELD = "_keys"
+
+def lines_array(values: list, entity: str) -> pa.ListArray:
+    """`lines` as list<struct>, declared item fields cast to their registry type, plus each item's LINE_KEYS_FIELD."""
+    arr = pa.array(values)
+    if pa.types.is_null(arr.type):
+        arr = arr.cast(pa.list_(pa.struct([])))
+    if not (pa.types.is_list(arr.type) and pa.types.is_struct(arr.type.value_type)):
+        raise ValueError(f"lines for {entity} must be lists of objects, got {arr.type}")
+
+    items = arr.values
+    declared = LINE_SCHEMA.get(entity, {})
+    names = [items.type.field(i).name for i in range(items.type.num_fields)]
+    fields = []
+    for name in names:
+        child = items.field(name)
+        kind = declared.get(name)
+        if kind is not None:
+            # parquet dictionary-encodes strings on its own, inside a struct keep them plain
+            child = child.cast(ARROW_INPUT_TYPE[kind] if kind == "category" else ARROW_OUTPUT_TYPE[kind])
+        fields.append(child)
+
+    keys = [list(item) if isinstance(item, dict) else None for row in values if row is not None for item in row]
+    if len(keys) != len(items):
+        raise ValueError(f"lines for {entity} must be lists of objects, got {len(keys)} keyed items for {len(items)}")
+    fields.append(pa.array(keys, pa.list_(pa.string())))
+    names.append(LINE_KEYS_FIELD)
+
+    typed = pa.StructArray.from_arrays(fields, names=names, mask=items.is_null())
+    return pa.ListArray.from_arrays(arr.offsets, typed, mask=arr.is_null())
@@ -0,0 +1,237 @@
+import fcntl
+import logging
+import shutil
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.common.landing import COMPACTED_DIR, SUCCESS_MARKER, compacted_dir, lines_dataset, run_dir
+from services.common.manifest import build_manifest, read_manifest, write_manifest
+from services.common.schema import apply_schema
+from services.extractor.app.writer_landing import write_parquet
+from services.staging.app.reader_landing import reader_landing
+
+logger = logging.getLogger(__name__)
+
+DEDUP_KEY = ["id", "updated_at"]
+
+LINES_DEDUP_KEY = ["parent_id", "parent_updated_at", "line_no"]
+
+def committed_runs(landing_root: Path, entity: str) -> list[str]:
+    base = landing_root / entity
+    if not base.exists():
+        return []
+    return sorted(d.name.split("=", 1)[1] for d in base.glob("run_id=*") if (d / SUCCESS_MARKER).exists())
+
+@contextmanager
+def _entity_lock(landing_root: Path, entity: str) -> Iterator[None]:
+    # day partitions are rewritten in place, two compactions of one entity must not interleave
+    lock_dir = landing_root / COMPACTED_DIR / entity
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    with (lock_dir / ".lock").open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as e:
+            raise RuntimeError(f"Compaction already running for {entity}") from e
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _partition_parts(path: Path) -> list[Path]:
+    marker = path / SUCCESS_MARKER
+    if not marker.exists():
+        return []
+    return [path / name for name in marker.read_text(encoding="utf-8").split()]
+
+def _rows_per_file(frames_bytes: int, frames_rows: int, target_file_mb: int) -> int:
+    # on-disk bytes/row of the inputs is a good enough predictor for the compacted output
+    if frames_rows == 0 or frames_bytes == 0:
+        return 1_000_000
+    per_row = frames_bytes / frames_rows
+    return max(int(target_file_mb * 1024 * 1024 / per_row), 1000)
+
+def dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    # the newest extraction of a version wins, its _run_id stays as lineage
+    # (updated_at, id) first so consecutive output files cover disjoint time ranges
+    order = ["updated_at", "id"] + (["_extracted_at"] if "_extracted_at" in df.columns else [])
+    df = df.sort_values(order, kind="mergesort")
+    return df.drop_duplicates(subset=DEDUP_KEY, keep="last").reset_index(drop=True)
+
+def dedupe_lines(df: pd.DataFrame) -> pd.DataFrame:
+    # same rule as dedupe, per line item of a parent version
+    order = ["parent_updated_at", "parent_id", "line_no"] + (["_extracted_at"] if "_extracted_at" in df.columns else [])
+    df = df.sort_values(order, kind="mergesort")
+    return df.drop_duplicates(subset=LINES_DEDUP_KEY, keep="last").reset_index(drop=True)
+
+def _read_run_table(path: Path) -> Optional[pa.Table]:
+    tables = []
+    for p in _partition_parts(path):
+        if p.suffix == ".arrow":
+            with pa.memory_map(str(p)) as src:
+                table = pa.ipc.open_file(src).read_all()
+        else:
+            table = pq.read_table(p)
+        if table.num_rows:
+            tables.append(table)
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="permissive")
+
+def _commit_partition(
+    landing_root: Path,
+    entity: str,
+    day: str,
+    df: pd.DataFrame,
+    rows_per_file: int,
+    source_runs: list[str]
+) -> dict[str, Any]:
+    path = compacted_dir(landing_root, entity, day)
+    path.mkdir(parents=True, exist_ok=True)
+    old_parts = _partition_parts(path)
+    old_manifest = read_manifest(path) or {}
+    
+    generation = uuid.uuid4().hex[:12]
+    parts = []
+    for part_no, start in enumerate(range(0, len(df), rows_per_file)):
+        final_path = path / f"part-{generation}-{part_no:03d}.parquet"
+        tmp_path = path / f"part-{generation}-{part_no:03d}.tmp.parquet"
+        table = pa.Table.from_pandas(df.iloc[start:start + rows_per_file], preserve_index=False)
+        write_parquet(table, tmp_path, entity)
+        tmp_path.replace(final_path)
+        parts.append(final_path)
+    
+    manifest = build_manifest(entity, None, parts)
+    manifest["partition"] = day
+    manifest["source_runs"] = sorted(set(old_manifest.get("source_runs", [])) | set(source_runs))
+    write_manifest(path, manifest)
+    
+    # swapping the marker is the commit point; readers follow the marker, never a directory listing
+    tmp_marker = path / f"{SUCCESS_MARKER}.{generation}.tmp"
+    tmp_marker.write_text("".join(f"{p.name}\n" for p in parts), encoding="utf-8")
+    tmp_marker.replace(path / SUCCESS_MARKER)
+    
+    for p in old_parts:
+        p.unlink(missing_ok=True)
+    return manifest
+
+def read_partition(landing_root: Path, entity: str, day: str) -> Optional[pd.DataFrame]:
+    parts = _partition_parts(compacted_dir(landing_root, entity, day))
+    if not parts:
+        return None
+    frames = [pd.read_parquet(p) for p in parts]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def compact_runs(
+    landing_root: Path,
+    entity: str,
+    run_ids: Iterable[str],
+    target_file_mb: int = 128,
+    lines_run_ids: Optional[Iterable[str]] = None
+) -> dict[str, Any]:
+    run_ids = list(run_ids)
+    frames = []
+    in_bytes = in_rows = 0
+    for run_id in run_ids:
+        manifest = read_manifest(run_dir(landing_root, entity, run_id))
+        if manifest is not None:
+            in_bytes += sum(f["bytes"] for f in manifest["files"])
+            in_rows += manifest["rows"]
+            if manifest["rows"] == 0:
+                continue
+        df = reader_landing(landing_root, entity, run_id)
+        if len(df):
+            frames.append(df)
+    
+    stats = {"runs": len(run_ids), "rows_in": sum(len(f) for f in frames), "partitions": 0, "rows_out": 0}
+    if frames:
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        rows_per_file = _rows_per_file(in_bytes, in_rows, target_file_mb)
+        days = df["updated_at"].dt.strftime("%Y-%m-%d")
+        for day, part in df.groupby(days, sort=True):
+            existing = read_partition(landing_root, entity, day)
+            merged = part if existing is None else pd.concat([existing, part], ignore_index=True)
+            merged = dedupe(apply_schema(merged, entity))
+            runs_in_day = sorted(part["_run_id"].astype(str).unique())
+            manifest = _commit_partition(landing_root, entity, day, merged, rows_per_file, runs_in_day)
+            stats["partitions"] += 1
+            stats["rows_out"] += manifest["rows"]
+            logger.info("[%s] compacted day=%s rows=%s files=%s", entity, day, manifest["rows"], len(manifest["files"]))
+    
+    if lines_run_ids is None:
+        lines_run_ids = [r for r in run_ids if (run_dir(landing_root, lines_dataset(entity), r) / SUCCESS_MARKER).exists()]
+    lines_run_ids = list(lines_run_ids)
+    if lines_run_ids:
+        stats["lines"] = _compact_lines(landing_root, entity, lines_run_ids, target_file_mb)
+    
+    # only after every touched day is committed; a crash before this re-compacts the runs, which dedupe absorbs
+    for run_id in run_ids:
+        shutil.rmtree(run_dir(landing_root, entity, run_id))
+    for run_id in lines_run_ids:
+        shutil.rmtree(run_dir(landing_root, lines_dataset(entity), run_id))
+    return stats
+
+def _compact_lines(landing_root: Path, entity: str, run_ids: list[str], target_file_mb: int) -> dict[str, Any]:
+    """The exploded `<entity>_lines` runs into day partitions of parent_updated_at, like the entity runs."""
+    dataset = lines_dataset(entity)
+    tables = []
+    in_bytes = in_rows = 0
+    for run_id in run_ids:
+        path = run_dir(landing_root, dataset, run_id)
+        manifest = read_manifest(path)
+        if manifest is not None:
+            in_bytes += sum(f["bytes"] for f in manifest["files"])
+            in_rows += manifest["rows"]
+            if manifest["rows"] == 0:
+                continue
+        table = _read_run_table(path)
+        if table is not None:
+            tables.append(table)
+    
+    stats = {"runs": len(run_ids), "rows_in": sum(t.num_rows for t in tables), "partitions": 0, "rows_out": 0}
+    if not tables:
+        return stats
+    
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    rows_per_file = _rows_per_file(in_bytes, in_rows, target_file_mb)
+    days = df["parent_updated_at"].dt.strftime("%Y-%m-%d")
+    for day, part in df.groupby(days, sort=True):
+        existing = read_partition(landing_root, dataset, day)
+        merged = part if existing is None else pd.concat([existing, part], ignore_index=True)
+        merged = dedupe_lines(merged)
+        runs_in_day = sorted(part["_run_id"].astype(str).unique()) if "_run_id" in part.columns else []
+        manifest = _commit_partition(landing_root, dataset, day, merged, rows_per_file, runs_in_day)
+        stats["partitions"] += 1
+        stats["rows_out"] += manifest["rows"]
+        logger.info("[%s] compacted day=%s rows=%s files=%s", dataset, day, manifest["rows"], len(manifest["files"]))
+    return stats
+
+def compact_entity(
+    landing_root: Path,
+    entity: str,
+    staged_run_ids: set[str],
+    target_file_mb: int = 128,
+    max_runs: Optional[int] = None,
+    dry_run: bool = False
+) -> dict[str, Any]:
+    runs = committed_runs(landing_root, entity)
+    eligible = [r for r in runs if r in staged_run_ids]
+    if max_runs is not None:
+        eligible = eligible[:max_runs]
+    # lines runs of the selected entity runs, plus any left behind by entity runs compacted before lines were
+    lines_runs = [r for r in committed_runs(landing_root, lines_dataset(entity)) if r in staged_run_ids]
+    lines_eligible = [r for r in lines_runs if r in eligible or not run_dir(landing_root, entity, r).exists()]
+    logger.info(
+        "[%s] compaction runs committed=%s staged=%s selected=%s lines_selected=%s",
+        entity, len(runs), len([r for r in runs if r in staged_run_ids]), len(eligible), len(lines_eligible)
+    )
+    if dry_run or not (eligible or lines_eligible):
+        return {"runs": len(eligible), "rows_in": 0, "partitions": 0, "rows_out": 0, "dry_run": dry_run}
+    
+    with _entity_lock(landing_root, entity):
+        return compact_runs(landing_root, entity, eligible, target_file_mb, lines_eligible)
@@ -0,0 +1,50 @@
+from services.common.db import build_engine
+from services.common.config import load_config
+from services.compaction.app.compact import compact_entity
+from services.staging.app.pipeline_run_logs_repo import successful_run_ids
+import logging
+import argparse
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+def _setup_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s - %(message)s",
+    )
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--entity", required=True, choices=["ib_receipts", "ob_orders"])
+    p.add_argument("--target-file-mb", type=int, default=128, dest="target_file_mb")
+    p.add_argument("--max-runs", type=int, default=500, dest="max_runs")
+    p.add_argument("--dry-run", action="store_true", dest="dry_run")
+    return p.parse_args(args)
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    _setup_logging()
+    args = parse_args(args)
+    cfg = load_config()
+    engine = build_engine(cfg.pg_dsn)
+    
+    try:
+        # only runs staging finished for this entity; anything running, failed or unseen is left alone
+        staged = successful_run_ids(engine, args.entity)
+        stats = compact_entity(
+            landing_root=cfg.landing_root,
+            entity=args.entity,
+            staged_run_ids=staged,
+            target_file_mb=args.target_file_mb,
+            max_runs=args.max_runs,
+            dry_run=args.dry_run,
+        )
+        logger.info("compaction done entity=%s stats=%s", args.entity, stats)
+        return 0
+    except Exception:
+        logger.exception("Failure at the compaction stage entity=%s", args.entity)
+        return 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
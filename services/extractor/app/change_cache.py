@@ -0,0 +1,19 @@
+import pandas as pd
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """64-bit content hash per row over the source columns; the _run_id/_extracted_at metadata changes every run."""
+    data = df[[c for c in df.columns if not c.startswith("_")]]
+    # nested lines and dates are python objects, hash their text form
+    obj = [c for c in data.columns if data[c].dtype == object]
+    if obj:
+        data = data.assign(**{c: data[c].astype(str) for c in obj})
+    return pd.util.hash_pandas_object(data, index=False).astype("int64")
+
+def suppress_unchanged(df: pd.DataFrame, cache: dict[str, int]) -> tuple[pd.DataFrame, pd.Series]:
+    """Drops rows whose hash equals the cached one for their id; returns the kept rows and their hashes."""
+    hashes = row_hashes(df)
+    if not cache:
+        return df, hashes
+    seen = df["id"].astype(str).map(cache)
+    keep = (seen != hashes).to_numpy()
+    return df[keep], hashes[keep]
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Iterator
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from services.extractor.app.watermark_repo import _to_utc
+
+def _batch(items: list[dict], batch_size: int) -> Iterator[list[dict]]:
+    for i in range(0, len(items), batch_size):
+        yield items[i: i + batch_size]
+
+def load_change_cache(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    since: datetime
+) -> dict[str, int]:
+    # only rows updated inside the lookback window can be fetched again
+    sql = text("""
+               SELECT id, payload_hash
+               FROM etl_change_cache
+               WHERE pipeline_name = :p AND entity = :e AND updated_at >= :t
+               """)
+    with engine.connect() as conn:
+        rows = conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "t": _to_utc(since)
+        }).fetchall()
+    
+    return {r[0]: int(r[1]) for r in rows}
+
+def upsert_change_cache(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    df: pd.DataFrame,
+    hashes: pd.Series,
+    batch_size: int = 1000
+) -> int:
+    
+    sql = text("""
+               INSERT INTO etl_change_cache (pipeline_name, entity, id, updated_at, payload_hash)
+               VALUES(:p, :e, :id, :t, :h)
+               ON CONFLICT (pipeline_name, entity, id)
+               DO UPDATE SET
+                updated_at = excluded.updated_at,
+                payload_hash = excluded.payload_hash
+               WHERE excluded.updated_at >= etl_change_cache.updated_at
+               """)
+    records = [
+        {"p": pipeline_name, "e": entity, "id": i, "t": t.to_pydatetime(), "h": int(h)}
+        for i, t, h in zip(df["id"].astype(str), df["updated_at"], hashes)
+    ]
+    with engine.begin() as conn:
+        for b in _batch(records, batch_size):
+            conn.execute(sql, b)
+    return len(records)
+
+def prune_change_cache(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    before: datetime
+) -> int:
+    # the next run's lookback starts at or after this run's, older entries can never match again
+    sql = text("""
+               DELETE FROM etl_change_cache
+               WHERE pipeline_name = :p AND entity = :e AND updated_at < :t
+               """)
+    with engine.begin() as conn:
+        res = conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "t": _to_utc(before)
+        })
+    return int(res.rowcount or 0)
@@ -1,16 +1,30 @@
+import asyncio
 import requests
 import logging
-from datetime import datetime,timezone
-from typing import Any
-from .http_client import get_json
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+from services.common.landing import PARQUET_LAYOUT
+from services.common.schema import ENTITY_SCHEMA
+from .http_client import backoff_seconds, get_json, get_json_async, is_retryable_error
+from .page_sizer import PageSizer
 
 logger = logging.getLogger(__name__)
 
 ENTITY_CFG = {
-    "ib_receipts": {"path": "/ib/receipts"},
-    "ob_orders": {"path": "/ob/orders"}
+    "ib_receipts": {"path": "/ib/receipts", "schema": ENTITY_SCHEMA["ib_receipts"], "parquet": PARQUET_LAYOUT["ib_receipts"]},
+    "ob_orders": {"path": "/ob/orders", "schema": ENTITY_SCHEMA["ob_orders"], "parquet": PARQUET_LAYOUT["ob_orders"]}
 }
 
+PAGINATION_MODES = ("offset", "cursor")
+
+MAX_OFFSET = 2_000_000
+
+ADAPTIVE_MAX_RETRIES = 3
+
 def _to_iso(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00","Z")
 
@@ -27,63 +41,449 @@ def _assert_stable_order(rows: list[dict[str, Any]], entity: str):
             raise RuntimeError(f"Unstable ordering detected for {entity}: {k} < {prev}")
         prev = k
 
-def fetch_all(
+def _offset_params(updated_after: datetime, limit: int, offset: int) -> dict[str, Any]:
+    return {
+        "updated_after": _to_iso(updated_after),
+        "limit": limit,
+        "offset": offset,
+    }
+
+def _fetch_page(
     session: requests.Session,
-    base_url: str,
+    url: str,
     entity: str,
-    updated_after: datetime,
+    params: dict[str, Any],
+    request_timeout_seconds: int,
+    max_retries: int = 3
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    
+    page = get_json(
+        session=session,
+        url=url,
+        params=params,
+        timeout=(5, request_timeout_seconds),
+        max_retries=max_retries
+    )
+    return _parse_page(page, entity, params)
+
+def _fetch_sized_page(
+    session: requests.Session,
+    url: str,
+    entity: str,
+    build_params: Callable[[int], dict[str, Any]],
     limit: int,
+    page_sizer: Optional[PageSizer],
     request_timeout_seconds: int
-) -> list[dict[str, Any]]:
+) -> tuple[list[dict[str, Any]], int]:
     
-    if entity not in ENTITY_CFG:
-        raise ValueError(f"Unknown entity {entity}")
-    offset = 0
-    all_rows: list[dict[str, Any]] = []
+    if page_sizer is None:
+        data, _ = _fetch_page(session, url, entity, build_params(limit), request_timeout_seconds)
+        return data, limit
     
-    url = base_url.rstrip("/") + ENTITY_CFG[entity]["path"]
+    # adaptive mode retries here instead of inside get_json so every failure shrinks the next attempt
+    for i in range(ADAPTIVE_MAX_RETRIES + 1):
+        size = page_sizer.size
+        started = time.monotonic()
+        try:
+            data, _ = _fetch_page(session, url, entity, build_params(size), request_timeout_seconds, max_retries=0)
+        except requests.exceptions.RequestException as e:
+            if not is_retryable_error(e) or i == ADAPTIVE_MAX_RETRIES:
+                raise
+            page_sizer.on_failure()
+            sleep_s = backoff_seconds(i)
+            logger.warning(
+                "[%s] page failed at size=%s (attempt %d/%d): %s. Retry with size=%s in %.2fs",
+                entity, size, i + 1, ADAPTIVE_MAX_RETRIES + 1, e, page_sizer.size, sleep_s
+            )
+            time.sleep(sleep_s)
+            continue
+        
+        latency_s = time.monotonic() - started
+        page_sizer.on_success(latency_s)
+        page_sizer.on_page(size, len(data))
+        logger.info("[%s] adaptive page size=%s latency=%.3fs next_size=%s", entity, size, latency_s, page_sizer.size)
+        return data, size
+    
+    raise RuntimeError(f"Exhausted adaptive retries for {entity}")
+
+async def _fetch_page_async(
+    session: requests.Session,
+    url: str,
+    entity: str,
+    params: dict[str, Any],
+    request_timeout_seconds: int,
+    semaphore: asyncio.Semaphore
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
     
+    page = await get_json_async(
+        session=session,
+        url=url,
+        params=params,
+        timeout=(5, request_timeout_seconds),
+        max_retries=3,
+        semaphore=semaphore
+    )
+    return _parse_page(page, entity, params)
+
+def _parse_page(
+    page: Any,
+    entity: str,
+    params: dict[str, Any]
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
     
+    if not page:
+        return [], {}
     
-    while True:
-        params = {
-            "updated_after": _to_iso(updated_after),
-            "limit": limit,
-            "offset": offset,
-        }
+    data = page.get("data", [])
+    meta = page.get("meta", {})
+    
+    logger.info(
+        "[%s] page offset=%s after=%s page_size=%s meta_count=%s meta_offset=%s",
+        entity, params.get("offset"), params.get("after_id"), len(data), meta.get("count"), meta.get("offset")
+    )
+    if not isinstance(data, list):
+        raise RuntimeError(f"Unexpected API response type for {entity}: {type(data)}")
+    
+    _assert_stable_order(data, entity)
+    return data, meta
+
+class _CursorScan:
+    """Keyset position shared by the sync and async cursor loops, so both advance and stop alike."""
+    
+    def __init__(self, entity: str, updated_after: datetime, start_after: Optional[tuple[str, Any]] = None):
+        self.entity = entity
+        self.cursor: tuple[str, Any] = start_after or (_to_iso(updated_after), None)
+        self.total = 0
+    
+    def params(self, n: int) -> dict[str, Any]:
+        params: dict[str, Any] = {"updated_after": self.cursor[0], "limit": n}
+        if self.cursor[1] is not None:
+            params["after_id"] = self.cursor[1]
+        return params
+    
+    def advance(self, data: list[dict[str, Any]]) -> None:
+        self.total += len(data)
+        logger.info("[%s] fetched data after=%s count=%s total=%s", self.entity, self.cursor[1], len(data), self.total)
         
-        page = get_json(
-            session=session,
-            url=url,
-            params=params,
-            timeout=(5, request_timeout_seconds),
-            max_retries=3
+        next_cursor = _stable_key(data[-1])
+        if self.cursor[1] is not None and next_cursor <= self.cursor:
+            raise RuntimeError(f"Cursor did not advance for {self.entity}: {next_cursor} <= {self.cursor}")
+        self.cursor = next_cursor
+        
+        if self.total >= MAX_OFFSET:
+            raise RuntimeError(f"Pagination runaway for {self.entity}: rows= {self.total}")
+
+def _iter_cursor_pages(
+    session: requests.Session,
+    url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    page_sizer: Optional[PageSizer] = None,
+    start_after: Optional[tuple[str, Any]] = None
+) -> Iterator[list[dict[str, Any]]]:
+    
+    scan = _CursorScan(entity, updated_after, start_after)
+    while True:
+        data, size = _fetch_sized_page(
+            session, url, entity, scan.params, limit, page_sizer, request_timeout_seconds
         )
         
-        if not page:
+        if not data:
             break
         
-        data = page.get("data", [])
-        meta = page.get("meta", {})
+        yield data
+        
+        # the sizer may ask for more than an upstream serves per page, so adaptive scans end on an empty page
+        if page_sizer is None and len(data) < size:
+            break
         
-        logger.info(
-            "[%s] page offset=%s page_size=%s meta_count=%s meta_offset=%s",
-            entity, offset, len(data), meta.get("count"), meta.get("offset")
+        scan.advance(data)
+
+def _iter_offset_pages(
+    session: requests.Session,
+    url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    page_sizer: Optional[PageSizer] = None,
+    start_offset: int = 0
+) -> Iterator[list[dict[str, Any]]]:
+    
+    offset = start_offset
+    total = 0
+    
+    while True:
+        data, size = _fetch_sized_page(
+            session, url, entity, lambda n: _offset_params(updated_after, n, offset), limit, page_sizer,
+            request_timeout_seconds
         )
-        if not isinstance(data, list):
-            raise RuntimeError(f"Unexpected API response type for {entity}: {type(data)}")
         
-        _assert_stable_order(data, entity)    
-        all_rows.extend(data)
+        if not data:
+            break
         
-        logger.info("[%s] fetched data offset=%s count=%s total=%s",entity, offset, len(data), len(all_rows))
+        total += len(data)
+        logger.info("[%s] fetched data offset=%s count=%s total=%s",entity, offset, len(data), total)
+        yield data
         
-        if len(data) < limit:
+        # the sizer may ask for more than an upstream serves per page, so adaptive scans end on an empty page
+        if page_sizer is None and len(data) < size:
             break
         
+        offset += len(data)
+        
+        if offset >= MAX_OFFSET:
+            raise RuntimeError(f"Pagination runaway for {entity}: offset= {offset}")
+
+def _iter_offset_pages_concurrent(
+    session: requests.Session,
+    url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    max_workers: int,
+    start_offset: int = 0
+) -> Iterator[list[dict[str, Any]]]:
+    
+    first, meta = _fetch_page(
+        session, url, entity, _offset_params(updated_after, limit, start_offset), request_timeout_seconds
+    )
+    if first:
+        yield first
+    
+    if len(first) < limit:
+        return
+    
+    count = int(meta.get("count") or 0)
+    if count >= MAX_OFFSET:
+        raise RuntimeError(f"Pagination runaway for {entity}: count= {count}")
+    
+    planned = range(start_offset + limit, count, limit)
+    logger.info("[%s] planned pages=%s meta_count=%s workers=%s", entity, len(planned) + 1, count, max_workers)
+    
+    def submit(pool: ThreadPoolExecutor, offset: int) -> tuple[int, Future]:
+        return offset, pool.submit(
+            _fetch_page, session, url, entity, _offset_params(updated_after, limit, offset), request_timeout_seconds
+        )
+    
+    # pages are handed out in offset order; the window bounds how many finished pages wait in memory
+    pending = iter(planned)
+    last_offset, last_len = start_offset, len(first)
+    total = len(first)
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"fetch-{entity}")
+    try:
+        in_flight = deque(submit(pool, offset) for offset in islice(pending, max_workers * 2))
+        while in_flight:
+            offset, fut = in_flight.popleft()
+            data = fut.result()[0]
+            in_flight.extend(submit(pool, o) for o in islice(pending, 1))
+            
+            last_offset, last_len = offset, len(data)
+            total += len(data)
+            if data:
+                yield data
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    
+    # meta.count is a snapshot: rows created after the first page spill past the plan
+    offset = last_offset
+    while last_len >= limit:
         offset += limit
+        if offset >= MAX_OFFSET:
+            raise RuntimeError(f"Pagination runaway for {entity}: offset= {offset}")
+        data, _ = _fetch_page(
+            session, url, entity, _offset_params(updated_after, limit, offset), request_timeout_seconds
+        )
+        last_len = len(data)
+        total += len(data)
+        if data:
+            yield data
+    
+    logger.info("[%s] fetched data pages=%s total=%s", entity, offset // limit + 1, total)
+
+def iter_pages(
+    session: requests.Session,
+    base_url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    max_workers: int = 1,
+    pagination: str = "offset",
+    page_sizer: Optional[PageSizer] = None,
+    start_offset: int = 0,
+    start_after: Optional[tuple[str, Any]] = None
+) -> Iterator[list[dict[str, Any]]]:
+    """Pages in (updated_at, id) order; start_offset / start_after resume a run after its last landed row."""
+    
+    if entity not in ENTITY_CFG:
+        raise ValueError(f"Unknown entity {entity}")
+    if pagination not in PAGINATION_MODES:
+        raise ValueError(f"Unsupported pagination: {pagination}")
+    
+    url = base_url.rstrip("/") + ENTITY_CFG[entity]["path"]
+    
+    if pagination == "cursor":
+        # keyset pages chain on the previous page's last key, so they cannot be fanned out
+        return _iter_cursor_pages(
+            session, url, entity, updated_after, limit, request_timeout_seconds, page_sizer, start_after
+        )
+    
+    if page_sizer is not None:
+        # the fan-out plans fixed-size offsets from the first page, so adaptive sizing walks pages serially
+        if max_workers > 1:
+            logger.warning("[%s] adaptive page size set, ignoring max_workers=%s", entity, max_workers)
+        return _iter_offset_pages(
+            session, url, entity, updated_after, limit, request_timeout_seconds, page_sizer, start_offset
+        )
+    
+    if max_workers > 1:
+        return _iter_offset_pages_concurrent(
+            session, url, entity, updated_after, limit, request_timeout_seconds, max_workers, start_offset
+        )
+    
+    return _iter_offset_pages(
+        session, url, entity, updated_after, limit, request_timeout_seconds, start_offset=start_offset
+    )
+
+def _parse_ts(value: Any) -> datetime:
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def resume_updated_after(last_key: tuple[str, Any]) -> datetime:
+    # updated_after is strict and sent in whole seconds, so step back a second to keep the rows tied on last_updated_at
+    return _parse_ts(last_key[0]) - timedelta(seconds=1)
+
+def skip_through(
+    pages: Iterable[list[dict[str, Any]]],
+    last_key: tuple[str, Any]
+) -> Iterator[list[dict[str, Any]]]:
+    """Drops the rows at or before `last_key`, the (updated_at, id) of the last landed row."""
+
+    bound = (_parse_ts(last_key[0]), str(last_key[1]))
+    for page in pages:
+        kept = [row for row in page if (_parse_ts(row.get("updated_at")), str(row.get("id"))) > bound]
+        if kept:
+            yield kept
+
+def iter_row_chunks(
+    pages: Iterable[list[dict[str, Any]]],
+    chunk_rows: int
+) -> Iterator[list[dict[str, Any]]]:
+    
+    if chunk_rows <= 0:
+        raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+    
+    buf: list[dict[str, Any]] = []
+    for page in pages:
+        buf.extend(page)
+        while len(buf) >= chunk_rows:
+            yield buf[:chunk_rows]
+            buf = buf[chunk_rows:]
+    
+    if buf:
+        yield buf
+
+def fetch_all(
+    session: requests.Session,
+    base_url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    max_workers: int = 1,
+    pagination: str = "offset",
+    page_sizer: Optional[PageSizer] = None
+) -> list[dict[str, Any]]:
+    
+    pages = iter_pages(
+        session=session,
+        base_url=base_url,
+        entity=entity,
+        updated_after=updated_after,
+        limit=limit,
+        request_timeout_seconds=request_timeout_seconds,
+        max_workers=max_workers,
+        pagination=pagination,
+        page_sizer=page_sizer,
+    )
+    all_rows = [row for page in pages for row in page]
+    
+    if max_workers > 1 and pagination == "offset" and page_sizer is None:
+        all_rows.sort(key=_stable_key)
+    
+    return all_rows
+
+async def fetch_all_async(
+    session: requests.Session,
+    base_url: str,
+    entity: str,
+    updated_after: datetime,
+    limit: int,
+    request_timeout_seconds: int,
+    semaphore: asyncio.Semaphore,
+    pagination: str = "offset"
+) -> list[dict[str, Any]]:
+    
+    if entity not in ENTITY_CFG:
+        raise ValueError(f"Unknown entity {entity}")
+    if pagination not in PAGINATION_MODES:
+        raise ValueError(f"Unsupported pagination: {pagination}")
+    
+    url = base_url.rstrip("/") + ENTITY_CFG[entity]["path"]
+    all_rows: list[dict[str, Any]] = []
+    
+    if pagination == "cursor":
+        scan = _CursorScan(entity, updated_after)
+        while True:
+            data, _ = await _fetch_page_async(
+                session, url, entity, scan.params(limit), request_timeout_seconds, semaphore
+            )
+            all_rows.extend(data)
+            if len(data) < limit:
+                break
+            scan.advance(data)
         
-        if offset >= 2_000_000:
+        logger.info("[%s] fetched data total=%s", entity, len(all_rows))
+        return all_rows
+    
+    first, meta = await _fetch_page_async(
+        session, url, entity, _offset_params(updated_after, limit, 0), request_timeout_seconds, semaphore
+    )
+    if len(first) < limit:
+        return first
+    
+    count = int(meta.get("count") or 0)
+    if count >= MAX_OFFSET:
+        raise RuntimeError(f"Pagination runaway for {entity}: count= {count}")
+    
+    offsets = list(range(limit, count, limit))
+    results = await asyncio.gather(*(
+        _fetch_page_async(
+            session, url, entity, _offset_params(updated_after, limit, offset), request_timeout_seconds, semaphore
+        )
+        for offset in offsets
+    ))
+    pages = [first] + [data for data, _ in results]
+    
+    # meta.count is a snapshot: rows created after the first page spill past the plan
+    offset = offsets[-1] if offsets else 0
+    while len(pages[-1]) >= limit:
+        offset += limit
+        if offset >= MAX_OFFSET:
             raise RuntimeError(f"Pagination runaway for {entity}: offset= {offset}")
+        data, _ = await _fetch_page_async(
+            session, url, entity, _offset_params(updated_after, limit, offset), request_timeout_seconds, semaphore
+        )
+        pages.append(data)
+    
+    all_rows = [row for page in pages for row in page]
+    all_rows.sort(key=_stable_key)
     
+    logger.info("[%s] fetched data pages=%s total=%s", entity, len(pages), len(all_rows))
     return all_rows
@@ -1,21 +1,235 @@
+import asyncio
+import contextlib
+import json
 import random
+import threading
 import time
 import requests
 import logging
-from typing import Any
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is the fallback decoder
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = (5, 30)
 
-def build_session() -> requests.Session:
+RETRYABLE_STATUS = (408 ,429, 500, 502, 503, 504)
+
+# statuses that mean the upstream is unhealthy; 429 only means "slow down" and is left to the rate limiter
+BREAKER_FAILURE_STATUS = (408, 500, 502, 503, 504)
+
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class TokenBucket:
+    """Shared request budget: `rate_per_s` sustained, up to `burst` back-to-back."""
+    
+    def __init__(self, rate_per_s: float, burst: int = 1):
+        if rate_per_s <= 0:
+            raise ValueError(f"rate_per_s must be positive, got {rate_per_s}")
+        self.rate_per_s = rate_per_s
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        # takes a token now (possibly going into debt) and returns how long the caller must wait to use it,
+        # so sync and async callers can sleep their own way
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate_per_s if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+    
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout_s` one trial call decides."""
+    
+    def __init__(self, failure_threshold: int, reset_timeout_s: float):
+        if failure_threshold < 1:
+            raise ValueError(f"failure_threshold must be >= 1, got {failure_threshold}")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout_s:
+                    raise CircuitOpenError(f"Circuit open after {self._failures} consecutive failures")
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit half-open, trial request in flight")
+            self._trial_in_flight = True
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Circuit opened after %s consecutive failures", self._failures)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+def build_session(
+    pool_maxsize: int = 10,
+    rate_limiter: Optional[TokenBucket] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None
+) -> requests.Session:
     s = requests.Session()
     s.headers.update({
         "User-Agent": "WMS_PIPELINE/1.0",
-        "Accept": "application/json"
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip"
     })
+    # one keep-alive connection per concurrent page fetch, otherwise urllib3 discards the extras
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(pool_maxsize, 1))
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    # ride along on the session so every caller sharing it also shares the budget and breaker state
+    s.rate_limiter = rate_limiter
+    s.circuit_breaker = circuit_breaker
     return s
 
+def backoff_seconds(attempt: int) -> float:
+    base = 0.5 * (2 ** attempt)
+    return base * (0.5 + 0.5 * random.random())
+
+def is_retryable_error(e: Exception) -> bool:
+    if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError):
+        return getattr(e.response, "status_code", None) in RETRYABLE_STATUS
+    return False
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    raw = resp.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        seconds = float(raw)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(raw) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+def _before_request(session: requests.Session) -> float:
+    breaker = getattr(session, "circuit_breaker", None)
+    if breaker is not None:
+        breaker.before_call()
+    limiter = getattr(session, "rate_limiter", None)
+    return limiter.reserve() if limiter is not None else 0.0
+
+def _after_response(session: requests.Session, resp: requests.Response) -> Optional[float]:
+    breaker = getattr(session, "circuit_breaker", None)
+    if breaker is not None:
+        if resp.status_code in BREAKER_FAILURE_STATUS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    
+    if resp.status_code not in (429, 503):
+        return None
+    retry_after = _retry_after_seconds(resp)
+    limiter = getattr(session, "rate_limiter", None)
+    if retry_after is not None and limiter is not None:
+        limiter.pause(retry_after)
+    return retry_after
+
+def _after_network_error(session: requests.Session) -> None:
+    breaker = getattr(session, "circuit_breaker", None)
+    if breaker is not None:
+        breaker.record_failure()
+
+def _send(
+    session: requests.Session,
+    url: str,
+    params: dict[str, Any],
+    timeout: tuple[int, int]
+) -> requests.Response:
+    wait_s = _before_request(session)
+    # anything raised before a response is recorded counts as a failure, so a half-open trial is always released
+    try:
+        if wait_s > 0:
+            time.sleep(wait_s)
+        return session.get(url=url, params=params, timeout=timeout)
+    except BaseException:
+        _after_network_error(session)
+        raise
+
+async def _send_async(
+    session: requests.Session,
+    url: str,
+    params: dict[str, Any],
+    timeout: tuple[int, int],
+    slot: Any
+) -> requests.Response:
+    wait_s = _before_request(session)
+    # also covers cancellation while waiting or in flight
+    try:
+        if wait_s > 0:
+            await asyncio.sleep(wait_s)
+        async with slot:
+            return await asyncio.to_thread(session.get, url=url, params=params, timeout=timeout)
+    except BaseException:
+        _after_network_error(session)
+        raise
+
+def _loads(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def _decode_json(resp: requests.Response) -> Any:
+    body = resp.content
+    started = time.perf_counter()
+    try:
+        data = _loads(body)
+    except ValueError as e:
+            raise RuntimeError(
+            f"Response is not JSON: url={resp.url} status={resp.status_code} body={resp.text[:300]}"
+            ) from e
+    
+    # INFO like the per-page fetch logs, so a normal run shows the body size and decode cost of every page
+    logger.info(
+        "Decoded %s bytes=%s wire_bytes=%s encoding=%s decode_ms=%.2f",
+        resp.url, len(body), resp.headers.get("Content-Length"), resp.headers.get("Content-Encoding"),
+        (time.perf_counter() - started) * 1000
+    )
+    return data
+
 def get_json(
     session: requests.Session,
     url: str,
@@ -25,13 +239,15 @@ def get_json(
     ) -> Any:
     
     for i in range(max_retries + 1):
-        base = 0.5 * (2 ** i)
-        sleep_s = base * (0.5 + 0.5 * random.random())
+        sleep_s = backoff_seconds(i)
         try:
-            resp = session.get(url=url, params=params, timeout=timeout)
-            if resp.status_code in (408 ,429, 500, 502, 503, 504):
+            resp = _send(session, url, params, timeout)
+            retry_after = _after_response(session, resp)
+            if resp.status_code in RETRYABLE_STATUS:
                 if i == max_retries:
                     resp.raise_for_status()
+                if retry_after is not None:
+                    sleep_s = max(sleep_s, retry_after)
                 logger.warning(
                     "Retryable HTTP %s for %s (attempt %d/%d). Sleep %.2fs ",
                     resp.status_code, url, i+1, max_retries + 1, sleep_s
@@ -40,12 +256,7 @@ def get_json(
                 continue
             if resp.status_code >= 400:
                 resp.raise_for_status()
-            try:
-                return resp.json()
-            except ValueError as e:
-                    raise RuntimeError(
-                    f"Response is not JSON: url={resp.url} status={resp.status_code} body={resp.text[:300]}"
-                    ) from e
+            return _decode_json(resp)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
             if i == max_retries:
                 raise
@@ -56,3 +267,46 @@ def get_json(
             time.sleep(sleep_s)
             
     raise RuntimeError(f"Exhausted retries for url={url} params={params}")           
+
+async def get_json_async(
+    session: requests.Session,
+    url: str,
+    params: dict[str, Any],
+    timeout: tuple[int, int] = DEFAULT_TIMEOUT,
+    max_retries: int = 3,
+    semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Any:
+    
+    # the blocking request runs on a worker thread while holding a slot of the global limit;
+    # backoff sleeps release the slot so other in-flight pages keep going
+    slot = semaphore if semaphore is not None else contextlib.nullcontext()
+    
+    for i in range(max_retries + 1):
+        sleep_s = backoff_seconds(i)
+        try:
+            resp = await _send_async(session, url, params, timeout, slot)
+            retry_after = _after_response(session, resp)
+            if resp.status_code in RETRYABLE_STATUS:
+                if i == max_retries:
+                    resp.raise_for_status()
+                if retry_after is not None:
+                    sleep_s = max(sleep_s, retry_after)
+                logger.warning(
+                    "Retryable HTTP %s for %s (attempt %d/%d). Sleep %.2fs ",
+                    resp.status_code, url, i+1, max_retries + 1, sleep_s
+                )
+                await asyncio.sleep(sleep_s)
+                continue
+            if resp.status_code >= 400:
+                resp.raise_for_status()
+            return _decode_json(resp)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if i == max_retries:
+                raise
+            logger.warning(
+                "Network error  for %s (attempt %d/%d): %s. Sleep %.2fs",
+                 url, i+1, max_retries+1, str(e), sleep_s
+            )
+            await asyncio.sleep(sleep_s)
+            
+    raise RuntimeError(f"Exhausted retries for url={url} params={params}")
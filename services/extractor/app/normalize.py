@@ -1,20 +1,35 @@
-from typing import Any
+from operator import itemgetter
+from typing import Any, Optional
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import json
 
+from services.common.schema import ARROW_INPUT_TYPE, apply_schema, column_kind, entity_schema
+
+NORMALIZE_ENGINES = ("pandas", "arrow")
+
+# json: `lines` becomes the lines_json string column; nested: `lines` is kept as python lists for list<struct> landing
+LINES_MODES = ("json", "nested")
+
+# json.dumps(..., ensure_ascii=False) builds a fresh encoder on every call; the arrow path shares one
+_LINES_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
 def _to_utc(dt: datetime) -> datetime:
     if dt.tzinfo is None:
         return dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
-def _parse_cols_time(df: pd.DataFrame) -> pd.DataFrame:
+def _parse_cols_time(df: pd.DataFrame, schema: dict[str, str]) -> pd.DataFrame:
     for c in df.columns:
-        if c.endswith("_at"):
+        kind = column_kind(schema, c)
+        if kind == "timestamp":
             df[c] = pd.to_datetime(df[c], utc=True, errors="coerce")
-        elif c.endswith("_date"):
+        elif kind == "date":
             df[c] = pd.to_datetime(df[c], errors="coerce").dt.date
-    
+
     return df
 
 def _flatten_nested(df: pd.DataFrame) -> pd.DataFrame:
@@ -23,29 +38,13 @@ def _flatten_nested(df: pd.DataFrame) -> pd.DataFrame:
             lambda x: json.dumps(x, ensure_ascii=False) if x is not None else None
         )
         df = df.drop(columns=["lines"])
-    
+
     return df
 
-def normalize_rows(
-    rows: list[dict[str, Any]],
-    entity: str,
-    run_id: str,
-    extracted_at: datetime,
-    watermark_effective: datetime
-    ) -> pd.DataFrame:
-    
-    if not rows:
-        return pd.DataFrame()
-    
-    if not isinstance(rows, list):
-        raise RuntimeError(f"normalize_rows expects list[dict] but got {type(rows)}")
-    
-    df = pd.DataFrame(rows)
-    df = _parse_cols_time(df)
-    
+def _check_required(df: pd.DataFrame, entity: str) -> None:
     required_cols = ["id", "updated_at"]
     missing_data = [c for c in required_cols if c not in df.columns]
-    
+
     if missing_data:
         raise RuntimeError(f"Missing required colums {missing_data} for entity {entity} ")
     else:
@@ -53,22 +52,153 @@ def normalize_rows(
         if null_mask.any():
             bad_data = df.loc[null_mask, required_cols].head(5).to_dict(orient="records")
             raise RuntimeError(f"Null in required fields for entity {entity}, sample = {bad_data}")
-    
-    df = _flatten_nested(df)
+
+def _normalize_pandas(rows: list[dict[str, Any]], entity: str, lines_mode: str) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    df = _parse_cols_time(df, entity_schema(entity))
+    _check_required(df, entity)
+
+    if lines_mode == "json":
+        df = _flatten_nested(df)
     df["id"] = df["id"].astype("string")
-    
+    return df
+
+def _uniform_width(arr: pa.Array) -> bool:
+    # pandas infers one strptime format from the first value and coerces the rest,
+    # so only same-width strings are guaranteed to parse the same way in both engines
+    if arr.null_count == len(arr):
+        return True
+    lengths = pc.min_max(pc.utf8_length(arr))
+    return lengths["min"].as_py() == lengths["max"].as_py()
+
+def _arrow_time_col(kind: str, arr: pa.Array) -> Optional[pa.Array]:
+    if not (pa.types.is_string(arr.type) or pa.types.is_null(arr.type)):
+        return None
+    if pa.types.is_string(arr.type) and not _uniform_width(arr):
+        return None
+    if kind == "timestamp":
+        target = pa.timestamp("ns", tz="UTC")
+    else:
+        # an all-null column never reaches .dt.date in pandas and stays datetime64[ns]
+        target = pa.timestamp("ns") if pa.types.is_null(arr.type) else pa.date32()
+    try:
+        return arr.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+def _normalize_arrow(rows: list[dict[str, Any]], entity: str, lines_mode: str) -> Optional[pd.DataFrame]:
+    # None means "not provably identical to the pandas path", the caller then falls back
+    if not isinstance(rows[0], dict):
+        return None
+    keys = list(rows[0])
+    if "id" not in keys or "updated_at" not in keys:
+        return None
+    # same length + every key of the first row present (itemgetter raises otherwise) == same key set
+    if any(n != len(keys) for n in map(len, rows)):
+        return None
+
+    schema = entity_schema(entity)
+    names = [c for c in keys if c != "lines"]
+    arrays = {}
+    for c in names:
+        kind = column_kind(schema, c)
+        try:
+            # declared columns skip type inference; a value that does not fit sends the batch to pandas
+            arr = pa.array(list(map(itemgetter(c), rows)), type=ARROW_INPUT_TYPE.get(kind))
+        except (KeyError, TypeError):
+            return None
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+            return None
+        if pa.types.is_nested(arr.type):
+            return None
+        if kind == "timestamp" or kind == "date":
+            arr = _arrow_time_col(kind, arr)
+            if arr is None:
+                return None
+        arrays[c] = arr
+
+    if not (pa.types.is_integer(arrays["id"].type) or pa.types.is_string(arrays["id"].type)):
+        return None
+    if arrays["id"].null_count or arrays["updated_at"].null_count:
+        return None
+    arrays["id"] = arrays["id"].cast(pa.string())
+
+    table = pa.table(arrays)
+    order = pc.sort_indices(table, sort_keys=[("updated_at", "ascending"), ("id", "ascending")])
+    ids = table["id"].take(order)
+    updated = table["updated_at"].take(order)
+
+    # sorted on (updated_at, id), so duplicates are adjacent and keep="last" is "differs from the next row"
+    keep = np.ones(len(order), dtype=bool)
+    if len(order) > 1:
+        same = pc.and_(
+            pc.equal(ids.slice(0, len(order) - 1), ids.slice(1)),
+            pc.equal(updated.slice(0, len(order) - 1), updated.slice(1)),
+        )
+        keep[:-1] = ~same.to_numpy(zero_copy_only=False)
+    order = order.filter(pa.array(keep))
+
+    df = table.take(order).to_pandas()
+    df.index = pd.Index(order.to_numpy(), dtype="int64")
+
+    for c in names:
+        if column_kind(schema, c) == "date" and df[c].isna().any():
+            df[c] = df[c].where(df[c].notna(), pd.NaT)
+    df["id"] = df["id"].astype("string")
+
+    if "lines" in keys:
+        try:
+            lines = list(map(itemgetter("lines"), map(rows.__getitem__, df.index)))
+        except (KeyError, TypeError):
+            return None
+        if lines_mode == "nested":
+            df.insert(keys.index("lines"), "lines", pd.Series(lines, index=df.index, dtype=object))
+        else:
+            # stays per row on purpose: the C encoder beats assembling the text from arrow columns
+            # (0.38s vs 0.47s per 100k orders), and lines_json must stay byte-identical to json.dumps
+            encode = _LINES_ENCODER.encode
+            df["lines_json"] = pd.Series(
+                [encode(x) if x is not None else None for x in lines], index=df.index, dtype=object
+            )
+    return df
+
+def normalize_rows(
+    rows: list[dict[str, Any]],
+    entity: str,
+    run_id: str,
+    extracted_at: datetime,
+    watermark_effective: datetime,
+    engine: str = "pandas",
+    lines_mode: str = "json"
+    ) -> pd.DataFrame:
+
+    if not rows:
+        return pd.DataFrame()
+
+    if not isinstance(rows, list):
+        raise RuntimeError(f"normalize_rows expects list[dict] but got {type(rows)}")
+
+    if engine not in NORMALIZE_ENGINES:
+        raise ValueError(f"engine must be one of {NORMALIZE_ENGINES}, got {engine}")
+
+    if lines_mode not in LINES_MODES:
+        raise ValueError(f"lines_mode must be one of {LINES_MODES}, got {lines_mode}")
+
+    if engine == "arrow":
+        df = _normalize_arrow(rows, entity, lines_mode)
+        if df is not None:
+            df["_run_id"] = run_id
+            df["_extracted_at"] = _to_utc(extracted_at)
+            df["_watermark_effective"] = _to_utc(watermark_effective)
+            return apply_schema(df, entity)
+
+    df = _normalize_pandas(rows, entity, lines_mode)
+
     df["_run_id"] = run_id
     df["_extracted_at"] = _to_utc(extracted_at)
     df["_watermark_effective"] = _to_utc(watermark_effective)
-    
+
     df = df.sort_values(["updated_at", "id"], ascending=[True, True], kind="mergesort")
     df = df.drop_duplicates(subset=["id", "updated_at"], keep="last")
-    
-    return df
-    
-    
-    
-    
-    
-        
-    
\ No newline at end of file
+
+    return apply_schema(df, entity)
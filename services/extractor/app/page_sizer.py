@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+@dataclass
+class PageSizer:
+    size: int
+    min_size: int
+    max_size: int
+    target_latency_s: float
+    grow_factor: float = 1.5
+    shrink_factor: float = 0.5
+    _short: Optional[int] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        if self.min_size < 1 or self.min_size > self.max_size:
+            raise ValueError(f"Invalid page size bounds: min={self.min_size} max={self.max_size}")
+        self.size = self._clamp(self.size)
+    
+    def _clamp(self, n: float) -> int:
+        return max(self.min_size, min(self.max_size, int(n)))
+    
+    def on_success(self, latency_s: float) -> None:
+        if latency_s <= self.target_latency_s:
+            self.size = self._clamp(self.size * self.grow_factor)
+        else:
+            # slow but successful: scale towards the size that would have hit the target
+            ratio = max(self.shrink_factor, self.target_latency_s / latency_s)
+            self.size = self._clamp(self.size * ratio)
+    
+    def on_failure(self) -> None:
+        self.size = self._clamp(self.size * self.shrink_factor)
+    
+    def on_page(self, requested: int, rows: int) -> None:
+        # a short page followed by more rows means the upstream caps `limit` below what was asked
+        if rows and self._short is not None:
+            self.max_size = max(self.min_size, self._short)
+            self.size = self._clamp(self.size)
+        self._short = rows if 0 < rows < requested else None
@@ -1,55 +1,93 @@
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import argparse
 import uuid
+from typing import Any, Iterable, Optional
 
-from services.common.config import load_config
+import pandas as pd
+import requests
+from sqlalchemy.engine import Engine
+
+from services.common.config import Config, load_config
 from services.common.db import build_engine
-from services.extractor.app.http_client import build_session
-from services.extractor.app.extract import fetch_all
+from services.common.landing import SUCCESS_MARKER, lines_dataset, run_dir
+from services.extractor.app.change_cache import suppress_unchanged
+from services.extractor.app.change_cache_repo import load_change_cache, prune_change_cache, upsert_change_cache
+from services.extractor.app.http_client import CircuitBreaker, TokenBucket, build_session
+from services.extractor.app.extract import fetch_all, iter_pages, iter_row_chunks, resume_updated_after, skip_through
 from services.extractor.app.normalize import normalize_rows
-from services.extractor.app.watermark_repo import get_watermark, upsert_watermark
-from services.extractor.app.writer_landing import write_landing
+from services.extractor.app.page_sizer import PageSizer
+from services.extractor.app.watermark_repo import (
+    delete_checkpoint, get_checkpoint, get_page_size, get_watermark, save_checkpoint, upsert_page_size, upsert_watermark
+)
+from services.extractor.app.writer_landing import commit_landing, reset_landing_parts, write_landing_part, write_lines_part
 
 logger = logging.getLogger(__name__)
 
-def main():
-    cfg = load_config()
-
-    engine = build_engine(cfg.pg_dsn)
-    
-    run_id = uuid.uuid4().hex
-    extracted_at = datetime.now(timezone.utc)
-    session = build_session()
-    entities = ["ib_receipts", "ob_orders"]
+def build_http_session(cfg: Config) -> requests.Session:
+    # 0 disables the limiter / breaker; with ENTITY_PARALLELISM=processes each process gets its own budget
+    rate_limiter = None
+    if cfg.rate_limit_per_second > 0:
+        rate_limiter = TokenBucket(cfg.rate_limit_per_second, cfg.rate_limit_burst)
+    circuit_breaker = None
+    if cfg.circuit_failure_threshold > 0:
+        circuit_breaker = CircuitBreaker(cfg.circuit_failure_threshold, cfg.circuit_reset_seconds)
     
-    for entity in entities:
-        wm_saved = get_watermark(engine, cfg.pipeline_name, entity, cfg.default_start_time)
-        wm_effective = wm_saved - timedelta(seconds=cfg.lookback_seconds)
+    return build_session(
+        pool_maxsize=cfg.fetch_concurrency,
+        rate_limiter=rate_limiter,
+        circuit_breaker=circuit_breaker,
+    )
 
-        logger.info(
-            "[%s] watermark_saved=%s watermark_effective=%s lookback_seconds=%s run_id=%s",
-            entity, wm_saved, wm_effective, cfg.lookback_seconds, run_id
-        )
+def land_and_commit(
+    cfg: Config,
+    engine: Engine,
+    entity: str,
+    run_id: str,
+    extracted_at: datetime,
+    wm_saved: datetime,
+    wm_effective: datetime,
+    chunks: Iterable[list[dict[str, Any]]],
+    checkpoint: Optional[dict[str, Any]] = None,
+    save_checkpoints: bool = False
+) -> datetime:
     
-        rows = fetch_all(
-            session=session,
-            base_url=cfg.wms_base_url,
-            entity=entity,
-            updated_after=wm_effective,
-            limit=cfg.limit,
-            request_timeout_seconds=cfg.request_timeout_seconds,
-        )
-        logger.info("[%s] fetched_rows=%s", entity, len(rows))
-        
+    fetched = 0
+    suppressed = 0
+    max_updated_at = None
+    parts = []
+    line_parts = []
+    first_part = 0
+    if checkpoint is not None:
+        # resumed run: `chunks` starts right after the last checkpointed part
+        first_part = checkpoint["part_no"] + 1
+        fetched = checkpoint["rows_fetched"]
+        max_updated_at = checkpoint["max_updated_at"]
+    parts = reset_landing_parts(cfg.landing_root, entity, run_id, first_part)
+    if cfg.landing_lines_explode:
+        line_parts = reset_landing_parts(cfg.landing_root, lines_dataset(entity), run_id, first_part)
+    cache = None
+    landed = []
+    if cfg.change_cache:
+        cache = load_change_cache(engine, cfg.pipeline_name, entity, wm_effective)
+        logger.info("[%s] change_cache entries=%s", entity, len(cache))
+    for part_no, rows in enumerate(chunks, start=first_part):
+        fetched += len(rows)
+        logger.info("[%s] fetched_rows=%s part=%s", entity, len(rows), part_no)
+
         df = normalize_rows(
             rows=rows,
             entity=entity,
             run_id=run_id,
             extracted_at=extracted_at,
             watermark_effective=wm_effective,
+            engine=cfg.normalize_engine,
+            lines_mode=cfg.landing_lines_mode,
         )
         logger.info("Normalize data for %s (rows=%s)", entity, len(rows))
-        
+
         if not df.empty:
             logger.info(
                 "[%s] updated_at min=%s max=%s",
@@ -58,39 +96,279 @@ def main():
                 df["updated_at"].max(),
             )
             logger.info("[%s] sample ids=%s", entity, df["id"].head(5).tolist())
-
+            part_max = df["updated_at"].max().to_pydatetime()
+            max_updated_at = part_max if max_updated_at is None else max(max_updated_at, part_max)
         
-        landing_file = write_landing(
+        if cache is not None and not df.empty:
+            # rows re-fetched by the lookback window that did not change since they were landed
+            kept, hashes = suppress_unchanged(df, cache)
+            suppressed += len(df) - len(kept)
+            df = kept
+            cache.update(zip(df["id"].astype(str), hashes.tolist()))
+            landed.append((df[["id", "updated_at"]], hashes))
+
+        landing_file = write_landing_part(
             df=df,
             landing_root=cfg.landing_root,
             entity=entity,
             run_id=run_id,
+            part_no=part_no,
             output_format=cfg.output_format,
+            arrow_compression=cfg.arrow_compression,
         )
+        parts.append(landing_file)
         logger.info("Data written to landing file: %s", landing_file)
         
-        if df is not None and not df.empty:
-            new_wm = df["updated_at"].max().to_pydatetime()
-        else:
-            new_wm = wm_saved
+        if cfg.landing_lines_explode:
+            line_parts.append(write_lines_part(
+                df=df,
+                landing_root=cfg.landing_root,
+                entity=entity,
+                run_id=run_id,
+                part_no=part_no,
+                output_format=cfg.output_format,
+                arrow_compression=cfg.arrow_compression,
+            ))
         
-        upsert_watermark(
-            engine=engine,
-            pipeline_name=cfg.pipeline_name,
+        if save_checkpoints and rows:
+            last = rows[-1]
+            save_checkpoint(
+                engine=engine,
+                pipeline_name=cfg.pipeline_name,
+                entity=entity,
+                run_id=run_id,
+                part_no=part_no,
+                rows_fetched=fetched,
+                # same (updated_at, id) key cursor pagination continues from
+                last_key=(str(last.get("updated_at")), last.get("id")),
+                max_updated_at=max_updated_at,
+                wm_saved=wm_saved,
+                wm_effective=wm_effective,
+                extracted_at=extracted_at,
+            )
+
+    if not parts:
+        parts.append(write_landing_part(
+            df=pd.DataFrame(),
+            landing_root=cfg.landing_root,
             entity=entity,
-            new_wm=new_wm,
             run_id=run_id,
+            part_no=0,
+            output_format=cfg.output_format,
+            arrow_compression=cfg.arrow_compression,
+        ))
+    if cfg.landing_lines_explode:
+        if not line_parts:
+            line_parts.append(write_lines_part(
+                df=pd.DataFrame(),
+                landing_root=cfg.landing_root,
+                entity=entity,
+                run_id=run_id,
+                part_no=0,
+                output_format=cfg.output_format,
+                arrow_compression=cfg.arrow_compression,
+            ))
+        # the entity marker is the run's commit point, so the lines dataset is committed first
+        commit_landing(cfg.landing_root, lines_dataset(entity), run_id, line_parts)
+    commit_landing(cfg.landing_root, entity, run_id, parts)
+    
+    if cache is not None:
+        # only after the commit, rows of a run that never committed must be fetched and landed again
+        for keys, hashes in landed:
+            upsert_change_cache(engine, cfg.pipeline_name, entity, keys, hashes)
+        pruned = prune_change_cache(engine, cfg.pipeline_name, entity, wm_effective)
+        logger.info("[%s] change_cache suppressed=%s pruned=%s", entity, suppressed, pruned)
+
+    if max_updated_at is not None:
+        new_wm = max_updated_at
+    else:
+        new_wm = wm_saved
+
+    upsert_watermark(
+        engine=engine,
+        pipeline_name=cfg.pipeline_name,
+        entity=entity,
+        new_wm=new_wm,
+        run_id=run_id,
+    )
+    logger.info("Watermark updated new_wm=%s", new_wm)
+    if save_checkpoints:
+        delete_checkpoint(engine, cfg.pipeline_name, entity, run_id)
+
+    logger.info(
+        "[%s] wm_saved=%s wm_effective=%s fetched=%s suppressed=%s new_wm=%s",
+        entity,
+        wm_saved,
+        wm_effective,
+        fetched,
+        suppressed,
+        new_wm,
+    )
+    return new_wm
+
+def extract_entity(
+    cfg: Config,
+    engine: Engine,
+    session: requests.Session,
+    entity: str,
+    run_id: str,
+    extracted_at: datetime
+) -> datetime:
+    
+    wm_saved = get_watermark(engine, cfg.pipeline_name, entity, cfg.default_start_time)
+    if (run_dir(cfg.landing_root, entity, run_id) / SUCCESS_MARKER).exists():
+        # rerun of a run_id where this entity already committed, only the failed entities go again
+        logger.info("[%s] run_id=%s already committed, skipping", entity, run_id)
+        return wm_saved
+    
+    # checkpoints need parts: without LANDING_PART_ROWS the whole run is a single part
+    save_checkpoints = cfg.extract_checkpoint and cfg.landing_part_rows > 0
+    checkpoint = get_checkpoint(engine, cfg.pipeline_name, entity, run_id) if save_checkpoints else None
+    if checkpoint is not None:
+        # keep the window and metadata of the failed attempt so the resumed parts line up with the landed ones
+        wm_saved = checkpoint["wm_saved"]
+        extracted_at = checkpoint["extracted_at"]
+        logger.info(
+            "[%s] resuming run_id=%s after part=%s rows=%s",
+            entity, run_id, checkpoint["part_no"], checkpoint["rows_fetched"]
         )
-        logger.info("Watermark updated new_wm=%s", new_wm)
-        
+    wm_effective = checkpoint["wm_effective"] if checkpoint else wm_saved - timedelta(seconds=cfg.lookback_seconds)
+
+    logger.info(
+        "[%s] watermark_saved=%s watermark_effective=%s lookback_seconds=%s run_id=%s",
+        entity, wm_saved, wm_effective, cfg.lookback_seconds, run_id
+    )
+
+    page_sizer = None
+    if cfg.adaptive_page_size:
+        saved_size = get_page_size(engine, cfg.pipeline_name, entity)
+        page_sizer = PageSizer(
+            size=saved_size or cfg.limit,
+            min_size=cfg.limit_min,
+            max_size=cfg.limit_max,
+            target_latency_s=cfg.page_target_latency_ms / 1000,
+        )
+        logger.info("[%s] adaptive page size start=%s saved=%s", entity, page_sizer.size, saved_size)
+
+    if cfg.landing_part_rows > 0:
+        last_key = (checkpoint["last_updated_at"], checkpoint["last_id"]) if checkpoint else None
+        updated_after = wm_effective
+        if last_key is not None and cfg.pagination_mode == "offset":
+            # a raw row offset shifts when rows of the window change between attempts,
+            # so offset mode restarts from the saved key and drops what was already landed
+            updated_after = resume_updated_after(last_key)
+        pages = iter_pages(
+            session=session,
+            base_url=cfg.wms_base_url,
+            entity=entity,
+            updated_after=updated_after,
+            limit=cfg.limit,
+            request_timeout_seconds=cfg.request_timeout_seconds,
+            max_workers=cfg.fetch_concurrency,
+            pagination=cfg.pagination_mode,
+            page_sizer=page_sizer,
+            start_after=last_key,
+        )
+        if last_key is not None and cfg.pagination_mode == "offset":
+            pages = skip_through(pages, last_key)
+        chunks = iter_row_chunks(pages, cfg.landing_part_rows)
+    else:
+        chunks = iter([fetch_all(
+            session=session,
+            base_url=cfg.wms_base_url,
+            entity=entity,
+            updated_after=wm_effective,
+            limit=cfg.limit,
+            request_timeout_seconds=cfg.request_timeout_seconds,
+            max_workers=cfg.fetch_concurrency,
+            pagination=cfg.pagination_mode,
+            page_sizer=page_sizer,
+        )])
+
+    new_wm = land_and_commit(
+        cfg=cfg,
+        engine=engine,
+        entity=entity,
+        run_id=run_id,
+        extracted_at=extracted_at,
+        wm_saved=wm_saved,
+        wm_effective=wm_effective,
+        chunks=chunks,
+        checkpoint=checkpoint,
+        save_checkpoints=save_checkpoints,
+    )
+    
+    if page_sizer is not None:
+        upsert_page_size(engine, cfg.pipeline_name, entity, page_sizer.size)
+        logger.info("[%s] adaptive page size saved=%s", entity, page_sizer.size)
+    return new_wm
+
+def run_entity_worker(
+    cfg: Config,
+    entity: str,
+    run_id: str,
+    extracted_at: datetime
+) -> dict[str, Any]:
+    # owns its own engine and session so it can run on a thread or in a child process
+    started = time.monotonic()
+    try:
+        engine = build_engine(cfg.pg_dsn)
+        session = build_http_session(cfg)
+        new_wm = extract_entity(cfg, engine, session, entity, run_id, extracted_at)
+        status = {"entity": entity, "status": "success", "new_wm": new_wm.isoformat(), "error": None}
+    except Exception as e:
+        logger.exception("[%s] extract failed run_id=%s", entity, run_id)
+        status = {"entity": entity, "status": "failed", "new_wm": None, "error": str(e)}
+    
+    status["seconds"] = round(time.monotonic() - started, 3)
+    return status
+
+def _run_parallel(
+    cfg: Config,
+    entities: list[str],
+    run_id: str,
+    extracted_at: datetime
+) -> list[dict[str, Any]]:
+    
+    pool_cls = ProcessPoolExecutor if cfg.entity_parallelism == "processes" else ThreadPoolExecutor
+    with pool_cls(max_workers=len(entities)) as pool:
+        futures = [pool.submit(run_entity_worker, cfg, entity, run_id, extracted_at) for entity in entities]
+        statuses = [fut.result() for fut in futures]
+    
+    for st in statuses:
         logger.info(
-            "[%s] wm_saved=%s wm_effective=%s fetched=%s new_wm=%s",
-            entity,
-            wm_saved,
-            wm_effective,
-            len(rows),
-            new_wm,
+            "[%s] entity_status=%s seconds=%s new_wm=%s error=%s",
+            st["entity"], st["status"], st["seconds"], st["new_wm"], st["error"]
         )
+    
+    failed = [st["entity"] for st in statuses if st["status"] != "success"]
+    if failed:
+        raise RuntimeError(f"Extract failed for entities {failed} run_id={run_id}")
+    return statuses
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--run-id", dest="run_id", default=None,
+                   help="rerun a failed run_id; with EXTRACT_CHECKPOINT it resumes after the last landed part")
+    return p.parse_args(args)
+
+def main(args: Optional[list[str]] = None):
+    args = parse_args(args)
+    cfg = load_config()
+    
+    run_id = args.run_id or uuid.uuid4().hex
+    extracted_at = datetime.now(timezone.utc)
+    entities = ["ib_receipts", "ob_orders"]
+    
+    if cfg.entity_parallelism != "none":
+        _run_parallel(cfg, entities, run_id, extracted_at)
+        return
+
+    engine = build_engine(cfg.pg_dsn)
+    session = build_http_session(cfg)
+    
+    for entity in entities:
+        extract_entity(cfg, engine, session, entity, run_id, extracted_at)
 
     
 if __name__ == "__main__":
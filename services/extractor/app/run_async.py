@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import uuid
+
+import requests
+from sqlalchemy.engine import Engine
+
+from services.common.config import Config, load_config
+from services.common.db import build_engine
+from services.extractor.app.extract import fetch_all_async, iter_row_chunks
+from services.extractor.app.run import build_http_session, land_and_commit
+from services.extractor.app.watermark_repo import get_watermark
+
+logger = logging.getLogger(__name__)
+
+async def _run_entity(
+    cfg: Config,
+    engine: Engine,
+    session: requests.Session,
+    semaphore: asyncio.Semaphore,
+    entity: str,
+    run_id: str,
+    extracted_at: datetime
+) -> datetime:
+    
+    wm_saved = await asyncio.to_thread(get_watermark, engine, cfg.pipeline_name, entity, cfg.default_start_time)
+    wm_effective = wm_saved - timedelta(seconds=cfg.lookback_seconds)
+    
+    logger.info(
+        "[%s] watermark_saved=%s watermark_effective=%s lookback_seconds=%s run_id=%s",
+        entity, wm_saved, wm_effective, cfg.lookback_seconds, run_id
+    )
+    
+    rows = await fetch_all_async(
+        session=session,
+        base_url=cfg.wms_base_url,
+        entity=entity,
+        updated_after=wm_effective,
+        limit=cfg.limit,
+        request_timeout_seconds=cfg.request_timeout_seconds,
+        semaphore=semaphore,
+        pagination=cfg.pagination_mode,
+    )
+    chunks = iter_row_chunks([rows], cfg.landing_part_rows) if cfg.landing_part_rows > 0 else iter([rows])
+    
+    # normalize, landing and watermark are blocking; keep them off the event loop
+    return await asyncio.to_thread(
+        land_and_commit,
+        cfg=cfg,
+        engine=engine,
+        entity=entity,
+        run_id=run_id,
+        extracted_at=extracted_at,
+        wm_saved=wm_saved,
+        wm_effective=wm_effective,
+        chunks=chunks,
+    )
+
+async def main_async(entities: list[str]) -> dict[str, datetime]:
+    cfg = load_config()
+    
+    engine = build_engine(cfg.pg_dsn)
+    
+    run_id = uuid.uuid4().hex
+    extracted_at = datetime.now(timezone.utc)
+    session = build_http_session(cfg)
+    
+    # one slot per pooled connection, shared by every entity and page of this run
+    semaphore = asyncio.Semaphore(cfg.fetch_concurrency)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=cfg.fetch_concurrency + len(entities)))
+    
+    results = await asyncio.gather(
+        *(_run_entity(cfg, engine, session, semaphore, entity, run_id, extracted_at) for entity in entities),
+        return_exceptions=True,
+    )
+    
+    failed = []
+    new_wms: dict[str, datetime] = {}
+    for entity, res in zip(entities, results):
+        if isinstance(res, BaseException):
+            logger.error("[%s] extract failed run_id=%s", entity, run_id, exc_info=res)
+            failed.append(entity)
+        else:
+            new_wms[entity] = res
+    
+    if failed:
+        raise RuntimeError(f"Extract failed for entities {failed} run_id={run_id}")
+    return new_wms
+
+def main():
+    asyncio.run(main_async(["ib_receipts", "ob_orders"]))
+
+    
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s - %(message)s",
+    )
+    main()
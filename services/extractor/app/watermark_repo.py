@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
@@ -61,4 +61,134 @@ def upsert_watermark(
             "t": _to_utc(new_wm),
             "r": run_id
             
-        })
\ No newline at end of file
+        })
+
+def get_page_size(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str
+) -> Optional[int]:
+    sql = text("""
+               SELECT page_size
+               FROM etl_page_size
+               WHERE pipeline_name = :p AND entity = :e
+               """)
+    with engine.connect() as conn:
+        row = conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity
+        }).fetchone()
+        
+        return int(row[0]) if row else None
+
+def upsert_page_size(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    page_size: int
+) -> None:
+    
+    sql = text("""
+               INSERT INTO etl_page_size (pipeline_name, entity, page_size)
+               VALUES(:p, :e, :s)
+               ON CONFLICT (pipeline_name, entity)
+               DO UPDATE SET
+                page_size = excluded.page_size,
+                updated_at = NOW()
+               """)
+    with engine.begin() as conn:
+        conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "s": page_size
+        })
+
+def get_checkpoint(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    run_id: str
+) -> Optional[dict[str, Any]]:
+    sql = text("""
+               SELECT part_no, rows_fetched, last_updated_at, last_id, max_updated_at,
+                      wm_saved, wm_effective, extracted_at
+               FROM etl_checkpoint
+               WHERE pipeline_name = :p AND entity = :e AND run_id = :r
+               """)
+    with engine.connect() as conn:
+        row = conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "r": run_id
+        }).mappings().fetchone()
+        
+        if not row:
+            return None
+        
+        cp = dict(row)
+        for k in ("max_updated_at", "wm_saved", "wm_effective", "extracted_at"):
+            if cp[k] is not None:
+                cp[k] = _to_utc(cp[k])
+        return cp
+
+def save_checkpoint(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    run_id: str,
+    part_no: int,
+    rows_fetched: int,
+    last_key: tuple[str, Any],
+    max_updated_at: Optional[datetime],
+    wm_saved: datetime,
+    wm_effective: datetime,
+    extracted_at: datetime
+) -> None:
+    
+    sql = text("""
+               INSERT INTO etl_checkpoint (
+                pipeline_name, entity, run_id, part_no, rows_fetched, last_updated_at, last_id,
+                max_updated_at, wm_saved, wm_effective, extracted_at
+               )
+               VALUES(:p, :e, :r, :n, :rows, :lu, :li, :mx, :ws, :we, :ex)
+               ON CONFLICT (pipeline_name, entity, run_id)
+               DO UPDATE SET
+                part_no = excluded.part_no,
+                rows_fetched = excluded.rows_fetched,
+                last_updated_at = excluded.last_updated_at,
+                last_id = excluded.last_id,
+                max_updated_at = excluded.max_updated_at,
+                updated_at = NOW()
+               """)
+    with engine.begin() as conn:
+        conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "r": run_id,
+            "n": part_no,
+            "rows": rows_fetched,
+            "lu": last_key[0],
+            "li": None if last_key[1] is None else str(last_key[1]),
+            "mx": None if max_updated_at is None else _to_utc(max_updated_at),
+            "ws": _to_utc(wm_saved),
+            "we": _to_utc(wm_effective),
+            "ex": _to_utc(extracted_at)
+        })
+
+def delete_checkpoint(
+    engine: Engine,
+    pipeline_name: str,
+    entity: str,
+    run_id: str
+) -> None:
+    
+    sql = text("""
+               DELETE FROM etl_checkpoint
+               WHERE pipeline_name = :p AND entity = :e AND run_id = :r
+               """)
+    with engine.begin() as conn:
+        conn.execute(sql, {
+            "p": pipeline_name,
+            "e": entity,
+            "r": run_id
+        })
@@ -1,10 +1,25 @@
+import inspect
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import uuid
 import logging
 
+from services.common.manifest import build_manifest, write_manifest
+from services.common.schema import ARROW_OUTPUT_TYPE, LINE_KEYS_FIELD, LINE_SCHEMA, apply_schema, lines_array
+from services.common.landing import (
+    SUCCESS_MARKER, is_part_file, lines_dataset, parquet_layout, part_name, part_number, run_dir as landing_run_dir
+)
+
 logger = logging.getLogger(__name__)
 
+# bloom filters need a recent pyarrow; older writers simply go without them
+_BLOOM_FILTERS = "bloom_filter_options" in inspect.signature(pq.ParquetWriter.__init__).parameters
+
 def _ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
     
@@ -13,47 +28,237 @@ def _atomic_replace(src: Path, dst: Path) -> None:
     src.replace(dst)
     
 
-def write_landing(
+def _check_format(output_format: str) -> str:
+    output_format = output_format.lower().strip()
+    
+    if output_format not in ("parquet", "csv", "arrow"):
+        raise ValueError(f"Unsupported output_format: {output_format}")
+    
+    return output_format
+
+def write_parquet(table: pa.Table, path: Path, dataset: str) -> None:
+    layout = parquet_layout(dataset)
+    names = table.column_names
+    
+    sort_keys = [(c, "ascending") for c in layout.sort_by if c in names]
+    if sort_keys and table.num_rows > 1:
+        table = table.sort_by(sort_keys)
+    
+    options = {}
+    if sort_keys:
+        options["sorting_columns"] = pq.SortingColumn.from_ordering(table.schema, sort_keys)
+    bloom = [c for c in layout.bloom_filter_columns if c in names]
+    if _BLOOM_FILTERS and bloom and table.num_rows:
+        ndv = min(table.num_rows, layout.row_group_rows)
+        options["bloom_filter_options"] = {c: {"ndv": ndv, "fpp": 0.05} for c in bloom}
+    
+    pq.write_table(
+        table,
+        path,
+        compression=layout.compression,
+        compression_level=layout.compression_level,
+        row_group_size=layout.row_group_rows,
+        use_dictionary=[c for c in names if c not in layout.plain_columns],
+        write_statistics=True,
+        write_page_index=layout.write_page_index,
+        **options,
+    )
+
+def write_arrow(table: pa.Table, path: Path, dataset: str, compression: str = "uncompressed") -> None:
+    # same row order as parquet; uncompressed files are memory-mapped by staging without decoding a single buffer
+    layout = parquet_layout(dataset)
+    sort_keys = [(c, "ascending") for c in layout.sort_by if c in table.column_names]
+    if sort_keys and table.num_rows > 1:
+        table = table.sort_by(sort_keys)
+    feather.write_feather(table, str(path), compression=compression, chunksize=layout.row_group_rows)
+
+def _write_table(table: pa.Table, path: Path, dataset: str, output_format: str, arrow_compression: str) -> None:
+    if output_format == "parquet":
+        write_parquet(table, path, dataset)
+    elif output_format == "arrow":
+        write_arrow(table, path, dataset, arrow_compression)
+    else:
+        table.to_pandas().to_csv(path, index=False)
+
+def write_landing_part(
     df: pd.DataFrame,
     landing_root: Path,
     entity: str,
     run_id: str,
-    output_format: str = "parquet"
+    part_no: int,
+    output_format: str = "parquet",
+    arrow_compression: str = "uncompressed"
 ) -> Path:
     
-    output_format = output_format.lower().strip()
+    output_format = _check_format(output_format)
     
-    if output_format not in ("parquet", "csv"):
-        raise ValueError(f"Unsupported output_format: {output_format}")
-    
-    run_dir = landing_root / entity / f"run_id={run_id}"
+    run_dir = landing_run_dir(landing_root, entity, run_id)
     
     _ensure_dir(run_dir)
     
-    ext = "parquet" if output_format == "parquet" else "csv"
+    ext = output_format
     
-    final_path = run_dir / f"part-000.{ext}"
+    final_path = run_dir / part_name(part_no, ext)
     
     
     if final_path.exists():
         raise RuntimeError(f"Landing output already exists: {final_path}")
     
     
-    tmp_path = run_dir / f"part-000.{uuid.uuid4().hex}.tmp.{ext}"
+    tmp_path = run_dir / f"part-{part_no:03d}.{uuid.uuid4().hex}.tmp.{ext}"
     
     if df is None or df.empty:
         logger.info("[%s] empty dataframe, writing empty landing file", entity)
-    
-    if output_format == "parquet":
-        df.to_parquet(tmp_path, index=False)
     else:
+        df = apply_schema(df.copy(deep=False), entity)
+    
+    if "lines" in df.columns:
+        if output_format == "csv":
+            raise ValueError(f"Nested lines need parquet or arrow landing, got output_format={output_format}")
+        _write_table(_with_nested_lines(df, entity), tmp_path, entity, output_format, arrow_compression)
+    elif output_format == "csv":
         df.to_csv(tmp_path, index=False)
+    else:
+        _write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path, entity, output_format, arrow_compression)
     
     _atomic_replace(tmp_path, final_path)
     
     logger.info("[%s] wrote landing file: %s (rows=%s)",entity, final_path, len(df))
     return final_path
+
+def _with_nested_lines(df: pd.DataFrame, entity: str) -> pa.Table:
+    table = pa.Table.from_pandas(df.drop(columns=["lines"]), preserve_index=False)
+    return table.add_column(df.columns.get_loc("lines"), "lines", lines_array(df["lines"].tolist(), entity))
+
+def explode_lines(df: pd.DataFrame, entity: str) -> pa.Table:
+    """One row per line item keyed by the parent's (id, updated_at), item fields as typed columns."""
+    lines = lines_array(df["lines"].tolist(), entity)
+    parent = pc.list_parent_indices(lines)
+    items = lines.flatten()
+    offsets = lines.offsets.to_numpy()
+    parent_np = parent.to_numpy()
+
+    columns = {
+        "parent_id": pa.array(df["id"], pa.string()).take(parent),
+        "parent_updated_at": pa.array(df["updated_at"], ARROW_OUTPUT_TYPE["timestamp"]).take(parent),
+        "line_no": pa.array(np.arange(len(items), dtype=np.int32) - offsets[:-1][parent_np]),
+    }
+    declared = LINE_SCHEMA.get(entity, {})
+    for i in range(items.type.num_fields):
+        name = items.type.field(i).name
+        if name == LINE_KEYS_FIELD:
+            # an exploded line has one column per key, absent keys are null there anyway
+            continue
+        child = items.field(i)
+        if declared.get(name) == "category":
+            child = child.cast(ARROW_OUTPUT_TYPE["category"])
+        columns[name] = child
+    if "_run_id" in df.columns:
+        columns["_run_id"] = pa.array(df["_run_id"].astype(str), pa.string()).take(parent).cast(ARROW_OUTPUT_TYPE["category"])
+    if "_extracted_at" in df.columns:
+        columns["_extracted_at"] = pa.array(df["_extracted_at"], ARROW_OUTPUT_TYPE["timestamp"]).take(parent)
+    return pa.table(columns)
+
+def write_lines_part(
+    df: pd.DataFrame,
+    landing_root: Path,
+    entity: str,
+    run_id: str,
+    part_no: int,
+    output_format: str = "parquet",
+    arrow_compression: str = "uncompressed"
+) -> Path:
     
+    output_format = _check_format(output_format)
+    dataset = lines_dataset(entity)
+    run_dir = landing_run_dir(landing_root, dataset, run_id)
+    _ensure_dir(run_dir)
     
+    ext = output_format
+    final_path = run_dir / part_name(part_no, ext)
+    if final_path.exists():
+        raise RuntimeError(f"Landing output already exists: {final_path}")
+    tmp_path = run_dir / f"part-{part_no:03d}.{uuid.uuid4().hex}.tmp.{ext}"
+    
+    if df is None or df.empty or "lines" not in df.columns:
+        table = pa.table({"parent_id": pa.array([], pa.string())})
+    else:
+        table = explode_lines(df, entity)
+    
+    _write_table(table, tmp_path, dataset, output_format, arrow_compression)
+    
+    _atomic_replace(tmp_path, final_path)
+    
+    logger.info("[%s] wrote landing file: %s (rows=%s)", dataset, final_path, table.num_rows)
+    return final_path
+
+def reset_landing_parts(
+    landing_root: Path,
+    dataset: str,
+    run_id: str,
+    keep_parts: int
+) -> list[Path]:
+    """Parts a resumed run keeps (part_no < keep_parts); later parts and temp files of the failed attempt are removed."""
+    run_dir = landing_run_dir(landing_root, dataset, run_id)
+    if not run_dir.exists():
+        return []
+    if (run_dir / SUCCESS_MARKER).exists():
+        raise RuntimeError(f"Landing run already committed: {run_dir}")
+    
+    kept = []
+    for p in run_dir.glob("part-*"):
+        if is_part_file(p) and part_number(p) < keep_parts:
+            kept.append(p)
+        else:
+            p.unlink()
+            logger.info("[%s] removed unsaved landing file: %s", dataset, p)
+    
+    if len(kept) != keep_parts:
+        raise RuntimeError(f"Checkpoint expects {keep_parts} landed parts, found {len(kept)}: {run_dir}")
+    # numeric order: part-1000 sorts before part-101 as a string
+    return sorted(kept, key=part_number)
+
+def commit_landing(
+    landing_root: Path,
+    entity: str,
+    run_id: str,
+    parts: list[Path]
+) -> Path:
+    
+    run_dir = landing_run_dir(landing_root, entity, run_id)
+    marker = run_dir / SUCCESS_MARKER
+    
+    if marker.exists():
+        raise RuntimeError(f"Landing run already committed: {run_dir}")
+    
+    # stats are taken from the finished files (parquet footers), the marker below stays the commit point
+    manifest = build_manifest(entity, run_id, parts)
+    write_manifest(run_dir, manifest)
+    
+    tmp_path = run_dir / f"{SUCCESS_MARKER}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_text("".join(f"{p.name}\n" for p in parts), encoding="utf-8")
+    _atomic_replace(tmp_path, marker)
+    
+    logger.info("[%s] committed landing run: %s (parts=%s rows=%s)", entity, run_dir, len(parts), manifest["rows"])
+    return marker
+
+def write_landing(
+    df: pd.DataFrame,
+    landing_root: Path,
+    entity: str,
+    run_id: str,
+    output_format: str = "parquet",
+    arrow_compression: str = "uncompressed"
+) -> Path:
     
-    
\ No newline at end of file
+    final_path = write_landing_part(
+        df=df,
+        landing_root=landing_root,
+        entity=entity,
+        run_id=run_id,
+        part_no=0,
+        output_format=output_format,
+        arrow_compression=arrow_compression,
+    )
+    commit_landing(landing_root, entity, run_id, [final_path])
+    return final_path
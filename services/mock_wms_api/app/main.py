@@ -2,14 +2,19 @@ from __future__ import annotations
 
 from datetime import datetime, timezone, timedelta
 from enum import Enum
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import uuid4
+from bisect import bisect_left, bisect_right
+import json
+import os
 import random
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel, Field
 
 app = FastAPI(title="Mock WMS API", version="0.1.0")
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 # ---------- Helpers ----------
@@ -121,12 +126,87 @@ DB: Dict[str, List[Dict[str, Any]]] = {
 }
 
 
-def seed_data():
+class SortedIndex:
+    """
+    (updated_at, id) ordered view over one entity's rows, with timestamps parsed once.
+    Rows are shared with DB; any updated_at change must go through touch().
+    """
+
+    def __init__(self) -> None:
+        self.keys: List[Tuple[datetime, str]] = []
+        self.rows: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def row_key(row: Dict[str, Any]) -> Tuple[datetime, str]:
+        return (datetime.fromisoformat(row["updated_at"]), row["id"])
+
+    def rebuild(self, rows: List[Dict[str, Any]]) -> None:
+        pairs = sorted(((self.row_key(r), r) for r in rows), key=lambda p: p[0])
+        self.keys = [k for k, _ in pairs]
+        self.rows = [r for _, r in pairs]
+
+    def add(self, row: Dict[str, Any]) -> None:
+        key = self.row_key(row)
+        i = bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, row)
+
+    def remove(self, row: Dict[str, Any]) -> None:
+        key = self.row_key(row)
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError(f"Row not indexed: {key}")
+        del self.keys[i]
+        del self.rows[i]
+
+    def touch(self, row: Dict[str, Any], updated_at: datetime) -> None:
+        self.remove(row)
+        row["updated_at"] = iso(updated_at)
+        self.add(row)
+
+    def start(self, updated_after: Optional[datetime], after_id: Optional[str]) -> int:
+        if updated_after is None:
+            return 0
+        if after_id is None:
+            return bisect_right(self.keys, updated_after, key=lambda k: k[0])
+        return bisect_right(self.keys, (updated_after, after_id))
+
+
+INDEX: Dict[str, SortedIndex] = {
+    "ib": SortedIndex(),
+    "ob": SortedIndex(),
+}
+
+
+# Serialized JSON per record id, filled on first read and dropped whenever the record changes.
+RECORD_JSON: Dict[str, bytes] = {}
+
+
+def record_json(row: Dict[str, Any]) -> bytes:
+    cached = RECORD_JSON.get(row["id"])
+    if cached is None:
+        cached = json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        RECORD_JSON[row["id"]] = cached
+    return cached
+
+
+def render_page(page: Dict[str, Any]) -> Response:
+    body = b"".join([
+        b'{"data":[',
+        b",".join(record_json(x) for x in page["data"]),
+        b'],"meta":',
+        json.dumps(page["meta"], separators=(",", ":")).encode("utf-8"),
+        b"}",
+    ])
+    return Response(content=body, media_type="application/json")
+
+
+def seed_data(n_ib: int = 3000, n_ob: int = 3000, lines_per_order: int = 2):
     random.seed(7)
     base_time = now_utc() - timedelta(hours=6)
 
     # Seed IB
-    for i in range(3000):
+    for i in range(n_ib):
         t = base_time + timedelta(minutes=i * 5)
         receipt = IBReceipt(
             po_code=f"PO{20250000 + i}",
@@ -143,14 +223,14 @@ def seed_data():
             updated_by="system",
             updated_at=iso(t),
             lines=[
-                IBLine(product_id=1001, sku="SKU-1001", qty_unit_id=1, expected_qty=random.randint(5, 30)),
-                IBLine(product_id=1002, sku="SKU-1002", qty_unit_id=1, expected_qty=random.randint(5, 30)),
+                IBLine(product_id=1001 + k, sku=f"SKU-{1001 + k}", qty_unit_id=1, expected_qty=random.randint(5, 30))
+                for k in range(lines_per_order)
             ],
         )
         DB["ib"].append(receipt.model_dump())
 
     # Seed OB
-    for i in range(3000):
+    for i in range(n_ob):
         t = base_time + timedelta(minutes=i * 4)
         order = OBOrder(
             so_code=f"SO{20250000 + i}",
@@ -171,14 +251,28 @@ def seed_data():
             updated_by="system",
             updated_at=iso(t),
             lines=[
-                OBLine(product_id=1001, sku="SKU-1001", qty=random.randint(1, 5)),
-                OBLine(product_id=1003, sku="SKU-1003", qty=random.randint(1, 5)),
+                OBLine(product_id=1001 + 2 * k, sku=f"SKU-{1001 + 2 * k}", qty=random.randint(1, 5))
+                for k in range(lines_per_order)
             ],
         )
         DB["ob"].append(order.model_dump())
 
+    for name, rows in DB.items():
+        INDEX[name].rebuild(rows)
 
-seed_data()
+
+def reset_data(n_ib: int, n_ob: int, lines_per_order: int = 2):
+    for rows in DB.values():
+        rows.clear()
+    RECORD_JSON.clear()
+    seed_data(n_ib, n_ob, lines_per_order)
+
+
+seed_data(
+    n_ib=int(os.getenv("MOCK_SEED_IB", "3000")),
+    n_ob=int(os.getenv("MOCK_SEED_OB", "3000")),
+    lines_per_order=int(os.getenv("MOCK_LINES_PER_ORDER", "2")),
+)
 
 
 # ---------- Status transitions ----------
@@ -209,6 +303,33 @@ def ob_next_status(s: OBStatus) -> OBStatus:
 
 
 
+# ---------- Paging ----------
+def page_items(
+    index: SortedIndex,
+    updated_after: Optional[datetime],
+    after_id: Optional[str],
+    limit: int,
+    offset: int,
+) -> Dict[str, Any]:
+    """
+    Rows ordered by (updated_at, id).
+    - updated_after only: rows with updated_at > updated_after (offset paging)
+    - updated_after + after_id: rows with (updated_at, id) > (updated_after, after_id) (keyset paging)
+    """
+    start = index.start(ensure_utc(updated_after), after_id)
+    lo = start + offset
+    data = index.rows[lo : lo + limit]
+
+    next_cursor = None
+    if len(data) == limit:
+        next_cursor = {"updated_after": data[-1]["updated_at"], "after_id": data[-1]["id"]}
+
+    return {
+        "data": data,
+        "meta": {"limit": limit, "offset": offset, "count": len(index.rows) - start, "next_cursor": next_cursor},
+    }
+
+
 # ---------- API ----------
 @app.get("/health")
 def health():
@@ -218,38 +339,21 @@ def health():
 @app.get("/ib/receipts")
 def get_ib_receipts(
     updated_after: Optional[datetime] = Query(default=None, description="ISO8601 datetime with timezone"),
-    limit: int = Query(default=100, ge=1, le=500),
+    limit: int = Query(default=100, ge=1, le=5000),
     offset: int = Query(default=0, ge=0),
+    after_id: Optional[str] = Query(default=None, description="Keyset cursor: id of the last row of the previous page"),
 ):
-    items = sorted(DB["ib"], key=lambda x: (x["updated_at"], x["id"]))
-    updated_after = ensure_utc(updated_after)
-    
-    if updated_after:
-        items = [x for x in items if datetime.fromisoformat(x["updated_at"]) > updated_after]
-        
-
-    return {
-        "data": items[offset : offset + limit],
-        "meta": {"limit": limit, "offset": offset, "count": len(items)},
-    }
+    return render_page(page_items(INDEX["ib"], updated_after, after_id, limit, offset))
 
 
 @app.get("/ob/orders")
 def get_ob_orders(
     updated_after: Optional[datetime] = Query(default=None, description="ISO8601 datetime with timezone"),
-    limit: int = Query(default=100, ge=1, le=500),
+    limit: int = Query(default=100, ge=1, le=5000),
     offset: int = Query(default=0, ge=0),
+    after_id: Optional[str] = Query(default=None, description="Keyset cursor: id of the last row of the previous page"),
 ):
-    items = sorted(DB["ob"], key=lambda x: (x["updated_at"], x["id"]))
-    updated_after = ensure_utc(updated_after)
-    
-    if updated_after:
-        items = [x for x in items if datetime.fromisoformat(x["updated_at"]) > updated_after]
-
-    return {
-        "data": items[offset : offset + limit],
-        "meta": {"limit": limit, "offset": offset, "count": len(items)},
-    }
+    return render_page(page_items(INDEX["ob"], updated_after, after_id, limit, offset))
 
 
 @app.post("/simulate/tick")
@@ -264,21 +368,24 @@ def simulate_tick(
     """
     t = now_utc()
     cancel_prob = 0.05
+    sampled: List[Dict[str, Any]] = []
     # choose random IB receipts to mutate
-    for x in random.sample(DB["ib"], k=min(n_changes, len(DB["ib"]))):
+    ib_sample = random.sample(DB["ib"], k=min(n_changes, len(DB["ib"])))
+    sampled.extend(ib_sample)
+    for x in ib_sample:
         if x["status"] in (IBStatus.CANCELLED.value, IBStatus.FINISHED.value):
             continue
 
         if (x["status"] == IBStatus.NEW.value) and (random.random() < cancel_prob):
             x["status"] = IBStatus.CANCELLED.value
-            x["updated_at"] = iso(t)
+            INDEX["ib"].touch(x, t)
             x["updated_by"] = "simulator"
             continue
         
         old = x["status"]
         new = ib_next_status(IBStatus(old))
         x["status"] = new.value
-        x["updated_at"] = iso(t)
+        INDEX["ib"].touch(x, t)
         x["updated_by"] = "simulator"
 
         # simulate receiving: actual_qty increases during PROCESSING
@@ -292,23 +399,29 @@ def simulate_tick(
             x["finished_at"] = iso(t)
 
     # choose random OB orders to mutate
-    for x in random.sample(DB["ob"], k=min(n_changes, len(DB["ob"]))):
+    ob_sample = random.sample(DB["ob"], k=min(n_changes, len(DB["ob"])))
+    sampled.extend(ob_sample)
+    for x in ob_sample:
         if x["status"] in (OBStatus.CANCELLED.value, OBStatus.PACKED.value):
             continue
         
         if random.random() < cancel_prob:
             x["status"] = OBStatus.CANCELLED.value
-            x["updated_at"] = iso(t)
+            INDEX["ob"].touch(x, t)
             x["updated_by"] = "simulator"
             continue
         old = x["status"]
         new = ob_next_status(OBStatus(old))
         x["status"] = new.value
-        x["updated_at"] = iso(t)
+        INDEX["ob"].touch(x, t)
         x["updated_by"] = "simulator"
 
         if new == OBStatus.PACKED:
             x["actual_amount"] = x["total_amount"]
             x["actual_delivery_date"] = t.date().isoformat()
 
+    # drop cached JSON only after every mutation landed, so a concurrent read cannot pin a half-updated row
+    for x in sampled:
+        RECORD_JSON.pop(x["id"], None)
+
     return {"ok": True, "changed": n_changes, "time_utc": iso(t)}
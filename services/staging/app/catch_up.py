@@ -0,0 +1,28 @@
+from pathlib import Path
+import pandas as pd
+
+from services.common.landing import SUCCESS_MARKER, run_dir
+from services.common.manifest import read_manifest, select_runs
+
+def _committed_at(landing_root: Path, entity: str, run_id: str) -> str:
+    path = run_dir(landing_root, entity, run_id)
+    manifest = read_manifest(path)
+    if manifest is not None:
+        return manifest["created_at"]
+    return pd.Timestamp((path / SUCCESS_MARKER).stat().st_mtime, unit="s", tz="UTC").isoformat()
+
+def pending_runs(landing_root: Path, entity: str, staged_run_ids: set[str], max_runs: int) -> list[str]:
+    """Committed runs staging has not finished for `entity`, oldest landing first."""
+    runs = [r for r in select_runs(landing_root, entity, skip_empty=False) if r not in staged_run_ids]
+    # run ids are random hex, landing order comes from the manifest (or the marker for older runs)
+    runs.sort(key=lambda r: _committed_at(landing_root, entity, r))
+    return runs[:max_runs]
+
+def collapse_versions(df: pd.DataFrame) -> pd.DataFrame:
+    # overlapping lookback windows land the same (id, updated_at) in several runs; the newest extraction wins
+    df = df.sort_values(["id", "updated_at", "_extracted_at"], kind="mergesort")
+    return df.drop_duplicates(subset=["id", "updated_at"], keep="last")
+
+def latest_mask(versions: pd.DataFrame) -> pd.Series:
+    # versions is sorted by (id, updated_at), so the last row of each id is its latest version
+    return ~versions["id"].duplicated(keep="last")
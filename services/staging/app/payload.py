@@ -1,30 +1,269 @@
 import json, hashlib
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from json.encoder import encode_basestring
+from typing import Any, Callable, Optional
+import multiprocessing as mp
+import numpy as np
 import pandas as pd
 
+from services.common.schema import LINE_KEYS_FIELD
+
+# below this a process pool costs more to start and feed than it saves
+PARALLEL_MIN_ROWS = 200_000
+
+# a few chunks per worker so one slow chunk does not leave the other cores idle
+CHUNKS_PER_WORKER = 4
+
+# payload_hash is stored as bytea: 32 bytes for sha256, 16 for the other two
+HASH_ALGORITHMS = ("sha256", "blake2b128", "xxh128")
+
+def digest_function(algorithm: str) -> Callable[[bytes], bytes]:
+    if algorithm == "sha256":
+        return lambda b: hashlib.sha256(b).digest()
+    if algorithm == "blake2b128":
+        return lambda b: hashlib.blake2b(b, digest_size=16).digest()
+    if algorithm == "xxh128":
+        # non-cryptographic and optional: only needed when PAYLOAD_HASH=xxh128
+        try:
+            import xxhash
+        except ImportError as e:
+            raise RuntimeError("PAYLOAD_HASH=xxh128 needs the xxhash package") from e
+        return lambda b: xxhash.xxh3_128_digest(b)
+    raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+def _digests(algorithm: str, payloads: list[str]) -> list[bytes]:
+    # encoding inside the hashing loop and inlining the two hashlib algorithms saves a pass and a call per row
+    if algorithm == "sha256":
+        sha256 = hashlib.sha256
+        return [sha256(p.encode()).digest() for p in payloads]
+    if algorithm == "blake2b128":
+        blake2b = hashlib.blake2b
+        return [blake2b(p.encode(), digest_size=16).digest() for p in payloads]
+    digest = digest_function(algorithm)
+    return [digest(p.encode()) for p in payloads]
+
+def _json_default(o: Any) -> Any:
+    # values json cannot encode itself: nested `lines` read back from parquet, numpy scalars, dates
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, pd.Timestamp):
+        return o.to_pydatetime().isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
 def _normalize_for_json(v: Any) -> Any:
     if v is None:
         return None
+    if isinstance(v, np.ndarray):
+        # nested `lines` read back from parquet
+        return v.tolist()
+    if isinstance(v, (list, dict)):
+        return v
     if pd.isna(v):
         return None
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and not np.isfinite(v):
+        # Infinity is not JSON, Postgres jsonb rejects it
+        return None
     if isinstance(v, pd.Timestamp):
         return v.to_pydatetime().isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+# the encoder LANDING_LINES_MODE=json uses for lines_json in normalize
+_LINES_ENCODER = json.JSONEncoder(ensure_ascii=False, default=_json_default)
+
+def _source_item(item: Any) -> Any:
+    # back to the keys and key order the item had in the source row, see LINE_KEYS_FIELD
+    if not isinstance(item, dict) or LINE_KEYS_FIELD not in item:
+        return item
+    keys = item[LINE_KEYS_FIELD]
+    if keys is None:
+        return {k: v for k, v in item.items() if k != LINE_KEYS_FIELD}
+    return {k: item[k] for k in keys}
+
+def canonical_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """Nested `lines` as the lines_json text json mode lands, so switching LANDING_LINES_MODE keeps payload hashes."""
+    if "lines" not in df.columns:
+        return df
+    encoded = pd.Series(
+        [None if v is None or (isinstance(v, float) and v != v) else _LINES_ENCODER.encode(list(map(_source_item, v)))
+         for v in df["lines"].tolist()],
+        index=df.index, dtype=object
+    )
+    if "lines_json" in df.columns:
+        # a catch-up over runs of both modes: each row has only one of the two filled
+        encoded = df["lines_json"].astype(object).where(df["lines_json"].notna(), encoded)
+    return df.drop(columns=["lines"]).assign(lines_json=encoded)
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+def payload_json(row: dict[str, Any]) -> str:
+    """Canonical payload of one row; the reference the columnar encoders below must match byte for byte."""
+    return _dumps({c: _normalize_for_json(v) for c, v in row.items()})
+
+def _encode_values(values: list) -> list[str]:
+    return [_dumps(_normalize_for_json(v)) for v in values]
+
+def _encode_objects(values: np.ndarray) -> list[str]:
+    # 1, 1.0 and True hash alike, so only columns of a single type may share an encoding
+    if pd.api.types.infer_dtype(values, skipna=True) not in ("date", "string"):
+        return _encode_values(values.tolist())
+    # dates and other low-cardinality objects: each distinct value goes through json once
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    encoded = _encode_values(list(uniques))
+    return [encoded[c] for c in codes.tolist()]
+
+_TIME_OF_DAY: dict[str, list[str]] = {}
+
+def _time_of_day(suffix: str) -> list[str]:
+    # "Thh:mm:ss" + suffix for every second of a day, built once per suffix
+    if suffix not in _TIME_OF_DAY:
+        minutes = [f"T{h:02d}:{m:02d}:" for h in range(24) for m in range(60)]
+        seconds = [f"{x:02d}{suffix}" for x in range(60)]
+        _TIME_OF_DAY[suffix] = [m + x for m in minutes for x in seconds]
+    return _TIME_OF_DAY[suffix]
+
+def _encode_datetime(s: pd.Series) -> list[str]:
+    tz = getattr(s.dtype, "tz", None)
+    if tz is not None and str(tz) != "UTC":
+        return ['"' + d.isoformat() + '"' for d in s.array.to_pydatetime().tolist()]
+    # datetime.isoformat: seconds, microseconds only when non-zero, +00:00 for UTC
+    naive = s.dt.tz_localize(None) if tz is not None else s
+    values = naive.to_numpy(dtype="datetime64[ns]")
+    suffix = "+00:00\"" if tz is not None else "\""
+    # NaT rows are overwritten with null by the caller
+    ns = np.where(np.isnat(values), 0, values.view("int64"))
+    days, seconds = np.divmod(ns // 1_000_000_000, 86_400)
+    # a frame spans few days: each date is formatted once, the time of day comes from a table
+    codes, uniques = pd.factorize(days)
+    dates = ['"' + d for d in np.datetime_as_string(uniques.astype("datetime64[D]"), unit="D").tolist()]
+    tod = _time_of_day(suffix)
+    out = [dates[c] + tod[x] for c, x in zip(codes.tolist(), seconds.tolist())]
+    micros = (ns % 1_000_000_000) // 1000
+    for i in np.flatnonzero(micros).tolist():
+        out[i] = out[i][:-len(suffix)] + f".{micros[i]:06d}" + suffix
+    return out
+
+def _encode_float(values: np.ndarray) -> list[str]:
+    # float.__repr__ is what json.dumps writes for finite floats, the rest is null like in _normalize_for_json
+    out = list(map(float.__repr__, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        out[i] = "null"
+    return out
+
+def _encode_ints(values: np.ndarray) -> list[str]:
+    # ids, quantities and codes repeat a lot; factorizing is a fraction of str() on every row
+    codes, uniques = pd.factorize(values)
+    if len(uniques) > len(values) // 2:
+        return list(map(str, values.tolist()))
+    encoded = list(map(str, uniques.tolist()))
+    return [encoded[c] for c in codes.tolist()]
+
+def _encode_column(s: pd.Series) -> list[str]:
+    """JSON text of every value of `s`, identical to payload_json's encoding of each value."""
+    dtype = s.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # each distinct value is encoded once, rows only pick their category's text
+        cats = _encode_values(list(dtype.categories)) + ["null"]
+        codes = s.cat.codes.to_numpy()
+        return [cats[c] for c in codes.tolist()]
+
+    na = s.isna().to_numpy()
+    if na.all():
+        return ["null"] * len(s)
+
+    if pd.api.types.is_bool_dtype(dtype):
+        out = ["true" if v else "false" for v in s.to_numpy(dtype=bool, na_value=False).tolist()]
+    elif pd.api.types.is_integer_dtype(dtype):
+        out = _encode_ints(s.to_numpy(dtype="int64", na_value=0))
+    elif pd.api.types.is_float_dtype(dtype):
+        return _encode_float(s.to_numpy(dtype="float64", na_value=np.nan))
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        out = _encode_datetime(s)
+    elif pd.api.types.is_string_dtype(dtype) and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+        # to_numpy would copy the column and na_value= run a second isna pass, the mask above is reused instead
+        values = np.asarray(s.array, dtype=object)
+        if na.any():
+            values = np.where(na, "", values)
+        out = list(map(encode_basestring, values.tolist()))
+    else:
+        return _encode_objects(s.to_numpy(dtype=object))
+
+    if na.any():
+        for i in np.flatnonzero(na).tolist():
+            out[i] = "null"
+    return out
+
+def _payloads(
+    df: pd.DataFrame,
+    algorithms: tuple[str, ...] = ("sha256",)
+) -> tuple[list[str], list[list[bytes]]]:
+    # sort_keys order; keys are plain strings so the template below is the object's canonical prefix
+    cols = sorted(c for c in df.columns if not c.startswith("_"))
+    template = "{" + ",".join(encode_basestring(c).replace("%", "%%") + ":%s" for c in cols) + "}"
+    encoded = [_encode_column(df[c]) for c in cols]
+    payload = [template % t for t in zip(*encoded)] if cols else ["{}"] * len(df)
+    return payload, [_digests(a, payload) for a in algorithms]
+
+def _parallel_payloads(
+    df: pd.DataFrame,
+    workers: int,
+    algorithms: tuple[str, ...]
+) -> tuple[list[str], list[list[bytes]]]:
+    edges = np.linspace(0, len(df), workers * CHUNKS_PER_WORKER + 1, dtype=int).tolist()
+    bounds = [(lo, hi) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+    payload, hashes = [], [[] for _ in algorithms]
     
-def build_payload_and_hash(df: pd.DataFrame) -> pd.DataFrame:
-    cols = [c for c in df.columns if not c.startswith("_")]
-    
-    def row_payload(row: Any)-> dict[str, Any]:
-        return {c: _normalize_for_json(row[c]) for c in cols}
-    
-    payload = df.apply(row_payload, axis=1)
-    df = df.copy()
-    df["payload"] = payload.apply(lambda p: json.dumps(p, ensure_ascii=False, sort_keys=True, separators=(",", ":")))
-    
-    def hash_payload(s: str) -> str:
-        return hashlib.sha256(s.encode("utf-8")).hexdigest()
+    # never fork: the parent already runs pyarrow's and the db driver's threads, a forked child can inherit
+    # one of their locks held; the chunks are pickled to clean forkserver (or spawn) workers instead
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    frame = df[[c for c in df.columns if not c.startswith("_")]]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method)) as pool:
+        results = list(pool.map(_payloads, [frame.iloc[lo:hi] for lo, hi in bounds], [algorithms] * len(bounds)))
     
-    df["payload_hash"] = df["payload"].apply(hash_payload)
+    # map yields in submission order, so rows come back in the frame's order
+    for p, hs in results:
+        payload.extend(p)
+        for acc, h in zip(hashes, hs):
+            acc.extend(h)
+    return payload, hashes
+
+def build_payload_and_hash(
+    df: pd.DataFrame,
+    workers: int = 1,
+    parallel_min_rows: int = PARALLEL_MIN_ROWS,
+    hash_algorithm: str = "sha256",
+    legacy_hash_algorithm: Optional[str] = None
+) -> pd.DataFrame:
+    """Adds `payload` and its binary `payload_hash`; with a legacy algorithm also `payload_hash_legacy` for dual reads."""
+    legacy = legacy_hash_algorithm not in (None, hash_algorithm)
+    algorithms = (hash_algorithm, legacy_hash_algorithm) if legacy else (hash_algorithm,)
+    for a in algorithms:
+        digest_function(a)
+    hash_cols = ["payload_hash", "payload_hash_legacy"][:len(algorithms)]
     
-    return df
+    df = canonical_lines(df.copy())
+    if df.empty:
+        for c in ["payload", *hash_cols]:
+            df[c] = pd.Series([], dtype=object, index=df.index)
+        return df
+
+    if workers > 1 and len(df) >= parallel_min_rows:
+        payload, hashes = _parallel_payloads(df, workers, algorithms)
+    else:
+        payload, hashes = _payloads(df, algorithms)
 
-   
\ No newline at end of file
+    # an object array is assigned as is, a list is first copied into one by pandas
+    df["payload"] = np.fromiter(payload, dtype=object, count=len(payload))
+    for c, h in zip(hash_cols, hashes):
+        df[c] = np.fromiter(h, dtype=object, count=len(h))
+
+    return df
@@ -1,9 +1,15 @@
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from typing import Any
+from typing import Any, Optional
 
 
+def _run_filter(run_id: str, entity: Optional[str]) -> tuple[str, dict[str, Any]]:
+    # entity=None keeps the old run_id-only behaviour for callers that predate the (run_id, entity) key
+    if entity is None:
+        return "run_id = :run_id", {"run_id": run_id}
+    return "run_id = :run_id AND entity = :entity", {"run_id": run_id, "entity": entity}
+
 def start_run_log(
     engine: Engine,
     run_id: str,
@@ -13,7 +19,7 @@ def start_run_log(
     sql = """
     INSERT INTO pipeline_run_log(run_id, pipeline_name, entity, status, started_at)
     VALUES(:run_id, :pipeline_name, :entity, 'running', now())
-    ON CONFLICT (run_id) DO NOTHING
+    ON CONFLICT (run_id, entity) DO NOTHING
     """
     with engine.begin() as conn:
         conn.execute(text(sql), 
@@ -28,9 +34,12 @@ def finish_run_success(
     run_id: str,
     rows_in: int,
     inserted_history: int,
-    upserted_latest: int
+    upserted_latest: int,
+    entity: Optional[str] = None,
+    skipped_unchanged: int = 0
 ) -> None:
-    sql = """
+    where, params = _run_filter(run_id, entity)
+    sql = f"""
     UPDATE pipeline_run_log
     SET 
         status = 'success',
@@ -38,34 +47,47 @@ def finish_run_success(
         rows_in = :rows_in,
         rows_inserted_history = :inserted_history,
         rows_upserted_latest = :upserted_latest,
+        rows_skipped_unchanged = :skipped_unchanged,
         error = NULL
-    WHERE run_id = :run_id
+    WHERE {where}
     """
     
     with engine.begin() as conn:
         conn.execute(text(sql),{
-            "run_id": run_id,
+            **params,
             "rows_in": rows_in,
             "inserted_history": inserted_history,
-            "upserted_latest": upserted_latest   
+            "upserted_latest": upserted_latest,
+            "skipped_unchanged": skipped_unchanged
         })
 
 def finish_run_failed(
     engine: Engine,
     run_id: str,
-    error_message: str
+    error_message: str,
+    entity: Optional[str] = None
 ) -> None:
-    sql = """
+    where, params = _run_filter(run_id, entity)
+    sql = f"""
     UPDATE pipeline_run_log
     SET
         status = 'failed',
         ended_at = now(),
         error = :error
-    WHERE run_id = :run_id
+    WHERE {where}
     """
     
     with engine.begin() as conn:
         conn.execute(text(sql),{
-            "run_id": run_id,
+            **params,
             "error": error_message[:4000]
-        })
\ No newline at end of file
+        })
+
+def successful_run_ids(engine: Engine, entity: str) -> set[str]:
+    sql = """
+    SELECT run_id
+    FROM pipeline_run_log
+    WHERE entity = :entity AND status = 'success'
+    """
+    with engine.begin() as conn:
+        return {r[0] for r in conn.execute(text(sql), {"entity": entity})}
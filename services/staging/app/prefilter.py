@@ -0,0 +1,32 @@
+import pandas as pd
+
+
+def _key(ids: pd.Series) -> pd.Series:
+    # the latest table hands uuids back in lowercase canonical form
+    return ids.astype(str).str.lower()
+
+def change_masks(df: pd.DataFrame, current: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """(to_history, to_latest) for the hashed rows of `df` against `current`, the latest table's (id, updated_at, payload_hash).
+
+    A row whose id, updated_at and digest equal the stored latest version is already in both tables.
+    A row not newer than the stored version would be ignored by the latest upsert, so it only goes to history.
+    """
+    if current.empty or df.empty:
+        everything = pd.Series(True, index=df.index)
+        return everything, everything.copy()
+
+    cur = current.assign(id=_key(current["id"])).drop_duplicates("id").set_index("id")
+    key = _key(df["id"])
+    cur_updated = key.map(pd.to_datetime(cur["updated_at"], utc=True))
+    cur_hash = key.map(cur["payload_hash"])
+
+    updated = pd.to_datetime(df["updated_at"], utc=True)
+    known = cur_updated.notna()
+    same_hash = [h == c for h, c in zip(df["payload_hash"], cur_hash)]
+    if "payload_hash_legacy" in df.columns:
+        # a latest row written under PAYLOAD_HASH_LEGACY still counts as the same version
+        same_hash = [s or h == c for s, h, c in zip(same_hash, df["payload_hash_legacy"], cur_hash)]
+
+    unchanged = known & (updated == cur_updated) & pd.Series(same_hash, index=df.index)
+    to_latest = ~known | (updated > cur_updated)
+    return ~unchanged, to_latest
@@ -1,28 +1,136 @@
 from pathlib import Path
+from typing import Optional
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 from services.common.config import load_config
+from services.common.landing import SUCCESS_MARKER, is_part_file, run_dir
+from services.common.manifest import read_manifest, validate_manifest
+from services.common.schema import apply_schema
 
-def reader_landing(landing_root: Path, entity: str, run_id: str) -> pd.DataFrame:
-    path = landing_root / entity / f"run_id={run_id}"
-    p_parquet = path / "part-000.parquet"
-    p_csv = path / "part-000.csv"
+def _landing_parts(path: Path, allow_unmarked: bool = False) -> list[Path]:
+    marker = path / SUCCESS_MARKER
+    if marker.exists():
+        return [path / name for name in marker.read_text(encoding="utf-8").split()]
     
-    if p_parquet.exists():
-        df = pd.read_parquet(p_parquet)
-    elif p_csv.exists():
-        df = pd.read_csv(p_csv)
-    else:
+    parts = sorted(p for p in path.glob("part-*") if is_part_file(p))
+    # a crashed streaming or resumable run also leaves a lone part-000, so a legacy single-file run
+    # (landed before markers existed) is only read when the caller asks for it explicitly
+    if parts and (not allow_unmarked or len(parts) > 1):
+        raise RuntimeError(f"Landing run not committed (missing {SUCCESS_MARKER}): {path}")
+    return parts
+
+def _read_arrow(p: Path) -> pa.Table:
+    # the table's buffers point into the mapped file, nothing is copied until pandas conversion;
+    # closing the file releases the descriptor, the mapping lives as long as those buffers
+    with pa.memory_map(str(p)) as src:
+        return pa.ipc.open_file(src).read_all()
+
+def _read_part(p: Path) -> pd.DataFrame:
+    if p.suffix == ".parquet":
+        return pd.read_parquet(p)
+    if p.suffix == ".arrow":
+        return _read_arrow(p).to_pandas()
+    if p.suffix == ".csv":
+        return pd.read_csv(p)
+    raise ValueError(f"Unsupported landing file: {p}")
+
+REQUIRED_COLUMNS = {"id", "updated_at", "_run_id", "_extracted_at"}
+
+def _committed_parts(path: Path, allow_unmarked: bool = False) -> list[Path]:
+    parts = _landing_parts(path, allow_unmarked)
+    
+    manifest = read_manifest(path)
+    if manifest is not None:
+        if [f["name"] for f in manifest["files"]] != [p.name for p in parts]:
+            raise RuntimeError(f"Landing manifest does not match {SUCCESS_MARKER}: {path}")
+        validate_manifest(path, manifest)
+        # empty parts hold no columns and would only break schema unification
+        rows = {f["name"]: f["rows"] for f in manifest["files"]}
+        parts = [p for p in parts if rows[p.name]] or parts[:1]
+    return parts
+
+def reader_landing(landing_root: Path, entity: str, run_id: str, allow_unmarked: bool = False) -> pd.DataFrame:
+    path = run_dir(landing_root, entity, run_id)
+    parts = _committed_parts(path, allow_unmarked)
+    
+    if not parts:
+        p_parquet = path / "part-000.parquet"
+        p_csv = path / "part-000.csv"
         raise FileNotFoundError(f"Landing not found: {p_parquet} or {p_csv}")
     
-    required = {"id", "updated_at", "_run_id", "_extracted_at"}
-    missing = required - set(df.columns)
+    frames = [_read_part(p) for p in parts]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    
+    missing = REQUIRED_COLUMNS - set(df.columns)
     if missing:
         raise ValueError(f"Landing missing columns {missing}")
     
-    df["updated_at"] = pd.to_datetime(df["updated_at"], utc=True, errors="coerce")
-    df["_extracted_at"] = pd.to_datetime(df["_extracted_at"], utc=True, errors="coerce")
-    df["_watermark_effective"] = pd.to_datetime(df["_watermark_effective"], utc=True, errors="coerce")
-    
-    return df
+    # csv parts come back untyped and concat drops categories that differ per part
+    return apply_schema(df, entity)
+
 
 
+def _has_rows(landing_root: Path, entity: str, run_id: str) -> bool:
+    manifest = read_manifest(run_dir(landing_root, entity, run_id))
+    return manifest is None or manifest["rows"] > 0
+
+_DATASET_FORMAT = {".parquet": "parquet", ".arrow": "ipc"}
+
+def _part_schema(p: Path) -> pa.Schema:
+    if p.suffix == ".arrow":
+        with pa.memory_map(str(p)) as src:
+            return pa.ipc.open_file(src).schema
+    return pq.read_schema(p)
+
+def _part_rows(p: Path) -> int:
+    if p.suffix == ".arrow":
+        # batch lengths come from the message headers, no batch body is read
+        with pa.memory_map(str(p)) as src:
+            return pa.ipc.open_file(src).count_rows()
+    return pq.read_metadata(p).num_rows
+
+def reader_landing_runs(
+    landing_root: Path,
+    entity: str,
+    run_ids: list[str],
+    columns: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """Several committed runs read as one memory-mapped parquet/arrow dataset, projected to `columns`."""
+    parts = []
+    for run_id in run_ids:
+        parts.extend(_committed_parts(run_dir(landing_root, entity, run_id)))
+    parts = [p for p in parts if p.suffix not in _DATASET_FORMAT or _part_rows(p)]
+    if not parts:
+        return pd.DataFrame(columns=sorted(REQUIRED_COLUMNS))
+    
+    try:
+        if any(p.suffix not in _DATASET_FORMAT for p in parts):
+            raise pa.ArrowInvalid("csv landing parts")
+        # runs landed before the schema registry stored plain strings where newer runs store dictionaries
+        schema = pa.unify_schemas([_part_schema(p) for p in parts], promote_options="permissive")
+        fs = pafs.LocalFileSystem(use_mmap=True)
+        # OUTPUT_FORMAT may have changed between runs, one child dataset per file format
+        children = [
+            ds.dataset([str(p) for p in parts if p.suffix == suffix], schema=schema, format=fmt, filesystem=fs)
+            for suffix, fmt in _DATASET_FORMAT.items()
+            if any(p.suffix == suffix for p in parts)
+        ]
+        dataset = children[0] if len(children) == 1 else ds.dataset(children)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        frames = [reader_landing(landing_root, entity, r) for r in run_ids if _has_rows(landing_root, entity, r)]
+        df = pd.concat(frames, ignore_index=True)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return apply_schema(df, entity)
+    
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    df = dataset.to_table(columns=columns).to_pandas()
+    
+    missing = REQUIRED_COLUMNS - set(df.columns)
+    if missing:
+        raise ValueError(f"Landing missing columns {missing}")
+    return apply_schema(df, entity)
@@ -1,12 +1,20 @@
 
 from services.common.db import build_engine
 from services.common.config import load_config
-from services.staging.app.payload import build_payload_and_hash
-from services.staging.app.pipeline_run_logs_repo import start_run_log, finish_run_success, finish_run_failed
-from services.staging.app.reader_landing import reader_landing
-from services.staging.app.staging_repo import insert_history, upsert_stg_latest
+from services.common.landing import SUCCESS_MARKER, run_dir
+from services.common.manifest import read_manifest
+from services.staging.app.payload import PARALLEL_MIN_ROWS, build_payload_and_hash
+from services.staging.app.catch_up import collapse_versions, latest_mask, pending_runs
+from services.staging.app.pipeline_run_logs_repo import start_run_log, finish_run_success, finish_run_failed, successful_run_ids
+from services.staging.app.reader_landing import reader_landing, reader_landing_runs
+from services.staging.app.prefilter import change_masks
+from services.staging.app.staging_repo import (
+    copy_insert_history, copy_upsert_stg_latest, fetch_latest_state, insert_history, restage_versions, upsert_stg_latest
+)
 import logging
 import argparse
+import sys
+import pandas as pd
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -20,9 +28,117 @@ def _setup_logging() -> None:
 def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
     p = argparse.ArgumentParser()
     p.add_argument("--entity", required=True, choices=["ib_receipts", "ob_orders"])
-    p.add_argument("--run-id", required=True, dest="run_id")
-    p.add_argument("--batch_size", type=int, default=500)
-    return p.parse_args()
+    mode = p.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--run-id", dest="run_id")
+    mode.add_argument("--catch-up", action="store_true", dest="catch_up",
+                      help="stage every committed run not yet successful in pipeline_run_log in one bulk load")
+    mode.add_argument("--restage", action="store_true",
+                      help="rebuild payloads and hashes of every staged run still in landing, --max-runs runs per batch")
+    p.add_argument("--max-runs", type=int, default=200, dest="max_runs")
+    p.add_argument("--legacy-unmarked", action="store_true", dest="legacy_unmarked",
+                   help=f"stage a run landed before {SUCCESS_MARKER} markers existed (a lone part-000, no marker)")
+    p.add_argument("--batch_size", type=int, default=500, help="rows per executemany round trip, STAGING_LOAD_MODE=insert only")
+    p.add_argument("--workers", type=int, default=1,
+                   help="processes building payload hashes once a load has --parallel-min-rows rows")
+    p.add_argument("--parallel-min-rows", type=int, default=PARALLEL_MIN_ROWS, dest="parallel_min_rows")
+    return p.parse_args(args)
+
+
+def _write_history(engine, entity: str, df: pd.DataFrame, batch_size: int, load_mode: str) -> int:
+    if load_mode == "copy":
+        return copy_insert_history(engine=engine, entity=entity, df=df)
+    return insert_history(engine=engine, entity=entity, records=df.to_dict(orient="records"), batch_size=batch_size)
+
+def _write_latest(engine, entity: str, df: pd.DataFrame, batch_size: int, load_mode: str) -> int:
+    if load_mode == "copy":
+        return copy_upsert_stg_latest(engine=engine, entity=entity, df=df)
+    return upsert_stg_latest(engine=engine, entity=entity, records=df.to_dict(orient="records"), batch_size=batch_size)
+
+
+def catch_up(cfg, engine, entity: str, max_runs: int, batch_size: int, workers: int = 1,
+             parallel_min_rows: int = PARALLEL_MIN_ROWS) -> int:
+    runs = pending_runs(cfg.landing_root, entity, successful_run_ids(engine, entity), max_runs)
+    if not runs:
+        logger.info("catch-up entity=%s nothing to stage", entity)
+        return 0
+    logger.info("catch-up entity=%s runs=%s", entity, len(runs))
+    
+    for run_id in runs:
+        start_run_log(engine=engine, run_id=run_id, pipeline_name=cfg.pipeline_name, entity=entity)
+    
+    finished = set()
+    try:
+        df = reader_landing_runs(cfg.landing_root, entity, runs)
+        rows_in = df["_run_id"].astype(str).value_counts()
+        
+        versions = collapse_versions(df)
+        is_latest = latest_mask(versions)
+        logger.info("catch-up entity=%s rows_in=%s versions=%s ids=%s",
+                    entity, len(df), len(versions), int(is_latest.sum()))
+        
+        df2 = build_payload_and_hash(
+            versions, workers, parallel_min_rows, cfg.payload_hash, cfg.payload_hash_legacy
+        )
+        current = fetch_latest_state(engine, entity, df2.loc[is_latest, "id"].astype(str).tolist())
+        to_history, to_latest = change_masks(df2, current)
+        logger.info("catch-up entity=%s unchanged=%s", entity, int((~to_history).sum()))
+        
+        run_of = df2["_run_id"].astype(str)
+        # loaded per run so every pipeline_run_log row carries the counts of the rows that run contributed
+        for run_id in runs:
+            mine = run_of == run_id
+            inserted_history = _write_history(
+                engine, entity, df2[mine & to_history], batch_size, cfg.staging_load_mode
+            )
+            upsert_stg = _write_latest(
+                engine, entity, df2[mine & is_latest & to_latest], batch_size, cfg.staging_load_mode
+            )
+            finish_run_success(
+                engine=engine,
+                run_id=run_id,
+                rows_in=int(rows_in.get(run_id, 0)),
+                inserted_history=inserted_history,
+                upserted_latest=upsert_stg,
+                entity=entity,
+                skipped_unchanged=int((mine & ~to_history).sum())
+            )
+            finished.add(run_id)
+        return 0
+    except Exception as e:
+        logger.exception("Failure at the staging catch-up entity=%s", entity)
+        for run_id in runs:
+            if run_id in finished:
+                continue
+            try:
+                finish_run_failed(engine=engine, run_id=run_id, error_message=str(e), entity=entity)
+            except Exception:
+                logger.exception("Failed to update run log entity=%s run_id%s", entity, run_id)
+        return 1
+
+
+def restage(cfg, engine, entity: str, max_runs: int, workers: int = 1,
+            parallel_min_rows: int = PARALLEL_MIN_ROWS) -> int:
+    """Rewrites staged versions whose payload or digest changed since they were staged, e.g. after a payload fix.
+    
+    Only runs still in landing can be rebuilt; versions of runs already past landing retention keep their rows.
+    """
+    staged = successful_run_ids(engine, entity)
+    runs = [r for r in pending_runs(cfg.landing_root, entity, set(), sys.maxsize) if r in staged]
+    logger.info("restage entity=%s runs=%s", entity, len(runs))
+    
+    try:
+        for i in range(0, len(runs), max_runs):
+            batch = runs[i: i + max_runs]
+            df = reader_landing_runs(cfg.landing_root, entity, batch)
+            # written under PAYLOAD_HASH only, the rewritten rows need no dual read
+            df2 = build_payload_and_hash(df, workers, parallel_min_rows, cfg.payload_hash)
+            deleted, inserted, refreshed = restage_versions(engine, entity, df2, batch)
+            logger.info("restage entity=%s runs=%s-%s rows=%s replaced_history=%s inserted_history=%s refreshed_latest=%s",
+                        entity, i, i + len(batch), len(df2), deleted, inserted, refreshed)
+        return 0
+    except Exception:
+        logger.exception("Failure at the staging restage entity=%s", entity)
+        return 1
 
 
 def main(args: Optional[list[str]] = None) -> int:
@@ -33,6 +149,11 @@ def main(args: Optional[list[str]] = None) -> int:
     run_id = args.run_id
     cfg = load_config()
     engine = build_engine(cfg.pg_dsn)
+    
+    if args.catch_up:
+        return catch_up(cfg, engine, entity, args.max_runs, args.batch_size, args.workers, args.parallel_min_rows)
+    if args.restage:
+        return restage(cfg, engine, entity, args.max_runs, args.workers, args.parallel_min_rows)
 
     
     try:
@@ -43,11 +164,24 @@ def main(args: Optional[list[str]] = None) -> int:
             entity=entity
         )
 
+        manifest = read_manifest(run_dir(cfg.landing_root, entity, run_id))
+        if manifest is not None and manifest["rows"] == 0:
+            logger.info("landing empty per manifest entity=%s run_id=%s, skip reading", entity, run_id)
+            finish_run_success(
+                engine=engine,
+                run_id=run_id,
+                rows_in=0,
+                inserted_history=0,
+                upserted_latest=0,
+                entity=entity
+            )
+            return 0
         
         df = reader_landing(
             landing_root=cfg.landing_root,
             entity=entity,
-            run_id=run_id
+            run_id=run_id,
+            allow_unmarked=args.legacy_unmarked
         )
       
         rows_in = len(df)
@@ -59,30 +193,36 @@ def main(args: Optional[list[str]] = None) -> int:
                 run_id=run_id,
                 rows_in=0,
                 inserted_history=0,
-                upserted_latest=0
+                upserted_latest=0,
+                entity=entity
             )
+            return 0
         
-        df2 = build_payload_and_hash(df)
+        df2 = build_payload_and_hash(
+            df, args.workers, args.parallel_min_rows, cfg.payload_hash, cfg.payload_hash_legacy
+        )
         logger.info("payload_build entity=%s run_id=%s rows=%s",entity, run_id, len(df2)) 
-        records = df2.to_dict(orient="records") 
-        inserted_history = insert_history(
-            engine=engine,
-            entity=entity,
-            records=records,
-            batch_size=args.batch_size    
-            )
-        upsert_stg = upsert_stg_latest(
-            engine=engine,
-            entity=entity,
-            records=records,
-            batch_size=args.batch_size
+        
+        # only real changes reach the tables; a re-extracted version already stored is dropped here
+        current = fetch_latest_state(engine, entity, df2["id"].astype(str).unique().tolist())
+        to_history, to_latest = change_masks(df2, current)
+        skipped = int((~to_history).sum())
+        logger.info("prefilter entity=%s run_id=%s unchanged=%s", entity, run_id, skipped)
+        
+        inserted_history = _write_history(
+            engine, entity, df2[to_history], args.batch_size, cfg.staging_load_mode
+        )
+        upsert_stg = _write_latest(
+            engine, entity, df2[to_latest], args.batch_size, cfg.staging_load_mode
         )
         finish_run_success(
             engine=engine,
             run_id=run_id,
             rows_in=rows_in,
             inserted_history=inserted_history,
-            upserted_latest=upsert_stg
+            upserted_latest=upsert_stg,
+            entity=entity,
+            skipped_unchanged=skipped
         )
         return 0
     except Exception as e:
@@ -91,7 +231,8 @@ def main(args: Optional[list[str]] = None) -> int:
             finish_run_failed(
                 engine=engine,
                 run_id=run_id,
-                error_message=str(e)
+                error_message=str(e),
+                entity=entity
             )
         except Exception:
             logger.exception("Failed to update run log entity=%s run_id%s", entity, run_id)
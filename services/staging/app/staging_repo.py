@@ -1,4 +1,7 @@
+from datetime import date
 from typing import Any, Iterator
+import io
+import numpy as np
 import pandas as pd
 import json
 from sqlalchemy import text
@@ -30,7 +33,10 @@ def insert_history(
 ) -> int:
     history_table, _ = _get_table(entity)
     
-    sql = text(f"""
+    if records and "payload_hash_legacy" in records[0]:
+        sql = _dual_read_history_sql(history_table)
+    else:
+        sql = text(f"""
     INSERT INTO {history_table}(
         id, updated_at, payload,
         payload_hash, _run_id,
@@ -59,6 +65,53 @@ def insert_history(
 
 
 
+def _dual_read_history_sql(history_table: str):
+    # while PAYLOAD_HASH_LEGACY is set, a version stored under the previous algorithm counts as present
+    return text(f"""
+    INSERT INTO {history_table}(
+        id, updated_at, payload,
+        payload_hash, _run_id,
+        _extracted_at, _watermark_effective
+    )
+    SELECT
+        (:id)::uuid, (:updated_at)::timestamptz, (:payload)::jsonb,
+        :payload_hash, :_run_id,
+        (:_extracted_at)::timestamptz, (:_watermark_effective)::timestamptz
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {history_table} h
+        WHERE h.id = (:id)::uuid AND h.updated_at = (:updated_at)::timestamptz AND h.payload_hash = :payload_hash_legacy
+    )
+    ON CONFLICT (id, updated_at, payload_hash)
+    DO NOTHING
+    RETURNING 1
+    """)
+
+def fetch_latest_state(
+    engine: Engine,
+    entity: str,
+    ids: list[str],
+    batch_size: int = 50_000
+) -> pd.DataFrame:
+    """Current (id, updated_at, payload_hash) of the latest table for `ids`, one array lookup per batch."""
+    _, latest_table = _get_table(entity)
+    
+    sql = text(f"""
+    SELECT id::text AS id, updated_at, payload_hash
+    FROM {latest_table}
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+    """)
+    
+    rows = []
+    with engine.begin() as conn:
+        for i in range(0, len(ids), batch_size):
+            rows.extend(conn.execute(sql, {"ids": ids[i: i + batch_size]}).all())
+    
+    # psycopg2 hands bytea back as memoryview
+    return pd.DataFrame(
+        [(r[0], r[1], bytes(r[2])) for r in rows],
+        columns=["id", "updated_at", "payload_hash"]
+    )
+
 def upsert_stg_latest(
     engine: Engine,
     entity: str,
@@ -99,6 +152,174 @@ def upsert_stg_latest(
     return upserted
 
 
+STG_COLUMNS = ["id", "updated_at", "payload", "payload_hash", "_run_id", "_extracted_at", "_watermark_effective"]
+
+# rows per COPY round trip, bounds the text buffer held in memory
+COPY_CHUNK_ROWS = 100_000
+
+_COPY_ESCAPE = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _escape_strings(values: list[str]) -> list[str]:
+    # NUL cannot occur in Postgres text, so the whole column is escaped as one string by C-level replaces
+    if not values:
+        return []
+    joined = "\x00".join(values)
+    if joined.count("\x00") != len(values) - 1:
+        raise ValueError("NUL character in a staging text value")
+    for ch, esc in (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")):
+        if ch in joined:
+            joined = joined.replace(ch, esc)
+    return joined.split("\x00")
+
+def _copy_value(v: Any) -> str:
+    if v is None or v is pd.NA or v is pd.NaT or (isinstance(v, float) and v != v):
+        return "\\N"
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        # bytea hex input; the backslash itself is escaped in COPY text format
+        return "\\\\x" + bytes(v).hex()
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v).translate(_COPY_ESCAPE)
+
+def _copy_column(s: pd.Series) -> list[str]:
+    tz = getattr(s.dtype, "tz", None)
+    if not pd.api.types.is_datetime64_any_dtype(s.dtype):
+        values = s.to_numpy(dtype=object)
+        na = pd.isna(values)
+        if pd.api.types.infer_dtype(values, skipna=True) != "string":
+            return [_copy_value(v) for v in values.tolist()]
+        out = _escape_strings(np.where(na, "", values).tolist())
+        for i in np.flatnonzero(na).tolist():
+            out[i] = "\\N"
+        return out
+    naive = s.dt.tz_convert("UTC").dt.tz_localize(None) if tz is not None else s
+    suffix = "+00" if tz is not None else ""
+    values = np.datetime_as_string(naive.to_numpy(dtype="datetime64[us]"), unit="us").tolist()
+    return ["\\N" if v == "NaT" else v + suffix for v in values]
+
+def copy_buffer(df: pd.DataFrame, columns: list[str]) -> io.StringIO:
+    """`columns` of `df` in COPY text format: tab separated, \\N for null, bytea as escaped hex."""
+    encoded = [_copy_column(df[c]) for c in columns]
+    buf = io.StringIO()
+    buf.writelines("\t".join(row) + "\n" for row in zip(*encoded))
+    buf.seek(0)
+    return buf
+
+def _copy_to_temp(conn, source_table: str, df: pd.DataFrame, columns: list[str]) -> str:
+    tmp = f"_load_{source_table}"
+    conn.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {source_table}) ON COMMIT DROP"))
+    if "payload_hash_legacy" in columns:
+        conn.execute(text(f"ALTER TABLE {tmp} ADD COLUMN payload_hash_legacy bytea"))
+    
+    cursor = conn.connection.cursor()
+    try:
+        for i in range(0, len(df), COPY_CHUNK_ROWS):
+            buf = copy_buffer(df.iloc[i: i + COPY_CHUNK_ROWS], columns)
+            cursor.copy_expert(f"COPY {tmp} ({', '.join(columns)}) FROM STDIN", buf)
+    finally:
+        cursor.close()
+    return tmp
+
+def copy_insert_history(engine: Engine, entity: str, df: pd.DataFrame) -> int:
+    """insert_history for a whole frame: COPY into a temp table, then one INSERT ... SELECT."""
+    history_table, _ = _get_table(entity)
+    if df.empty:
+        return 0
+    
+    legacy = "payload_hash_legacy" in df.columns
+    columns = STG_COLUMNS + (["payload_hash_legacy"] if legacy else [])
+    # same dual read as _dual_read_history_sql while PAYLOAD_HASH_LEGACY is set
+    legacy_filter = f"""
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {history_table} h
+        WHERE h.id = t.id AND h.updated_at = t.updated_at AND h.payload_hash = t.payload_hash_legacy
+    )""" if legacy else ""
+    
+    with engine.begin() as conn:
+        tmp = _copy_to_temp(conn, history_table, df, columns)
+        res = conn.execute(text(f"""
+    INSERT INTO {history_table}({", ".join(STG_COLUMNS)})
+    SELECT {", ".join("t." + c for c in STG_COLUMNS)}
+    FROM {tmp} t{legacy_filter}
+    ON CONFLICT (id, updated_at, payload_hash)
+    DO NOTHING
+    """))
+        return int(res.rowcount or 0)
+
+def copy_upsert_stg_latest(engine: Engine, entity: str, df: pd.DataFrame) -> int:
+    """upsert_stg_latest for a whole frame: COPY into a temp table, then one INSERT ... SELECT per id."""
+    _, latest_table = _get_table(entity)
+    if df.empty:
+        return 0
+    
+    with engine.begin() as conn:
+        tmp = _copy_to_temp(conn, latest_table, df, STG_COLUMNS)
+        # one statement may not update a row twice, so only each id's newest version is merged
+        res = conn.execute(text(f"""
+    INSERT INTO {latest_table}({", ".join(STG_COLUMNS)})
+    SELECT DISTINCT ON (id) {", ".join(STG_COLUMNS)}
+    FROM {tmp}
+    ORDER BY id, updated_at DESC, _extracted_at DESC NULLS LAST
+    ON CONFLICT (id)
+    DO UPDATE SET
+        updated_at = excluded.updated_at,
+        payload = excluded.payload,
+        payload_hash = excluded.payload_hash,
+        _run_id = excluded._run_id,
+        _extracted_at = excluded._extracted_at,
+        _watermark_effective = excluded._watermark_effective
+    WHERE excluded.updated_at > {latest_table}.updated_at
+    """))
+        return int(res.rowcount or 0)
+
+def restage_versions(engine: Engine, entity: str, df: pd.DataFrame, run_ids: list[str]) -> tuple[int, int, int]:
+    """Rewrites what `run_ids` staged with the payloads and hashes of `df`, their rows rebuilt from landing.
+
+    A history row of those runs whose digest the rebuilt rows no longer produce is replaced, and a latest row
+    still on a re-staged (id, updated_at) takes the rebuilt payload. Returns (deleted, inserted, refreshed).
+    """
+    history_table, latest_table = _get_table(entity)
+    if df.empty:
+        return 0, 0, 0
+
+    with engine.begin() as conn:
+        tmp = _copy_to_temp(conn, history_table, df, STG_COLUMNS)
+        deleted = conn.execute(text(f"""
+    DELETE FROM {history_table} h
+    USING (SELECT DISTINCT id, updated_at FROM {tmp}) k
+    WHERE h.id = k.id AND h.updated_at = k.updated_at
+      AND h._run_id = ANY(:run_ids)
+      AND NOT EXISTS (
+        SELECT 1 FROM {tmp} t
+        WHERE t.id = h.id AND t.updated_at = h.updated_at AND t.payload_hash = h.payload_hash
+      )
+    """), {"run_ids": list(run_ids)}).rowcount
+        # newest extraction first, so a version landed by several runs keeps the run staging would have kept
+        inserted = conn.execute(text(f"""
+    INSERT INTO {history_table}({", ".join(STG_COLUMNS)})
+    SELECT {", ".join(STG_COLUMNS)}
+    FROM {tmp}
+    ORDER BY _extracted_at DESC NULLS LAST
+    ON CONFLICT (id, updated_at, payload_hash)
+    DO NOTHING
+    """)).rowcount
+        refreshed = conn.execute(text(f"""
+    UPDATE {latest_table} l
+    SET payload = t.payload,
+        payload_hash = t.payload_hash,
+        _run_id = t._run_id,
+        _extracted_at = t._extracted_at,
+        _watermark_effective = t._watermark_effective
+    FROM (
+        SELECT DISTINCT ON (id, updated_at) {", ".join(STG_COLUMNS)}
+        FROM {tmp}
+        ORDER BY id, updated_at, _extracted_at DESC NULLS LAST
+    ) t
+    WHERE l.id = t.id AND l.updated_at = t.updated_at AND l.payload_hash <> t.payload_hash
+    """)).rowcount
+        return int(deleted or 0), int(inserted or 0), int(refreshed or 0)
+
+
 def df_to_records_for_db(df: pd.DataFrame) -> list[dict[str, Any]]:
     records: list[dict[str, Any]] = []
     
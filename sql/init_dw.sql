@@ -11,9 +11,48 @@ create table if not exists etl_watermark (
 create index if not exists idx_etl_watermark_updated_at
 on etl_watermark(updated_at);
 
+-- adaptive extractor page size, carried between runs
+create table if not exists etl_page_size (
+  pipeline_name text not null,
+  entity text not null,
+  page_size int not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity)
+);
+
+-- extractor change cache: last landed content hash per id, rows re-fetched unchanged by the lookback are not landed again
+create table if not exists etl_change_cache (
+  pipeline_name text not null,
+  entity text not null,
+  id text not null,
+  updated_at timestamptz not null,
+  payload_hash bigint not null,
+  primary key (pipeline_name, entity, id)
+);
+
+create index if not exists idx_etl_change_cache_updated_at
+on etl_change_cache(pipeline_name, entity, updated_at);
+
+-- last landed part of an unfinished extractor run, rerunning the run_id resumes after it
+create table if not exists etl_checkpoint (
+  pipeline_name text not null,
+  entity text not null,
+  run_id text not null,
+  part_no int not null,
+  rows_fetched bigint not null,
+  last_updated_at text not null,
+  last_id text,
+  max_updated_at timestamptz,
+  wm_saved timestamptz not null,
+  wm_effective timestamptz not null,
+  extracted_at timestamptz not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity, run_id)
+);
+
 -- create run logs
 create table if not exists pipeline_run_log (
-  run_id text primary key,
+  run_id text not null,
   pipeline_name text not null,
   entity text not null,
   started_at timestamptz not null default now(),
@@ -22,7 +61,9 @@ create table if not exists pipeline_run_log (
   rows_in int not null default 0,
   rows_inserted_history int not null default 0,
   rows_upserted_latest int not null default 0,
-  error text
+  rows_skipped_unchanged int not null default 0,
+  error text,
+  primary key (run_id, entity)
 );
 
 create index if not exists idx_pipeline_run_log_entity_started
@@ -32,7 +73,7 @@ create table if not exists stg_ib_receipts_history (
   id uuid not null,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz,
@@ -43,7 +84,7 @@ create table if not exists stg_ib_receipts(
   id uuid primary key,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz
@@ -56,7 +97,7 @@ create table if not exists stg_ob_orders_history (
   id uuid not null,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz,
@@ -67,7 +108,7 @@ create table if not exists stg_ob_orders (
   id uuid primary key,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz
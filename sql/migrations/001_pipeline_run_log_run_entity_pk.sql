@@ -0,0 +1,8 @@
+-- pipeline_run_log used to be keyed by run_id alone, but one extractor run_id lands every entity,
+-- so the second entity staged for a run never got its own row. Key it by (run_id, entity).
+begin;
+
+alter table pipeline_run_log drop constraint if exists pipeline_run_log_pkey;
+alter table pipeline_run_log add primary key (run_id, entity);
+
+commit;
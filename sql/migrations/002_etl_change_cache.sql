@@ -0,0 +1,12 @@
+-- adds the extractor change cache (CHANGE_CACHE) to databases created before it existed
+create table if not exists etl_change_cache (
+  pipeline_name text not null,
+  entity text not null,
+  id text not null,
+  updated_at timestamptz not null,
+  payload_hash bigint not null,
+  primary key (pipeline_name, entity, id)
+);
+
+create index if not exists idx_etl_change_cache_updated_at
+on etl_change_cache(pipeline_name, entity, updated_at);
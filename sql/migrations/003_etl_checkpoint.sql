@@ -0,0 +1,16 @@
+-- adds the extractor checkpoint table (EXTRACT_CHECKPOINT) to databases created before it existed
+create table if not exists etl_checkpoint (
+  pipeline_name text not null,
+  entity text not null,
+  run_id text not null,
+  part_no int not null,
+  rows_fetched bigint not null,
+  last_updated_at text not null,
+  last_id text,
+  max_updated_at timestamptz,
+  wm_saved timestamptz not null,
+  wm_effective timestamptz not null,
+  extracted_at timestamptz not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity, run_id)
+);
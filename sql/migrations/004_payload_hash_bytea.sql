@@ -0,0 +1,22 @@
+-- payload_hash was the 64-char hex sha256 as text; store the raw digest as bytea instead.
+-- Existing rows keep their sha256 digest (decoded from hex). That digest is only comparable for rows staged with
+-- the current payload builder: rows staged before the payload fix (every value but timestamps written as null)
+-- never match a rebuilt payload, so the prefilter cannot skip them and a re-fetched version adds a second history
+-- row. Rebuild them once, after this migration, per entity:
+--   python -m services.staging.app.run --entity <entity> --restage
+-- Runs already past landing retention cannot be rebuilt and keep their old payloads.
+--
+-- To move to a shorter digest afterwards:
+--   1. set PAYLOAD_HASH=blake2b128 (or xxh128) and PAYLOAD_HASH_LEGACY=sha256;
+--      staging then skips a history version already stored under the sha256 digest (dual read)
+--   2. once no landing run hashed under sha256 can be re-staged any more (landing retention has passed),
+--      unset PAYLOAD_HASH_LEGACY.
+-- The type change rewrites the tables and their primary key indexes; run it in a maintenance window.
+begin;
+
+alter table stg_ib_receipts_history alter column payload_hash type bytea using decode(payload_hash, 'hex');
+alter table stg_ib_receipts alter column payload_hash type bytea using decode(payload_hash, 'hex');
+alter table stg_ob_orders_history alter column payload_hash type bytea using decode(payload_hash, 'hex');
+alter table stg_ob_orders alter column payload_hash type bytea using decode(payload_hash, 'hex');
+
+commit;
@@ -0,0 +1,7 @@
+-- staging now drops rows whose (id, updated_at, payload_hash) already is the stored latest version
+-- before writing; record how many were dropped per run.
+begin;
+
+alter table pipeline_run_log add column if not exists rows_skipped_unchanged int not null default 0;
+
+commit;
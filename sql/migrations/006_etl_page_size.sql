@@ -0,0 +1,8 @@
+-- adds the adaptive extractor page size table (ADAPTIVE_PAGE_SIZE) to databases created before it existed
+create table if not exists etl_page_size (
+  pipeline_name text not null,
+  entity text not null,
+  page_size int not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity)
+);
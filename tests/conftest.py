@@ -19,8 +19,44 @@ create table if not exists etl_watermark (
 create index if not exists idx_etl_watermark_updated_at
 on etl_watermark(updated_at);
 
+create table if not exists etl_page_size (
+  pipeline_name text not null,
+  entity text not null,
+  page_size int not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity)
+);
+
+create table if not exists etl_change_cache (
+  pipeline_name text not null,
+  entity text not null,
+  id text not null,
+  updated_at timestamptz not null,
+  payload_hash bigint not null,
+  primary key (pipeline_name, entity, id)
+);
+
+create index if not exists idx_etl_change_cache_updated_at
+on etl_change_cache(pipeline_name, entity, updated_at);
+
+create table if not exists etl_checkpoint (
+  pipeline_name text not null,
+  entity text not null,
+  run_id text not null,
+  part_no int not null,
+  rows_fetched bigint not null,
+  last_updated_at text not null,
+  last_id text,
+  max_updated_at timestamptz,
+  wm_saved timestamptz not null,
+  wm_effective timestamptz not null,
+  extracted_at timestamptz not null,
+  updated_at timestamptz not null default now(),
+  primary key (pipeline_name, entity, run_id)
+);
+
 create table if not exists pipeline_run_log (
-  run_id text primary key,
+  run_id text not null,
   pipeline_name text not null,
   entity text not null,
   started_at timestamptz not null default now(),
@@ -29,7 +65,9 @@ create table if not exists pipeline_run_log (
   rows_in int not null default 0,
   rows_inserted_history int not null default 0,
   rows_upserted_latest int not null default 0,
-  error text
+  rows_skipped_unchanged int not null default 0,
+  error text,
+  primary key (run_id, entity)
 );
 
 create index if not exists idx_pipeline_run_log_entity_started
@@ -39,7 +77,7 @@ create table if not exists stg_ib_receipts_history (
   id uuid not null,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz,
@@ -50,7 +88,7 @@ create table if not exists stg_ib_receipts(
   id uuid primary key,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz
@@ -63,7 +101,7 @@ create table if not exists stg_ob_orders_history (
   id uuid not null,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz,
@@ -74,7 +112,7 @@ create table if not exists stg_ob_orders (
   id uuid primary key,
   updated_at timestamptz not null,
   payload jsonb not null,
-  payload_hash text not null,
+  payload_hash bytea not null,
   _run_id text,
   _extracted_at timestamptz,
   _watermark_effective timestamptz
@@ -107,6 +145,9 @@ def engine(pg_dsn) -> Engine:
 def _clean_watermark_table(engine):
     with engine.begin() as conn:
         conn.execute(text("TRUNCATE TABLE etl_watermark;"))
+        conn.execute(text("TRUNCATE TABLE etl_page_size;"))
+        conn.execute(text("TRUNCATE TABLE etl_change_cache;"))
+        conn.execute(text("TRUNCATE TABLE etl_checkpoint;"))
         conn.execute(text("TRUNCATE stg_ib_receipts_history, stg_ib_receipts;"))
         conn.execute(text("TRUNCATE pipeline_run_log;"))
     
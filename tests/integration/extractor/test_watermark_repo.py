@@ -2,7 +2,7 @@ from datetime import datetime, timezone, timedelta
 from sqlalchemy import text
 
 from services.common.config import load_config
-from services.extractor.app.watermark_repo import get_watermark, upsert_watermark
+from services.extractor.app.watermark_repo import get_page_size, get_watermark, upsert_page_size, upsert_watermark
 
 cfg = load_config()
 
@@ -103,3 +103,13 @@ def test_updated_at_changes_on_upsert(engine):
         ).scalar_one()
 
     assert after >= before
+
+
+def test_page_size_round_trip(engine):
+    assert get_page_size(engine, pipeline_name, "ob_orders") is None
+
+    upsert_page_size(engine, pipeline_name, "ob_orders", 1200)
+    upsert_page_size(engine, pipeline_name, "ob_orders", 900)
+
+    assert get_page_size(engine, pipeline_name, "ob_orders") == 900
+    assert get_page_size(engine, pipeline_name, "ib_receipts") is None
@@ -1,7 +1,10 @@
 import pytest
 from sqlalchemy import text
 import uuid
-from services.staging.app.staging_repo import insert_history, upsert_stg_latest
+import pandas as pd
+from services.staging.app.staging_repo import (
+    copy_insert_history, copy_upsert_stg_latest, fetch_latest_state, insert_history, restage_versions, upsert_stg_latest
+)
 from services.staging.app.pipeline_run_logs_repo import start_run_log, finish_run_success
 
 def test_history_global_dedup(engine):
@@ -9,7 +12,7 @@ def test_history_global_dedup(engine):
         "id": "550e8400-e29b-41d4-a716-446655440000",
         "updated_at": "2026-01-23T10:00:00Z",
         "payload": '{"id": "550e8400-e29b-41d4-a716-446655440000","status": "running","updated_at": "2026-01-23T04:33:31+00:00"}',
-        "payload_hash": "h1",
+        "payload_hash": b"h1",
         "_run_id": "r1",
         "_extracted_at": "2026-01-23T10:01:00Z",
         "_watermark_effective": None,
@@ -21,7 +24,7 @@ def test_history_global_dedup(engine):
     with engine.begin() as conn:
         n = conn.execute(
             text("select count(*) from stg_ib_receipts_history where id=:id and payload_hash=:payload_hash"),
-                 {"id": "550e8400-e29b-41d4-a716-446655440000","payload_hash":"h1"}
+                 {"id": "550e8400-e29b-41d4-a716-446655440000","payload_hash":b"h1"}
         ).scalar_one()
         
     assert n == 1
@@ -31,7 +34,7 @@ def test_latest_newer_wins(engine):
         "id": "550e8400-e29b-41d4-a716-446655440000",
         "updated_at": "2026-01-23T10:00:00Z",
         "payload": '{"id": "550e8400-e29b-41d4-a716-446655440000","status": "running","updated_at": "2026-01-23T04:33:31+00:00"}',
-        "payload_hash": "h_old",
+        "payload_hash": b"h_old",
         "_run_id": "r1",
         "_extracted_at": "2026-01-23T10:01:00Z",
         "_watermark_effective": None,
@@ -40,7 +43,7 @@ def test_latest_newer_wins(engine):
         "id": "550e8400-e29b-41d4-a716-446655440000",
         "updated_at": "2026-01-23T10:05:00Z",
         "payload": '{"id": "550e8400-e29b-41d4-a716-446655440000","status": "running","updated_at": "2026-01-23T04:33:31+00:00"}',
-        "payload_hash": "h_old",
+        "payload_hash": b"h_old",
         "_run_id": "r1",
         "_extracted_at": "2026-01-23T10:06:00Z",
         "_watermark_effective": None,
@@ -49,7 +52,7 @@ def test_latest_newer_wins(engine):
         "id": "550e8400-e29b-41d4-a716-446655440000",
         "updated_at": "2026-01-23T09:55:00Z",
         "payload": '{"id": "550e8400-e29b-41d4-a716-446655440000","status": "running","updated_at": "2026-01-23T04:33:31+00:00"}',
-        "payload_hash": "h1",
+        "payload_hash": b"h1",
         "_run_id": "r1",
         "_extracted_at": "2026-01-23T10:07:00Z",
         "_watermark_effective": None,
@@ -84,4 +87,99 @@ def test_run_log_success(engine):
         ).scalar_one()
 
     assert status == "success"
-    
\ No newline at end of file
+    
+
+def test_run_log_is_tracked_per_entity(engine):
+    from services.staging.app.pipeline_run_logs_repo import finish_run_failed, successful_run_ids
+
+    start_run_log(engine, run_id="r1", pipeline_name="wms", entity="ib_receipts")
+    start_run_log(engine, run_id="r1", pipeline_name="wms", entity="ob_orders")
+    finish_run_success(engine, run_id="r1", rows_in=1, inserted_history=1, upserted_latest=1, entity="ib_receipts")
+    finish_run_failed(engine, run_id="r1", error_message="boom", entity="ob_orders")
+
+    assert successful_run_ids(engine, "ib_receipts") == {"r1"}
+    assert successful_run_ids(engine, "ob_orders") == set()
+
+
+def test_history_dual_read_skips_version_stored_under_legacy_hash(engine):
+    record = {
+        "id": "550e8400-e29b-41d4-a716-446655440000",
+        "updated_at": "2026-01-23T10:00:00Z",
+        "payload": '{"id":"550e8400-e29b-41d4-a716-446655440000"}',
+        "payload_hash": b"sha256-digest",
+        "_run_id": "r1",
+        "_extracted_at": "2026-01-23T10:01:00Z",
+        "_watermark_effective": None,
+    }
+    insert_history(engine, "ib_receipts", [record], batch_size=1000)
+
+    rehashed = {**record, "payload_hash": b"blake2b-digest", "payload_hash_legacy": b"sha256-digest", "_run_id": "r2"}
+    changed = {**rehashed, "updated_at": "2026-01-23T10:05:00Z", "payload_hash_legacy": b"other"}
+
+    assert insert_history(engine, "ib_receipts", [rehashed], batch_size=1000) == 0
+    assert insert_history(engine, "ib_receipts", [changed], batch_size=1000) == 1
+
+
+def test_fetch_latest_state_returns_stored_versions(engine):
+    record = {
+        "id": "550e8400-e29b-41d4-a716-446655440000",
+        "updated_at": "2026-01-23T10:00:00Z",
+        "payload": '{"status": "running"}',
+        "payload_hash": b"h1",
+        "_run_id": "r1",
+        "_extracted_at": "2026-01-23T10:01:00Z",
+        "_watermark_effective": None,
+    }
+    upsert_stg_latest(engine, "ib_receipts", [record], batch_size=1000)
+
+    current = fetch_latest_state(
+        engine, "ib_receipts", ["550e8400-e29b-41d4-a716-446655440000", str(uuid.uuid4())]
+    )
+
+    assert current["id"].tolist() == ["550e8400-e29b-41d4-a716-446655440000"]
+    assert current["payload_hash"].tolist() == [b"h1"]
+
+
+def _copy_frame(versions):
+    return pd.DataFrame({
+        "id": ["550e8400-e29b-41d4-a716-446655440000"] * len(versions),
+        "updated_at": pd.to_datetime([v[0] for v in versions], utc=True),
+        "payload": ['{"note": "tab\\tand\\\\slash"}'] * len(versions),
+        "payload_hash": [v[1] for v in versions],
+        "_run_id": ["r1"] * len(versions),
+        "_extracted_at": pd.to_datetime(["2026-01-23T11:00:00Z"] * len(versions), utc=True),
+        "_watermark_effective": [None] * len(versions),
+    })
+
+def test_copy_load_counts_only_written_rows(engine):
+    df = _copy_frame([("2026-01-23T10:00:00Z", b"h1"), ("2026-01-23T10:05:00Z", b"h2")])
+
+    assert copy_insert_history(engine, "ib_receipts", df) == 2
+    assert copy_insert_history(engine, "ib_receipts", df) == 0
+    assert copy_upsert_stg_latest(engine, "ib_receipts", df) == 1
+    assert copy_upsert_stg_latest(engine, "ib_receipts", df) == 0
+
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("select updated_at, payload->>'note', payload_hash from stg_ib_receipts where id=:id"),
+            {"id": "550e8400-e29b-41d4-a716-446655440000"}
+        ).one()
+    assert str(row[0]).startswith("2026-01-23 10:05:00")
+    assert row[1] == "tab\tand\\slash"
+    assert bytes(row[2]) == b"h2"
+
+
+def test_restage_replaces_versions_staged_with_an_old_payload(engine):
+    stale = _copy_frame([("2026-01-23T10:00:00Z", b"old")])
+    copy_insert_history(engine, "ib_receipts", stale)
+    copy_upsert_stg_latest(engine, "ib_receipts", stale)
+    rebuilt = _copy_frame([("2026-01-23T10:00:00Z", b"new")])
+
+    assert restage_versions(engine, "ib_receipts", rebuilt, ["other-run"]) == (0, 1, 1)
+    assert restage_versions(engine, "ib_receipts", rebuilt, ["r1"]) == (1, 0, 0)
+
+    with engine.begin() as conn:
+        history = conn.execute(text("select payload_hash from stg_ib_receipts_history")).scalars().all()
+        latest = conn.execute(text("select payload_hash from stg_ib_receipts")).scalar_one()
+    assert [bytes(h) for h in history] == [b"new"]
+    assert bytes(latest) == b"new"
@@ -0,0 +1,106 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from services.compaction.app.compact import compact_entity, read_partition
+from services.extractor.app.writer_landing import write_landing
+
+
+def _land(landing_root: Path, run_id: str, rows: list[tuple[str, str]], extracted_at: str) -> None:
+    df = pd.DataFrame({
+        "id": [r[0] for r in rows],
+        "updated_at": pd.to_datetime([r[1] for r in rows], utc=True),
+        "status": "NEW",
+    })
+    df["_run_id"] = run_id
+    df["_extracted_at"] = pd.Timestamp(extracted_at)
+    df["_watermark_effective"] = pd.Timestamp(extracted_at)
+    write_landing(df, landing_root, "ob_orders", run_id)
+
+
+@pytest.fixture
+def landing(tmp_path: Path) -> Path:
+    _land(tmp_path, "r1", [("a", "2026-01-01T23:00:00Z"), ("b", "2026-01-02T01:00:00Z")], "2026-01-02T02:00:00Z")
+    # lookback re-fetches b at the same version
+    _land(tmp_path, "r2", [("b", "2026-01-02T01:00:00Z"), ("c", "2026-01-02T03:00:00Z")], "2026-01-02T04:00:00Z")
+    _land(tmp_path, "r3", [("d", "2026-01-02T05:00:00Z")], "2026-01-02T06:00:00Z")
+    return tmp_path
+
+
+def test_compaction_merges_staged_runs_into_deduped_day_partitions(landing: Path):
+    stats = compact_entity(landing, "ob_orders", staged_run_ids={"r1", "r2"})
+
+    assert stats["runs"] == 2
+    assert stats["rows_in"] == 4 and stats["rows_out"] == 3
+    day1 = read_partition(landing, "ob_orders", "2026-01-01")
+    day2 = read_partition(landing, "ob_orders", "2026-01-02")
+    assert day1["id"].tolist() == ["a"]
+    assert day2["id"].tolist() == ["b", "c"]
+    assert day2["_run_id"].astype(str).tolist() == ["r2", "r2"]
+
+    assert not (landing / "ob_orders" / "run_id=r1").exists()
+    assert not (landing / "ob_orders" / "run_id=r2").exists()
+    # staging has not finished r3, it must stay as landed
+    assert (landing / "ob_orders" / "run_id=r3" / "_SUCCESS").exists()
+
+
+def test_compaction_folds_later_runs_into_existing_partition(landing: Path):
+    compact_entity(landing, "ob_orders", staged_run_ids={"r1", "r2"})
+    compact_entity(landing, "ob_orders", staged_run_ids={"r1", "r2", "r3"})
+
+    day2_dir = landing / "_compacted" / "ob_orders" / "date=2026-01-02"
+    assert read_partition(landing, "ob_orders", "2026-01-02")["id"].tolist() == ["b", "c", "d"]
+    assert len([p for p in day2_dir.glob("part-*")]) == 1
+    assert json.loads((day2_dir / "_manifest.json").read_text())["source_runs"] == ["r1", "r2", "r3"]
+
+
+def test_compaction_dry_run_touches_nothing(landing: Path):
+    stats = compact_entity(landing, "ob_orders", staged_run_ids={"r1"}, dry_run=True)
+
+    assert stats["runs"] == 1 and stats["dry_run"]
+    assert (landing / "ob_orders" / "run_id=r1").exists()
+    assert not (landing / "_compacted").exists()
+
+
+def _land_with_lines(landing_root: Path, run_id: str, rows: list[tuple[str, str, int]], extracted_at: str,
+                     output_format: str = "parquet") -> None:
+    from services.common.landing import lines_dataset
+    from services.extractor.app.writer_landing import commit_landing, write_landing_part, write_lines_part
+
+    df = pd.DataFrame({
+        "id": [r[0] for r in rows],
+        "updated_at": pd.to_datetime([r[1] for r in rows], utc=True),
+        "lines": [[{"sku": f"S{k}", "qty": k} for k in range(r[2])] for r in rows],
+    })
+    df["_run_id"] = run_id
+    df["_extracted_at"] = pd.Timestamp(extracted_at)
+    df["_watermark_effective"] = pd.Timestamp(extracted_at)
+    lines_part = write_lines_part(df, landing_root, "ob_orders", run_id, 0, output_format=output_format)
+    commit_landing(landing_root, lines_dataset("ob_orders"), run_id, [lines_part])
+    part = write_landing_part(df, landing_root, "ob_orders", run_id, 0, output_format=output_format)
+    commit_landing(landing_root, "ob_orders", run_id, [part])
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_compaction_compacts_and_removes_exploded_lines_runs(tmp_path: Path, output_format: str):
+    import shutil
+
+    _land_with_lines(tmp_path, "r1", [("a", "2026-01-01T23:00:00Z", 2), ("b", "2026-01-02T01:00:00Z", 1)],
+                     "2026-01-02T02:00:00Z", output_format)
+    _land_with_lines(tmp_path, "r2", [("b", "2026-01-02T01:00:00Z", 1)], "2026-01-02T04:00:00Z", output_format)
+    _land_with_lines(tmp_path, "r3", [("c", "2026-01-02T05:00:00Z", 3)], "2026-01-02T06:00:00Z", output_format)
+    # an entity run compacted before lines runs were: only its lines run is left
+    shutil.rmtree(tmp_path / "ob_orders" / "run_id=r3")
+
+    stats = compact_entity(tmp_path, "ob_orders", staged_run_ids={"r1", "r2", "r3"})
+
+    assert stats["lines"]["runs"] == 3
+    assert stats["lines"]["rows_in"] == 7 and stats["lines"]["rows_out"] == 6
+    day1 = read_partition(tmp_path, "ob_orders_lines", "2026-01-01")
+    day2 = read_partition(tmp_path, "ob_orders_lines", "2026-01-02")
+    assert day1["line_no"].tolist() == [0, 1]
+    assert list(zip(day2["parent_id"], day2["line_no"])) == [("b", 0), ("c", 0), ("c", 1), ("c", 2)]
+    assert day2["_run_id"].astype(str).tolist()[0] == "r2"
+    assert not list((tmp_path / "ob_orders_lines").glob("run_id=*"))
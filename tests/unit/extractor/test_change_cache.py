@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+from services.extractor.app.change_cache import row_hashes, suppress_unchanged
+from services.extractor.app.normalize import normalize_rows
+
+
+def _df(rows, run_id="run-1"):
+    now = datetime(2026, 1, 3, tzinfo=timezone.utc)
+    return normalize_rows(rows, "ob_orders", run_id, now, now, lines_mode="nested")
+
+
+def _order(i, status="NEW", qty=1):
+    return {"id": i, "status": status, "updated_at": "2026-01-02T00:00:00Z", "lines": [{"sku": "A", "qty": qty}]}
+
+
+def test_row_hashes_ignore_run_metadata():
+    rows = [_order("o1"), _order("o2")]
+
+    assert row_hashes(_df(rows, "run-1")).tolist() == row_hashes(_df(rows, "run-2")).tolist()
+
+
+def test_suppress_unchanged_keeps_new_and_changed_rows():
+    first = _df([_order("o1"), _order("o2"), _order("o3")])
+    cache = dict(zip(first["id"], row_hashes(first).tolist()))
+
+    again = _df([_order("o1"), _order("o2", status="DONE"), _order("o3", qty=5), _order("o4")], "run-2")
+    kept, hashes = suppress_unchanged(again, cache)
+
+    assert kept["id"].tolist() == ["o2", "o3", "o4"]
+    assert hashes.tolist() == row_hashes(kept).tolist()
@@ -1,8 +1,10 @@
+import asyncio
 import pytest
 import requests
 from datetime import datetime, timezone
 
 from services.extractor.app import extract
+from services.extractor.app.page_sizer import PageSizer
 
 
 def _dt_utc(y, m, d, hh=0, mm=0, ss=0):
@@ -93,3 +95,286 @@ def test_fetch_all_raises_when_data_not_list(monkeypatch):
             request_timeout_seconds=30,
         )
 
+
+def _page_rows(offset, n):
+    return [
+        {"id": f"{offset + i:04d}", "updated_at": f"2026-01-01T00:{(offset + i) // 60:02d}:{(offset + i) % 60:02d}Z"}
+        for i in range(n)
+    ]
+
+
+def test_fetch_all_concurrent_plans_offsets_from_meta_count(monkeypatch):
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append(params["offset"])
+        offset = params["offset"]
+        n = max(0, min(params["limit"], 7 - offset))
+        return {"data": _page_rows(offset, n), "meta": {"count": 7, "offset": offset}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    rows = extract.fetch_all(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        max_workers=3,
+    )
+
+    assert [r["id"] for r in rows] == [f"{i:04d}" for i in range(7)]
+    assert calls[0] == 0
+    assert sorted(calls) == [0, 2, 4, 6]
+
+
+def test_fetch_all_concurrent_drains_rows_beyond_planned_count(monkeypatch):
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append(params["offset"])
+        offset = params["offset"]
+        # 5 rows exist by the time the fan-out runs, but the first page saw only 4
+        n = max(0, min(params["limit"], 5 - offset))
+        return {"data": _page_rows(offset, n), "meta": {"count": 4, "offset": offset}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    rows = extract.fetch_all(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ob_orders",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        max_workers=4,
+    )
+
+    assert [r["id"] for r in rows] == [f"{i:04d}" for i in range(5)]
+    assert sorted(calls) == [0, 2, 4]
+
+
+def test_fetch_all_cursor_follows_last_key_of_each_page(monkeypatch):
+    rows_all = _page_rows(0, 5)
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append(params.copy())
+        assert "offset" not in params
+        after = params.get("after_id")
+        if after is None:
+            start = 0
+        else:
+            start = next(i for i, r in enumerate(rows_all) if r["id"] == after) + 1
+        return {"data": rows_all[start : start + params["limit"]], "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    rows = extract.fetch_all(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        pagination="cursor",
+    )
+
+    assert [r["id"] for r in rows] == [r["id"] for r in rows_all]
+    assert [c.get("after_id") for c in calls] == [None, "0001", "0003"]
+    assert calls[1]["updated_after"] == rows_all[1]["updated_at"]
+
+
+def test_fetch_all_cursor_raises_when_cursor_does_not_advance(monkeypatch):
+    def fake_get_json(session, url, params, timeout, max_retries):
+        return {"data": _page_rows(0, 2), "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    with pytest.raises(RuntimeError, match="Cursor did not advance"):
+        extract.fetch_all(
+            session=requests.Session(),
+            base_url="http://test",
+            entity="ib_receipts",
+            updated_after=_dt_utc(2026, 1, 1),
+            limit=2,
+            request_timeout_seconds=30,
+            pagination="cursor",
+        )
+
+
+def test_fetch_all_async_cursor_shares_advance_checks(monkeypatch):
+    async def fake_get_json_async(session, url, params, timeout, max_retries, semaphore):
+        return {"data": _page_rows(0, 2), "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json_async", fake_get_json_async)
+
+    with pytest.raises(RuntimeError, match="Cursor did not advance"):
+        asyncio.run(extract.fetch_all_async(
+            session=requests.Session(),
+            base_url="http://test",
+            entity="ib_receipts",
+            updated_after=_dt_utc(2026, 1, 1),
+            limit=2,
+            request_timeout_seconds=30,
+            semaphore=asyncio.Semaphore(2),
+            pagination="cursor",
+        ))
+
+
+def test_iter_row_chunks_rebatches_pages_to_fixed_size():
+    pages = [_page_rows(0, 3), _page_rows(3, 3), _page_rows(6, 1)]
+
+    chunks = list(extract.iter_row_chunks(pages, chunk_rows=4))
+
+    assert [len(c) for c in chunks] == [4, 3]
+    assert [r["id"] for c in chunks for r in c] == [f"{i:04d}" for i in range(7)]
+
+
+def test_fetch_all_async_gathers_planned_offsets(monkeypatch):
+    calls = []
+
+    async def fake_get_json_async(session, url, params, timeout, max_retries, semaphore):
+        calls.append(params["offset"])
+        offset = params["offset"]
+        n = max(0, min(params["limit"], 5 - offset))
+        return {"data": _page_rows(offset, n), "meta": {"count": 5, "offset": offset}}
+
+    monkeypatch.setattr(extract, "get_json_async", fake_get_json_async)
+
+    rows = asyncio.run(extract.fetch_all_async(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        semaphore=asyncio.Semaphore(2),
+    ))
+
+    assert [r["id"] for r in rows] == [f"{i:04d}" for i in range(5)]
+    assert sorted(calls) == [0, 2, 4]
+
+
+def test_fetch_all_adaptive_shrinks_on_timeout_and_advances_by_rows(monkeypatch):
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append((params["offset"], params["limit"], max_retries))
+        if len(calls) == 1:
+            raise requests.exceptions.ReadTimeout("slow")
+        offset, limit = params["offset"], params["limit"]
+        return {"data": _page_rows(offset, max(0, min(limit, 7 - offset))), "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+    monkeypatch.setattr(extract.time, "sleep", lambda s: None)
+
+    sizer = PageSizer(size=4, min_size=2, max_size=8, target_latency_s=60.0)
+    rows = extract.fetch_all(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=4,
+        request_timeout_seconds=30,
+        page_sizer=sizer,
+    )
+
+    assert [r["id"] for r in rows] == [f"{i:04d}" for i in range(7)]
+    # adaptive scans end on an empty page, not on the short one at offset 5
+    assert calls == [(0, 4, 0), (0, 2, 0), (2, 3, 0), (5, 4, 0), (7, 6, 0)]
+    assert sizer.size == 8
+
+
+def test_fetch_all_adaptive_keeps_paging_past_an_upstream_limit_cap(monkeypatch):
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append((params["offset"], params["limit"]))
+        # the upstream silently serves at most 3 rows per page
+        offset, limit = params["offset"], min(params["limit"], 3)
+        return {"data": _page_rows(offset, max(0, min(limit, 10 - offset))), "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    sizer = PageSizer(size=4, min_size=2, max_size=8, target_latency_s=60.0)
+    rows = extract.fetch_all(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=4,
+        request_timeout_seconds=30,
+        page_sizer=sizer,
+    )
+
+    assert [r["id"] for r in rows] == [f"{i:04d}" for i in range(10)]
+    assert calls[:2] == [(0, 4), (3, 6)]
+    assert calls[2:] == [(6, 3), (9, 3), (10, 3)]
+    assert sizer.max_size == 3
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_iter_pages_resumes_from_start_offset(monkeypatch, max_workers):
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append(params["offset"])
+        offset = params["offset"]
+        n = max(0, min(params["limit"], 7 - offset))
+        return {"data": _page_rows(offset, n), "meta": {"count": 7, "offset": offset}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    pages = extract.iter_pages(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        max_workers=max_workers,
+        start_offset=3,
+    )
+
+    assert [r["id"] for page in pages for r in page] == [f"{i:04d}" for i in range(3, 7)]
+    assert sorted(calls) == [3, 5, 7]
+
+
+def test_iter_pages_cursor_resumes_after_start_key(monkeypatch):
+    rows_all = _page_rows(0, 5)
+    calls = []
+
+    def fake_get_json(session, url, params, timeout, max_retries):
+        calls.append(params.copy())
+        start = next(i for i, r in enumerate(rows_all) if r["id"] == params["after_id"]) + 1
+        return {"data": rows_all[start : start + params["limit"]], "meta": {}}
+
+    monkeypatch.setattr(extract, "get_json", fake_get_json)
+
+    pages = extract.iter_pages(
+        session=requests.Session(),
+        base_url="http://test",
+        entity="ib_receipts",
+        updated_after=_dt_utc(2026, 1, 1),
+        limit=2,
+        request_timeout_seconds=30,
+        pagination="cursor",
+        start_after=(rows_all[1]["updated_at"], rows_all[1]["id"]),
+    )
+
+    assert [r["id"] for page in pages for r in page] == ["0002", "0003", "0004"]
+    assert calls[0]["updated_after"] == rows_all[1]["updated_at"]
+
+
+def test_skip_through_drops_rows_up_to_last_key():
+    pages = [
+        [{"id": "a", "updated_at": "2026-01-01T00:00:01Z"}, {"id": "b", "updated_at": "2026-01-01T00:00:02Z"}],
+        [{"id": "c", "updated_at": "2026-01-01T00:00:02+00:00"}, {"id": "a", "updated_at": "2026-01-01T00:00:03Z"}],
+    ]
+
+    kept = list(extract.skip_through(pages, ("2026-01-01T00:00:02Z", "b")))
+
+    assert kept == [[pages[1][0], pages[1][1]]]
+    assert extract.resume_updated_after(("2026-01-01T00:00:02Z", "b")) == _dt_utc(2026, 1, 1, ss=1)
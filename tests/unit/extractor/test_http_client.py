@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import pytest
+import requests
+
+from services.extractor.app import http_client
+
+
+class _Resp:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode("utf-8")
+        self.headers = {"Content-Encoding": "gzip", **(headers or {})}
+        self.url = "http://test"
+        self.text = self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+
+class _FakeSession:
+    def __init__(self, responses, rate_limiter=None, circuit_breaker=None):
+        self.responses = list(responses)
+        self.calls = 0
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+
+    def get(self, url, params, timeout):
+        self.calls += 1
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+
+    async def fake_async_sleep(s):
+        sleeps.append(s)
+
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    monkeypatch.setattr(http_client.asyncio, "sleep", fake_async_sleep)
+    return sleeps
+
+
+def test_get_json_async_retries_retryable_status_then_succeeds(no_sleep):
+    session = _FakeSession([_Resp(503), requests.exceptions.ConnectionError("boom"), _Resp(200, {"data": []})])
+
+    out = asyncio.run(http_client.get_json_async(session, "http://test", {}, max_retries=3))
+
+    assert out == {"data": []}
+    assert session.calls == 3
+    assert len(no_sleep) == 2
+
+
+def test_get_json_async_raises_after_max_retries(no_sleep):
+    session = _FakeSession([_Resp(500), _Resp(500)])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        asyncio.run(http_client.get_json_async(session, "http://test", {}, max_retries=1))
+
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_decode_json_with_and_without_orjson(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(http_client, "orjson", None)
+    body = {"data": [{"id": "1", "note": "giao h\u00e0ng"}], "meta": {"count": 1}}
+
+    assert http_client._decode_json(_Resp(200, body)) == body
+
+
+def test_decode_json_logs_size_and_decode_time_at_info(caplog):
+    import logging
+
+    resp = _Resp(200, {"data": []}, headers={"Content-Length": "7"})
+
+    with caplog.at_level(logging.INFO, logger=http_client.logger.name):
+        http_client._decode_json(resp)
+
+    assert f"bytes={len(resp.content)} wire_bytes=7 encoding=gzip decode_ms=" in caplog.text
+
+
+def test_decode_json_rejects_non_json():
+    resp = _Resp(200)
+    resp.content = b"<html>"
+
+    with pytest.raises(RuntimeError, match="Response is not JSON"):
+        http_client._decode_json(resp)
+
+
+def test_get_json_honours_retry_after_and_pauses_shared_limiter(no_sleep):
+    limiter = http_client.TokenBucket(rate_per_s=1000, burst=10)
+    session = _FakeSession([_Resp(429, headers={"Retry-After": "7"}), _Resp(200, {"data": []})], rate_limiter=limiter)
+
+    assert http_client.get_json(session, "http://test", {}, max_retries=3) == {"data": []}
+
+    assert no_sleep[0] == 7.0
+    # the pause applies to every caller sharing the limiter, not only the one that got the 429
+    assert limiter.reserve() > 6.0
+
+
+def test_token_bucket_spaces_out_requests_beyond_burst():
+    limiter = http_client.TokenBucket(rate_per_s=10, burst=2)
+
+    waits = [limiter.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[3] == pytest.approx(0.2, abs=0.02)
+
+
+def test_circuit_breaker_fails_fast_once_open_and_recovers_after_trial(no_sleep, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: clock[0])
+    breaker = http_client.CircuitBreaker(failure_threshold=2, reset_timeout_s=30)
+    session = _FakeSession([_Resp(503), _Resp(503), _Resp(200, {"ok": 1})], circuit_breaker=breaker)
+
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get_json(session, "http://test", {}, max_retries=5)
+    assert session.calls == 2
+
+    clock[0] += 31
+    assert http_client.get_json(session, "http://test", {}, max_retries=0) == {"ok": 1}
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_half_open_failure_reopens():
+    breaker = http_client.CircuitBreaker(failure_threshold=1, reset_timeout_s=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    assert breaker.state == "open"
+    breaker.before_call()  # a new trial is allowed, the cancelled one did not stay in flight
+    assert breaker.state == "half_open"
+    with pytest.raises(http_client.CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ChunkedEncodingError("truncated"),
+    requests.exceptions.ContentDecodingError("bad gzip"),
+])
+def test_circuit_breaker_releases_trial_on_any_exception(no_sleep, monkeypatch, error):
+    clock = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: clock[0])
+    breaker = http_client.CircuitBreaker(failure_threshold=1, reset_timeout_s=30)
+    breaker.record_failure()
+    session = _FakeSession([error, _Resp(200, {"ok": 1})], circuit_breaker=breaker)
+
+    clock[0] += 31
+    with pytest.raises(type(error)):
+        http_client.get_json(session, "http://test", {}, max_retries=0)
+    assert breaker.state == "open"
+
+    clock[0] += 31
+    assert http_client.get_json(session, "http://test", {}, max_retries=0) == {"ok": 1}
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_releases_trial_when_async_call_is_cancelled(monkeypatch):
+    breaker = http_client.CircuitBreaker(failure_threshold=1, reset_timeout_s=0)
+    breaker.record_failure()
+
+    async def cancelled(*args, **kwargs):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(http_client.asyncio, "to_thread", cancelled)
+
+    session = _FakeSession([], circuit_breaker=breaker)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(http_client.get_json_async(session, "http://test", {}, max_retries=0))
+    assert breaker.state == "open"
+    breaker.before_call()  # a new trial is allowed, the cancelled one did not stay in flight
+    assert breaker.state == "half_open"
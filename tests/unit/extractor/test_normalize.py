@@ -113,3 +113,139 @@ def test_normalize_parses_time_columns_and_flattens_lines_and_adds_metadata_and_
     assert (df["_watermark_effective"].dt.tz == timezone.utc)
 
 
+def _normalize_both(rows):
+    kwargs = dict(
+        entity="ob_orders",
+        run_id="run-1",
+        extracted_at=_utc(2026, 1, 3),
+        watermark_effective=_utc(2026, 1, 1),
+    )
+    return (
+        normalize_rows(rows=rows, engine="pandas", **kwargs),
+        normalize_rows(rows=rows, engine="arrow", **kwargs),
+    )
+
+
+def _order(i, updated_at, qty=1, **extra):
+    row = {
+        "id": i,
+        "so_code": f"SO{i}",
+        "expected_delivery_date": "2026-01-02",
+        "actual_delivery_date": None,
+        "total_amount": 10.5,
+        "note": None,
+        "status": "NEW",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": updated_at,
+        "lines": [{"sku": "Ä", "qty": qty}],
+    }
+    row.update(extra)
+    return row
+
+
+def test_arrow_engine_matches_pandas_including_index_and_dedupe():
+    rows = [
+        _order(3, "2026-01-01T00:00:05+00:00"),
+        _order(1, "2026-01-01T00:00:02+00:00", qty=1),
+        _order(2, "2026-01-01T00:00:02+00:00", lines=None),
+        _order(1, "2026-01-01T00:00:02+00:00", qty=2),
+        _order(10, "2026-01-01T00:00:01+00:00", expected_delivery_date=None),
+    ]
+
+    expected, actual = _normalize_both(rows)
+
+    pd.testing.assert_frame_equal(actual, expected)
+    assert actual.loc[3, "lines_json"] == '[{"sku": "Ä", "qty": 2}]'
+
+
+def test_arrow_engine_falls_back_when_types_or_formats_are_mixed():
+    rows = [
+        _order(1, "2026-01-01T00:00:02+00:00"),
+        _order("2", "2026-01-01T00:00:01Z"),
+    ]
+
+    expected, actual = _normalize_both(rows)
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize(
+    "rows, match",
+    [
+        ([_order(None, "2026-01-01T00:00:02+00:00")], "Null in required fields"),
+        ([{"id": 1}], "Missing required colums"),
+    ],
+)
+def test_arrow_engine_raises_same_errors_as_pandas(rows, match):
+    with pytest.raises(RuntimeError, match=match):
+        normalize_rows(
+            rows=rows,
+            entity="ob_orders",
+            run_id="run-1",
+            extracted_at=_utc(2026, 1, 1),
+            watermark_effective=_utc(2026, 1, 1),
+            engine="arrow",
+        )
+
+
+def test_normalize_rows_rejects_unknown_engine():
+    with pytest.raises(ValueError):
+        normalize_rows(
+            rows=[_order(1, "2026-01-01T00:00:02+00:00")],
+            entity="ob_orders",
+            run_id="run-1",
+            extracted_at=_utc(2026, 1, 1),
+            watermark_effective=_utc(2026, 1, 1),
+            engine="polars",
+        )
+
+
+def test_normalize_applies_entity_schema():
+    df = normalize_rows(
+        rows=[_order(1, "2026-01-01T00:00:02+00:00", customer_id=2001, created_by="system")],
+        entity="ob_orders",
+        run_id="run-1",
+        extracted_at=_utc(2026, 1, 1),
+        watermark_effective=_utc(2026, 1, 1),
+    )
+
+    assert isinstance(df["status"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["created_by"].dtype, pd.CategoricalDtype)
+    assert str(df["customer_id"].dtype) == "Int64"
+    assert str(df["so_code"].dtype) == "string"
+    assert str(df["_extracted_at"].dtype) == "datetime64[ns, UTC]"
+
+
+def test_nested_lines_mode_keeps_lines_in_place_for_both_engines():
+    rows = [
+        _order(2, "2026-01-01T00:00:02+00:00", qty=3),
+        _order(1, "2026-01-01T00:00:01+00:00", lines=None),
+    ]
+    kwargs = dict(
+        entity="ob_orders",
+        run_id="run-1",
+        extracted_at=_utc(2026, 1, 3),
+        watermark_effective=_utc(2026, 1, 1),
+        lines_mode="nested",
+    )
+
+    expected = normalize_rows(rows=rows, engine="pandas", **kwargs)
+    actual = normalize_rows(rows=rows, engine="arrow", **kwargs)
+
+    pd.testing.assert_frame_equal(actual, expected)
+    assert "lines_json" not in actual.columns
+    assert actual["lines"].tolist() == [None, [{"sku": "Ä", "qty": 3}]]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_normalize_keeps_ids_beyond_int32(engine):
+    df = normalize_rows(
+        rows=[_order(1, "2026-01-01T00:00:02+00:00", customer_id=3_000_000_000)],
+        entity="ob_orders",
+        run_id="run-1",
+        extracted_at=_utc(2026, 1, 1),
+        watermark_effective=_utc(2026, 1, 1),
+        engine=engine,
+    )
+
+    assert df["customer_id"].tolist() == [3_000_000_000]
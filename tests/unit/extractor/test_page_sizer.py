@@ -0,0 +1,47 @@
+import pytest
+
+from services.extractor.app.page_sizer import PageSizer
+
+
+def _sizer(size=500):
+    return PageSizer(size=size, min_size=100, max_size=1000, target_latency_s=1.0)
+
+
+def test_grows_while_under_target_and_stays_within_max():
+    s = _sizer()
+    s.on_success(0.2)
+    assert s.size == 750
+    s.on_success(0.2)
+    assert s.size == 1000
+
+
+def test_shrinks_proportionally_when_slow_and_halves_on_failure():
+    s = _sizer(800)
+    s.on_success(1.6)
+    assert s.size == 500
+    s.on_failure()
+    assert s.size == 250
+    s.on_failure()
+    s.on_failure()
+    assert s.size == 100
+
+
+def test_initial_size_is_clamped_and_bounds_validated():
+    assert _sizer(size=5000).size == 1000
+    with pytest.raises(ValueError):
+        PageSizer(size=10, min_size=0, max_size=10, target_latency_s=1.0)
+
+
+def test_short_page_followed_by_more_rows_caps_max_size():
+    s = _sizer(800)
+    s.on_page(800, 300)
+    assert s.max_size == 1000
+    s.on_page(800, 300)
+    assert (s.max_size, s.size) == (300, 300)
+
+
+def test_short_last_page_keeps_bounds():
+    s = _sizer(800)
+    s.on_page(800, 17)
+    s.on_page(800, 0)
+    assert (s.max_size, s.size) == (1000, 800)
@@ -0,0 +1,157 @@
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from services.common.config import load_config
+from services.extractor.app import run
+
+
+@pytest.fixture
+def cfg(monkeypatch, tmp_path):
+    monkeypatch.setenv("PG_DSN", "postgresql+psycopg2://u:p@localhost:5432/db")
+    monkeypatch.setenv("LANDING_ROOT", str(tmp_path))
+    return replace(load_config(), entity_parallelism="threads")
+
+
+@pytest.fixture
+def fake_extract(monkeypatch):
+    done = []
+
+    def fake_extract_entity(cfg, engine, session, entity, run_id, extracted_at):
+        if entity == "ob_orders":
+            raise RuntimeError("WMS down")
+        done.append(entity)
+        return datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+    monkeypatch.setattr(run, "build_engine", lambda dsn: object())
+    monkeypatch.setattr(run, "build_http_session", lambda cfg: object())
+    monkeypatch.setattr(run, "extract_entity", fake_extract_entity)
+    return done
+
+
+def test_run_entity_worker_reports_failure_without_raising(cfg, fake_extract):
+    st = run.run_entity_worker(cfg, "ob_orders", "run-1", datetime(2026, 1, 3, tzinfo=timezone.utc))
+
+    assert st["status"] == "failed"
+    assert st["error"] == "WMS down"
+    assert st["new_wm"] is None
+
+
+def test_run_parallel_commits_healthy_entity_before_reporting_failure(cfg, fake_extract):
+    with pytest.raises(RuntimeError, match=r"\['ob_orders'\]"):
+        run._run_parallel(cfg, ["ib_receipts", "ob_orders"], "run-1", datetime(2026, 1, 3, tzinfo=timezone.utc))
+
+    assert fake_extract == ["ib_receipts"]
+
+
+def test_land_and_commit_commits_exploded_lines_before_entity(cfg, monkeypatch):
+    cfg = replace(cfg, landing_lines_mode="nested", landing_lines_explode=True)
+    monkeypatch.setattr(run, "upsert_watermark", lambda **kwargs: None)
+    rows = [{
+        "id": "o1",
+        "updated_at": "2026-01-02T00:00:00Z",
+        "lines": [{"line_id": "l1", "product_id": 1001, "sku": "SKU-1001", "qty": 1}],
+    }]
+    now = datetime(2026, 1, 3, tzinfo=timezone.utc)
+
+    new_wm = run.land_and_commit(cfg, object(), "ob_orders", "run-1", now, now, now, iter([rows]))
+
+    assert new_wm == datetime(2026, 1, 2, tzinfo=timezone.utc)
+    assert (cfg.landing_root / "ob_orders_lines" / "run_id=run-1" / "_SUCCESS").read_text().split() == ["part-000.parquet"]
+    assert (cfg.landing_root / "ob_orders" / "run_id=run-1" / "_SUCCESS").exists()
+
+
+def test_land_and_commit_suppresses_rows_seen_by_the_change_cache(cfg, monkeypatch):
+    from services.extractor.app.change_cache import row_hashes
+    from services.extractor.app.normalize import normalize_rows
+
+    cfg = replace(cfg, change_cache=True)
+    now = datetime(2026, 1, 3, tzinfo=timezone.utc)
+    rows = [{"id": f"o{i}", "status": "NEW", "updated_at": "2026-01-02T00:00:00Z"} for i in range(3)]
+    seen = normalize_rows(rows[:2], "ob_orders", "run-0", now, now)
+    upserted = []
+    monkeypatch.setattr(run, "upsert_watermark", lambda **kwargs: None)
+    monkeypatch.setattr(run, "load_change_cache", lambda *a: dict(zip(seen["id"], row_hashes(seen).tolist())))
+    monkeypatch.setattr(run, "upsert_change_cache", lambda engine, p, e, keys, hashes: upserted.extend(keys["id"]))
+    monkeypatch.setattr(run, "prune_change_cache", lambda *a: 0)
+
+    new_wm = run.land_and_commit(cfg, object(), "ob_orders", "run-1", now, now, now, iter([rows]))
+
+    assert new_wm == datetime(2026, 1, 2, tzinfo=timezone.utc)
+    assert upserted == ["o2"]
+    landed = pd.read_parquet(cfg.landing_root / "ob_orders" / "run_id=run-1" / "part-000.parquet")
+    assert landed["id"].tolist() == ["o2"]
+
+
+def test_land_and_commit_resumes_after_last_checkpointed_part(cfg, monkeypatch):
+    saved = []
+    monkeypatch.setattr(run, "upsert_watermark", lambda **kwargs: None)
+    monkeypatch.setattr(run, "save_checkpoint", lambda **kwargs: saved.append(kwargs))
+    monkeypatch.setattr(run, "delete_checkpoint", lambda *a: saved.clear())
+    rows = [{"id": f"o{i}", "updated_at": f"2026-01-02T00:00:0{i}Z"} for i in range(6)]
+    now = datetime(2026, 1, 3, tzinfo=timezone.utc)
+
+    def failing_chunks():
+        yield rows[:2]
+        yield rows[2:4]
+        raise RuntimeError("WMS down")
+
+    with pytest.raises(RuntimeError, match="WMS down"):
+        run.land_and_commit(cfg, object(), "ob_orders", "run-1", now, now, now, failing_chunks(), save_checkpoints=True)
+
+    checkpoint = {k: saved[-1][k] for k in ("part_no", "rows_fetched", "max_updated_at")}
+    assert checkpoint["part_no"] == 1 and checkpoint["rows_fetched"] == 4
+    assert saved[-1]["last_key"] == ("2026-01-02T00:00:03Z", "o3")
+    # a part written after the last checkpoint is thrown away on resume
+    (cfg.landing_root / "ob_orders" / "run_id=run-1" / "part-002.parquet").write_bytes(b"partial")
+
+    new_wm = run.land_and_commit(
+        cfg, object(), "ob_orders", "run-1", now, now, now, iter([rows[4:]]), checkpoint=checkpoint, save_checkpoints=True
+    )
+
+    assert new_wm == datetime(2026, 1, 2, 0, 0, 5, tzinfo=timezone.utc)
+    assert saved == []
+    run_dir = cfg.landing_root / "ob_orders" / "run_id=run-1"
+    assert (run_dir / "_SUCCESS").read_text().split() == ["part-000.parquet", "part-001.parquet", "part-002.parquet"]
+    assert pd.read_parquet(run_dir / "part-002.parquet")["id"].tolist() == ["o4", "o5"]
+
+
+def test_extract_entity_resumes_offset_mode_from_saved_key(cfg, monkeypatch):
+    from datetime import timedelta
+
+    cfg = replace(cfg, extract_checkpoint=True, landing_part_rows=2, pagination_mode="offset")
+    now = datetime(2026, 1, 3, tzinfo=timezone.utc)
+    checkpoint = {
+        "part_no": 1, "rows_fetched": 4, "last_updated_at": "2026-01-02T00:00:03Z", "last_id": "o3",
+        "max_updated_at": datetime(2026, 1, 2, 0, 0, 3, tzinfo=timezone.utc),
+        "wm_saved": now - timedelta(days=1), "wm_effective": now - timedelta(days=2), "extracted_at": now,
+    }
+    # o2 was deleted upstream and o3b shares o3's updated_at, so a raw offset of 4 would skip o3b and o4
+    upstream = [
+        {"id": "o3", "updated_at": "2026-01-02T00:00:03Z"},
+        {"id": "o3b", "updated_at": "2026-01-02T00:00:03Z"},
+        {"id": "o4", "updated_at": "2026-01-02T00:00:04Z"},
+    ]
+    calls = []
+    landed = []
+
+    def fake_iter_pages(**kwargs):
+        calls.append(kwargs)
+        return iter([upstream])
+
+    def fake_land_and_commit(**kwargs):
+        landed.extend(r["id"] for rows in kwargs["chunks"] for r in rows)
+        return now
+
+    monkeypatch.setattr(run, "get_watermark", lambda *a: now)
+    monkeypatch.setattr(run, "get_checkpoint", lambda *a: checkpoint)
+    monkeypatch.setattr(run, "iter_pages", fake_iter_pages)
+    monkeypatch.setattr(run, "land_and_commit", fake_land_and_commit)
+
+    run.extract_entity(cfg, object(), object(), "ob_orders", "run-1", now)
+
+    assert calls[0]["updated_after"] < datetime(2026, 1, 2, 0, 0, 3, tzinfo=timezone.utc)
+    assert "start_offset" not in calls[0]
+    assert landed == ["o3b", "o4"]
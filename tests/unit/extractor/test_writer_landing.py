@@ -2,7 +2,9 @@ from pathlib import Path
 import pandas as pd
 import pytest
 
-from services.extractor.app.writer_landing import write_landing
+from services.extractor.app.writer_landing import (
+    commit_landing, reset_landing_parts, write_landing, write_landing_part, write_lines_part
+)
 
 
 def test_write_landing_rejects_unknown_format(tmp_path: Path):
@@ -39,3 +41,138 @@ def test_write_landing_fails_if_output_already_exists(tmp_path: Path):
 
     with pytest.raises(RuntimeError, match="Landing output already exists"):
         write_landing(df, tmp_path, "ib_receipts", "run-1", output_format="csv")
+
+
+def test_write_landing_parts_and_commit_marker(tmp_path: Path):
+    parts = [
+        write_landing_part(pd.DataFrame([{"id": str(i)}]), tmp_path, "ob_orders", "run-1", part_no=i, output_format="csv")
+        for i in range(2)
+    ]
+    marker = commit_landing(tmp_path, "ob_orders", "run-1", parts)
+
+    assert [p.name for p in parts] == ["part-000.csv", "part-001.csv"]
+    assert marker == tmp_path / "ob_orders" / "run_id=run-1" / "_SUCCESS"
+    assert marker.read_text().split() == ["part-000.csv", "part-001.csv"]
+
+    with pytest.raises(RuntimeError, match="already committed"):
+        commit_landing(tmp_path, "ob_orders", "run-1", parts)
+
+
+def _nested_orders():
+    return pd.DataFrame({
+        "id": pd.Series(["o1", "o2", "o3"], dtype="string"),
+        "updated_at": pd.to_datetime(["2026-01-01T00:00:01Z"] * 3, utc=True),
+        "lines": [
+            [{"line_id": "l1", "product_id": 1001, "sku": "SKU-1001", "qty": 2}],
+            None,
+            [
+                {"line_id": "l2", "product_id": 1001, "sku": "SKU-1001", "qty": 1},
+                {"line_id": "l3", "product_id": 1003, "sku": "SKU-1003", "qty": 4},
+            ],
+        ],
+        "_run_id": "run-1",
+    })
+
+
+def test_write_landing_part_stores_lines_as_typed_list_of_struct(tmp_path: Path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out = write_landing_part(_nested_orders(), tmp_path, "ob_orders", "run-1", part_no=0)
+
+    lines_type = pq.read_schema(out).field("lines").type
+    assert pa.types.is_list(lines_type)
+    assert lines_type.value_type.field("qty").type == pa.int64()
+    assert pq.read_table(out).column("lines").to_pylist()[1] is None
+
+    with pytest.raises(ValueError, match="need parquet or arrow"):
+        write_landing_part(_nested_orders(), tmp_path, "ob_orders", "run-2", part_no=0, output_format="csv")
+
+
+def test_write_lines_part_explodes_lines_keyed_by_parent(tmp_path: Path):
+    import pyarrow.parquet as pq
+
+    out = write_lines_part(_nested_orders(), tmp_path, "ob_orders", "run-1", part_no=0)
+
+    assert out == tmp_path / "ob_orders_lines" / "run_id=run-1" / "part-000.parquet"
+    lines = pq.read_table(out).to_pandas()
+    assert lines["parent_id"].tolist() == ["o1", "o3", "o3"]
+    assert lines["line_no"].tolist() == [0, 0, 1]
+    assert lines["qty"].tolist() == [2, 1, 4]
+    assert str(lines["product_id"].dtype) == "int64"
+    assert isinstance(lines["sku"].dtype, pd.CategoricalDtype)
+
+
+def test_write_landing_part_applies_entity_parquet_layout(tmp_path: Path, monkeypatch):
+    import pyarrow.parquet as pq
+    from services.common import landing
+
+    monkeypatch.setitem(landing.PARQUET_LAYOUT, "ob_orders", landing.ParquetLayout(row_group_rows=2))
+    df = pd.DataFrame({
+        "id": ["c", "a", "b", "a"],
+        "updated_at": pd.to_datetime(
+            ["2026-01-01T00:00:02Z", "2026-01-01T00:00:03Z", "2026-01-01T00:00:01Z", "2026-01-01T00:00:02Z"], utc=True
+        ),
+    })
+
+    out = write_landing_part(df, tmp_path, "ob_orders", "run-1", part_no=0)
+
+    pf = pq.ParquetFile(out)
+    assert pf.metadata.num_row_groups == 2
+    assert pf.metadata.row_group(0).column(0).compression == "ZSTD"
+    assert [c.column_index for c in pf.metadata.row_group(0).sorting_columns] == [1, 0]
+    assert pf.read().column("id").to_pylist() == ["b", "a", "c", "a"]
+    stats = pf.metadata.row_group(1).column(1).statistics
+    assert stats.min == pd.Timestamp("2026-01-01T00:00:02Z") and stats.max == pd.Timestamp("2026-01-01T00:00:03Z")
+
+
+def test_commit_landing_writes_manifest_with_file_stats(tmp_path: Path):
+    import hashlib
+    import json
+
+    parts = [
+        write_landing_part(
+            pd.DataFrame({"id": [f"{i}a", f"{i}b"], "updated_at": pd.to_datetime([f"2026-01-0{i + 1}T00:00:00Z"] * 2, utc=True)}),
+            tmp_path, "ob_orders", "run-1", part_no=i,
+        )
+        for i in range(2)
+    ]
+    commit_landing(tmp_path, "ob_orders", "run-1", parts)
+
+    manifest = json.loads((tmp_path / "ob_orders" / "run_id=run-1" / "_manifest.json").read_text())
+    assert manifest["rows"] == 4
+    assert manifest["min_updated_at"] == "2026-01-01T00:00:00+00:00"
+    assert manifest["max_updated_at"] == "2026-01-02T00:00:00+00:00"
+    assert manifest["schema_fingerprint"] == manifest["files"][0]["schema_fingerprint"]
+    assert [f["name"] for f in manifest["files"]] == ["part-000.parquet", "part-001.parquet"]
+    assert manifest["files"][1]["bytes"] == parts[1].stat().st_size
+    assert manifest["files"][1]["sha256"] == hashlib.sha256(parts[1].read_bytes()).hexdigest()
+
+
+@pytest.mark.parametrize("compression", ["uncompressed", "lz4"])
+def test_write_landing_arrow_ipc_with_nested_lines_and_manifest(tmp_path: Path, compression: str):
+    import json
+    import pyarrow as pa
+
+    out = write_landing(_nested_orders(), tmp_path, "ob_orders", "run-1", output_format="arrow", arrow_compression=compression)
+
+    assert out.name == "part-000.arrow"
+    table = pa.ipc.open_file(pa.memory_map(str(out))).read_all()
+    assert table.column("lines").type.value_type.field("qty").type == pa.int64()
+    assert table.column("id").to_pylist() == ["o1", "o2", "o3"]
+    manifest = json.loads((out.parent / "_manifest.json").read_text())
+    assert manifest["rows"] == 3
+    assert manifest["max_updated_at"] == "2026-01-01T00:00:01+00:00"
+
+
+def test_reset_landing_parts_orders_parts_past_999_numerically(tmp_path: Path):
+    run_dir = tmp_path / "ob_orders" / "run_id=run-1"
+    run_dir.mkdir(parents=True)
+    for i in range(1002):
+        (run_dir / f"part-{i:03d}.parquet").write_bytes(b"")
+
+    kept = reset_landing_parts(tmp_path, "ob_orders", "run-1", keep_parts=1001)
+
+    assert [p.name for p in kept[-3:]] == ["part-998.parquet", "part-999.parquet", "part-1000.parquet"]
+    assert len(kept) == 1001
+    assert not (run_dir / "part-1001.parquet").exists()
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from services.mock_wms_api.app import main
+
+
+def _brute_force(rows, updated_after, after_id):
+    items = sorted(rows, key=lambda x: (datetime.fromisoformat(x["updated_at"]), x["id"]))
+    if updated_after and after_id is not None:
+        return [x for x in items if (datetime.fromisoformat(x["updated_at"]), x["id"]) > (updated_after, after_id)]
+    if updated_after:
+        return [x for x in items if datetime.fromisoformat(x["updated_at"]) > updated_after]
+    return items
+
+
+def test_index_matches_full_sort_after_ticks():
+    for _ in range(3):
+        main.simulate_tick(n_changes=50)
+
+    for name in ("ib", "ob"):
+        index = main.INDEX[name]
+        rows = main.DB[name]
+        assert len(index.rows) == len(rows)
+
+        pivot = index.rows[len(rows) // 2]
+        cursors = [
+            (None, None),
+            (datetime.fromisoformat(pivot["updated_at"]), None),
+            (datetime.fromisoformat(pivot["updated_at"]), pivot["id"]),
+        ]
+        for updated_after, after_id in cursors:
+            expected = _brute_force(rows, updated_after, after_id)
+            page = main.page_items(index, updated_after, after_id, limit=25, offset=10)
+
+            assert page["meta"]["count"] == len(expected)
+            assert [x["id"] for x in page["data"]] == [x["id"] for x in expected[10:35]]
+
+
+def test_touch_moves_row_to_new_position():
+    index = main.SortedIndex()
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = [{"id": f"r{i}", "updated_at": main.iso(t0 + timedelta(seconds=i))} for i in range(3)]
+    index.rebuild(rows)
+
+    index.touch(rows[0], t0 + timedelta(seconds=10))
+
+    assert [r["id"] for r in index.rows] == ["r1", "r2", "r0"]
+    assert index.start(t0 + timedelta(seconds=1), None) == 1
+    assert index.start(t0 + timedelta(seconds=1), "r1") == 1
+    assert index.start(t0 + timedelta(seconds=1), "r0") == 0
+
+
+def test_rendered_page_matches_page_and_tick_drops_stale_json():
+    index = main.INDEX["ob"]
+    page = main.page_items(index, None, None, limit=5, offset=0)
+
+    body = json.loads(main.render_page(page).body)
+    assert body["data"] == json.loads(json.dumps(page["data"]))
+    assert body["meta"] == page["meta"]
+
+    for row in main.DB["ob"]:
+        main.record_json(row)
+    main.simulate_tick(n_changes=200)
+    for row in main.DB["ob"]:
+        assert json.loads(main.record_json(row)) == json.loads(json.dumps(row))
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pandas as pd
+
+from services.extractor.app.writer_landing import write_landing
+from services.staging.app.catch_up import collapse_versions, latest_mask, pending_runs
+
+
+def _land(landing_root: Path, run_id: str) -> None:
+    df = pd.DataFrame({"id": ["1"], "updated_at": pd.to_datetime(["2026-01-01T00:00:00Z"], utc=True)})
+    df["_run_id"] = run_id
+    df["_extracted_at"] = pd.Timestamp("2026-01-01T00:01:00Z")
+    df["_watermark_effective"] = pd.Timestamp("2026-01-01T00:00:00Z")
+    write_landing(df, landing_root, "ob_orders", run_id)
+
+
+def test_pending_runs_skips_staged_and_orders_by_landing_time(tmp_path: Path) -> None:
+    for run_id in ["ccc", "aaa", "bbb", "ddd"]:
+        _land(tmp_path, run_id)
+
+    assert pending_runs(tmp_path, "ob_orders", {"bbb"}, max_runs=10) == ["ccc", "aaa", "ddd"]
+    assert pending_runs(tmp_path, "ob_orders", set(), max_runs=2) == ["ccc", "aaa"]
+
+
+def test_collapse_versions_keeps_newest_extraction_and_marks_latest() -> None:
+    ts = pd.Timestamp
+    df = pd.DataFrame({
+        "id": ["1", "1", "1", "2"],
+        "updated_at": [ts("2026-01-02", tz="UTC"), ts("2026-01-01", tz="UTC"), ts("2026-01-02", tz="UTC"), ts("2026-01-01", tz="UTC")],
+        "_extracted_at": [ts("2026-01-02", tz="UTC"), ts("2026-01-01", tz="UTC"), ts("2026-01-03", tz="UTC"), ts("2026-01-01", tz="UTC")],
+        "_run_id": ["r2", "r1", "r3", "r1"],
+    })
+
+    versions = collapse_versions(df)
+
+    assert versions["_run_id"].tolist() == ["r1", "r3", "r1"]
+    assert versions.loc[latest_mask(versions), "_run_id"].tolist() == ["r3", "r1"]
@@ -14,4 +14,153 @@ def test_payload_excludes_metadata():
 def test_payload_hash_is_sha256_of_payload_string():
     out = build_payload_and_hash(pd.DataFrame([{"id":1, "status":"done"}]))
     s = out.payload[0]
-    assert out.payload_hash[0] == hashlib.sha256(s.encode("utf-8")).hexdigest()
+    assert out.payload_hash[0] == hashlib.sha256(s.encode("utf-8")).digest()
+
+def _mixed_frame():
+    import datetime as dt
+    import numpy as np
+
+    return pd.DataFrame({
+        "id": pd.array(["a", None, 'q"ü%\n'], dtype="string"),
+        "customer_id": pd.array([1, None, 3], dtype="Int32"),
+        "total_amount": [1.5, np.nan, np.inf],
+        "weight": [0.1, 1e16, -0.0],
+        "flag": [True, False, True],
+        "updated_at": pd.to_datetime(["2026-01-01T00:00:00Z", None, "2026-01-01T00:00:00.5Z"], utc=True, format="ISO8601"),
+        "naive_at": pd.to_datetime(["2026-01-01T00:00:00", "2026-01-02T03:04:05.000007", None], format="ISO8601"),
+        "po_date": [dt.date(2026, 1, 2), None, dt.date(2026, 1, 2)],
+        "status": pd.Categorical(["NEW", None, "DONE"]),
+        "lines": [np.array([{"sku": "A", "qty": 1}], dtype=object), None, []],
+        "mixed": ["s", 1, True],
+        "_run_id": "r1",
+    })
+
+def test_payload_golden():
+    out = build_payload_and_hash(_mixed_frame())
+    assert out.payload.tolist() == [
+        '{"customer_id":1,"flag":true,"id":"a","lines_json":"[{\\"sku\\": \\"A\\", \\"qty\\": 1}]","mixed":"s",'
+        '"naive_at":"2026-01-01T00:00:00","po_date":"2026-01-02","status":"NEW","total_amount":1.5,'
+        '"updated_at":"2026-01-01T00:00:00+00:00","weight":0.1}',
+        '{"customer_id":null,"flag":false,"id":null,"lines_json":null,"mixed":1,'
+        '"naive_at":"2026-01-02T03:04:05.000007","po_date":null,"status":null,"total_amount":null,'
+        '"updated_at":null,"weight":1e+16}',
+        '{"customer_id":3,"flag":true,"id":"q\\"ü%\\n","lines_json":"[]","mixed":true,'
+        '"naive_at":null,"po_date":"2026-01-02","status":"DONE","total_amount":null,'
+        '"updated_at":"2026-01-01T00:00:00.500000+00:00","weight":-0.0}',
+    ]
+
+def test_columnar_payload_matches_row_reference():
+    from services.staging.app.payload import canonical_lines, payload_json
+
+    df = _mixed_frame()
+    out = build_payload_and_hash(df)
+    df = canonical_lines(df)
+    cols = [c for c in df.columns if not c.startswith("_")]
+    expected = [payload_json({c: r[c] for c in cols}) for r in df.to_dict(orient="records")]
+    assert out.payload.tolist() == expected
+    assert out.payload_hash.tolist() == [hashlib.sha256(s.encode("utf-8")).digest() for s in expected]
+
+def test_columnar_payload_matches_row_reference_on_repeated_values():
+    from services.staging.app.payload import payload_json
+
+    # repeated ints take the factorized path; timestamps span days, the epoch and sub-second values
+    df = pd.DataFrame({
+        "customer_id": pd.array([7, 7, None, -3, 7, -3], dtype="Int64"),
+        "updated_at": pd.to_datetime([
+            "1969-12-31T23:59:59Z", "1970-01-01T00:00:00Z", "2026-03-04T05:06:07.000001Z",
+            None, "2026-03-05T23:59:59Z", "2026-03-04T05:06:07Z",
+        ], utc=True, format="ISO8601"),
+    })
+    out = build_payload_and_hash(df)
+    assert out.payload.tolist() == [payload_json(r) for r in df.to_dict(orient="records")]
+
+def test_payload_of_empty_frame():
+    out = build_payload_and_hash(pd.DataFrame({"id": pd.Series([], dtype="string"), "_run_id": []}))
+    assert out.payload.tolist() == [] and out.payload_hash.tolist() == []
+
+def test_parallel_payload_keeps_row_order():
+    df = pd.concat([_mixed_frame()] * 5, ignore_index=True)
+    df["id"] = pd.array([f"id-{i}" for i in range(len(df))], dtype="string")
+
+    expected = build_payload_and_hash(df)
+    out = build_payload_and_hash(df, workers=2, parallel_min_rows=1)
+
+    assert out.payload.tolist() == expected.payload.tolist()
+    assert out.payload_hash.tolist() == expected.payload_hash.tolist()
+
+def test_payload_hash_algorithms_and_legacy_column():
+    df = pd.DataFrame([{"id": "1", "status": "done"}])
+
+    out = build_payload_and_hash(df, hash_algorithm="blake2b128", legacy_hash_algorithm="sha256")
+
+    s = out.payload[0].encode("utf-8")
+    assert out.payload_hash[0] == hashlib.blake2b(s, digest_size=16).digest()
+    assert out.payload_hash_legacy[0] == hashlib.sha256(s).digest()
+    assert "payload_hash_legacy" not in build_payload_and_hash(df, legacy_hash_algorithm="sha256").columns
+
+def test_payload_hash_rejects_unknown_algorithm():
+    import pytest
+
+    with pytest.raises(ValueError, match="Unsupported hash algorithm"):
+        build_payload_and_hash(pd.DataFrame([{"id": "1"}]), hash_algorithm="md5")
+
+def test_payload_hash_does_not_depend_on_lines_mode(tmp_path):
+    from datetime import datetime, timezone
+    from services.extractor.app.normalize import normalize_rows
+    from services.extractor.app.writer_landing import write_landing
+    from services.staging.app.reader_landing import reader_landing, reader_landing_runs
+
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {"id": "o1", "updated_at": "2026-01-01T00:00:01Z", "lines": [{"line_id": "l1", "sku": "SKU-é", "qty": 2}]},
+        {"id": "o2", "updated_at": "2026-01-01T00:00:02Z", "lines": []},
+        {"id": "o3", "updated_at": "2026-01-01T00:00:03Z", "lines": None},
+    ]
+    for mode in ["json", "nested"]:
+        landed = normalize_rows(rows, "ob_orders", mode, now, now, lines_mode=mode)
+        write_landing(landed, tmp_path, "ob_orders", mode)
+
+    by_json = build_payload_and_hash(reader_landing(tmp_path, "ob_orders", "json"))
+    by_nested = build_payload_and_hash(reader_landing(tmp_path, "ob_orders", "nested"))
+    both = build_payload_and_hash(reader_landing_runs(tmp_path, "ob_orders", ["json", "nested"]))
+
+    assert "lines" not in by_nested.columns
+    assert by_nested["payload"].tolist() == by_json["payload"].tolist()
+    assert by_nested["payload_hash"].tolist() == by_json["payload_hash"].tolist()
+    assert both["payload_hash"].tolist() == by_json["payload_hash"].tolist() * 2
+
+def test_nested_lines_hash_does_not_depend_on_other_rows_of_the_part(tmp_path):
+    from datetime import datetime, timezone
+    from services.extractor.app.normalize import normalize_rows
+    from services.extractor.app.writer_landing import write_landing
+    from services.staging.app.reader_landing import reader_landing
+
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    o2 = {"id": "o2", "updated_at": "2026-01-01T00:00:02Z", "lines": [{"line_id": "l3", "sku": "S", "qty": 2}]}
+    # o1 brings a `note` key and another key order into the part's struct type
+    o1 = {"id": "o1", "updated_at": "2026-01-01T00:00:01Z",
+          "lines": [{"qty": 1, "note": None, "line_id": "l1"}, {"sku": "T", "note": "x", "line_id": "l2", "qty": 3}]}
+    for run_id, rows in [("alone", [o2]), ("shared", [o1, o2]), ("json", [o1, o2])]:
+        mode = "json" if run_id == "json" else "nested"
+        write_landing(normalize_rows(rows, "ob_orders", run_id, now, now, lines_mode=mode), tmp_path, "ob_orders", run_id)
+
+    alone = build_payload_and_hash(reader_landing(tmp_path, "ob_orders", "alone"))
+    shared = build_payload_and_hash(reader_landing(tmp_path, "ob_orders", "shared")).set_index("id")
+    by_json = build_payload_and_hash(reader_landing(tmp_path, "ob_orders", "json")).set_index("id")
+
+    assert json.loads(alone["payload"][0])["lines_json"] == '[{"line_id": "l3", "sku": "S", "qty": 2}]'
+    assert shared.loc["o2", "payload_hash"] == alone["payload_hash"][0]
+    assert shared["payload"].tolist() == by_json.loc[shared.index, "payload"].tolist()
+
+def test_load_config_rejects_xxh128_without_xxhash(monkeypatch):
+    import importlib.util
+    import pytest
+    from services.common.config import load_config
+
+    monkeypatch.setenv("PG_DSN", "postgresql+psycopg2://u:p@localhost:5432/db")
+    monkeypatch.setenv("PAYLOAD_HASH", "xxh128")
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *a: None if name == "xxhash" else find_spec(name, *a))
+
+    with pytest.raises(RuntimeError, match="needs the xxhash package"):
+        load_config()
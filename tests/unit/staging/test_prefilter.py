@@ -0,0 +1,51 @@
+import pandas as pd
+
+from services.staging.app.prefilter import change_masks
+
+
+def _rows(versions: list[tuple[str, str, bytes]]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "id": [v[0] for v in versions],
+        "updated_at": pd.to_datetime([v[1] for v in versions], utc=True),
+        "payload_hash": [v[2] for v in versions],
+    })
+
+
+def test_change_masks_drops_stored_versions_and_keeps_real_changes() -> None:
+    current = _rows([
+        ("aaa", "2026-01-01T10:00:00Z", b"h1"),
+        ("bbb", "2026-01-01T10:00:00Z", b"h1"),
+        ("ccc", "2026-01-01T10:00:00Z", b"h1"),
+    ])
+    df = _rows([
+        ("AAA", "2026-01-01T10:00:00Z", b"h1"),  # already the latest version
+        ("bbb", "2026-01-01T11:00:00Z", b"h2"),  # newer
+        ("ccc", "2026-01-01T09:00:00Z", b"h0"),  # older: history only
+        ("ccc", "2026-01-01T10:00:00Z", b"h9"),  # same updated_at, other payload: history only
+        ("ddd", "2026-01-01T10:00:00Z", b"h1"),  # new id
+    ])
+
+    to_history, to_latest = change_masks(df, current)
+
+    assert to_history.tolist() == [False, True, True, True, True]
+    assert to_latest.tolist() == [False, True, False, False, True]
+
+
+def test_change_masks_matches_legacy_digest() -> None:
+    current = _rows([("aaa", "2026-01-01T10:00:00Z", b"old")])
+    df = _rows([("aaa", "2026-01-01T10:00:00Z", b"new")])
+    df["payload_hash_legacy"] = [b"old"]
+
+    to_history, to_latest = change_masks(df, current)
+
+    assert to_history.tolist() == [False]
+    assert to_latest.tolist() == [False]
+
+
+def test_change_masks_without_stored_rows_keeps_everything() -> None:
+    df = _rows([("aaa", "2026-01-01T10:00:00Z", b"h1")])
+
+    to_history, to_latest = change_masks(df, _rows([]))
+
+    assert to_history.tolist() == [True]
+    assert to_latest.tolist() == [True]
@@ -31,7 +31,7 @@ def test_read_landing_csv_ok(tmp_path: Path) -> None:
         }
     ])
 
-    df = reader_landing(landing_root, entity, run_id)
+    df = reader_landing(landing_root, entity, run_id, allow_unmarked=True)
 
     assert len(df) == 1
     assert "id" in df.columns
@@ -53,7 +53,152 @@ def test_read_landing_missing_required_columns(tmp_path: Path) -> None:
     _write_landing_csv(batch_dir, rows=[{"id": 1, "_run_id": run_id}])
 
     with pytest.raises(ValueError) as e:
-        reader_landing(landing_root, entity, run_id)
+        reader_landing(landing_root, entity, run_id, allow_unmarked=True)
 
     assert "missing columns" in str(e.value).lower()
 
+
+
+def _landing_row(i: int, run_id: str) -> dict:
+    return {
+        "id": i,
+        "updated_at": "2026-01-23T10:00:00Z",
+        "_run_id": run_id,
+        "_extracted_at": "2026-01-23T10:01:00Z",
+        "_watermark_effective": "2026-01-23T09:58:00Z",
+    }
+
+
+def test_read_landing_reads_all_committed_parts(tmp_path: Path) -> None:
+    run_id = "run_multi"
+    landing_root = tmp_path / "data" / "landing"
+    batch_dir = landing_root / "ob_orders" / f"run_id={run_id}"
+    batch_dir.mkdir(parents=True)
+    for i in range(3):
+        pd.DataFrame([_landing_row(i, run_id)]).to_csv(batch_dir / f"part-00{i}.csv", index=False)
+    (batch_dir / "_SUCCESS").write_text("part-000.csv\npart-001.csv\npart-002.csv\n")
+
+    df = reader_landing(landing_root, "ob_orders", run_id)
+
+    assert df["id"].tolist() == ["0", "1", "2"]
+
+
+def test_read_landing_rejects_uncommitted_multi_part_run(tmp_path: Path) -> None:
+    run_id = "run_partial"
+    landing_root = tmp_path / "data" / "landing"
+    batch_dir = landing_root / "ob_orders" / f"run_id={run_id}"
+    batch_dir.mkdir(parents=True)
+    for i in range(2):
+        pd.DataFrame([_landing_row(i, run_id)]).to_csv(batch_dir / f"part-00{i}.csv", index=False)
+
+    with pytest.raises(RuntimeError, match="not committed"):
+        reader_landing(landing_root, "ob_orders", run_id)
+
+
+def test_read_landing_rejects_unmarked_single_part_run_unless_legacy(tmp_path: Path) -> None:
+    # what a streaming run leaves behind when it crashes after its first part
+    run_id = "run_crashed"
+    landing_root = tmp_path / "data" / "landing"
+    batch_dir = landing_root / "ob_orders" / f"run_id={run_id}"
+    batch_dir.mkdir(parents=True)
+    pd.DataFrame([_landing_row(0, run_id)]).to_csv(batch_dir / "part-000.csv", index=False)
+
+    with pytest.raises(RuntimeError, match="not committed"):
+        reader_landing(landing_root, "ob_orders", run_id)
+    assert len(reader_landing(landing_root, "ob_orders", run_id, allow_unmarked=True)) == 1
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "csv", "arrow"])
+def test_read_landing_restores_registry_types(tmp_path: Path, output_format: str) -> None:
+    from datetime import datetime, timezone
+
+    from services.extractor.app.normalize import normalize_rows
+    from services.extractor.app.writer_landing import write_landing
+
+    now = datetime(2026, 1, 23, 10, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "id": f"o{i}",
+            "expected_delivery_date": "2026-01-24",
+            "customer_id": 2000 + i,
+            "status": "NEW" if i % 2 else "READYTOPICK",
+            "created_by": "system",
+            "updated_at": f"2026-01-23T10:00:0{i}Z",
+            "lines": [{"sku": "SKU-1", "qty": i}],
+        }
+        for i in range(3)
+    ]
+    landed = normalize_rows(rows, "ob_orders", "run_types", now, now)
+    write_landing(landed, tmp_path, "ob_orders", "run_types", output_format=output_format)
+
+    df = reader_landing(tmp_path, "ob_orders", "run_types")
+
+    assert isinstance(df["status"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["_run_id"].dtype, pd.CategoricalDtype)
+    assert str(df["customer_id"].dtype) == "Int64"
+    assert str(df["id"].dtype) == "string"
+    assert str(df["updated_at"].dtype) == "datetime64[ns, UTC]"
+    assert df["expected_delivery_date"].tolist() == [landed["expected_delivery_date"].iloc[0]] * 3
+
+
+def _commit_run(landing_root: Path, run_id: str, updated_at: list[str]) -> Path:
+    from services.extractor.app.writer_landing import write_landing
+
+    df = pd.DataFrame({"id": [str(i) for i in range(len(updated_at))], "updated_at": pd.to_datetime(updated_at, utc=True)})
+    df["_run_id"] = run_id
+    df["_extracted_at"] = pd.Timestamp("2026-01-23T10:01:00Z")
+    df["_watermark_effective"] = pd.Timestamp("2026-01-23T09:58:00Z")
+    return write_landing(df if updated_at else pd.DataFrame(), landing_root, "ob_orders", run_id)
+
+
+def test_read_landing_rejects_part_changed_after_commit(tmp_path: Path) -> None:
+    part = _commit_run(tmp_path, "run_a", ["2026-01-01T00:00:00Z"])
+    part.write_bytes(part.read_bytes() + b"garbage")
+
+    with pytest.raises(RuntimeError, match="size mismatch"):
+        reader_landing(tmp_path, "ob_orders", "run_a")
+
+
+def test_select_runs_prunes_by_manifest_without_reading_parts(tmp_path: Path, monkeypatch) -> None:
+    from services.common import manifest
+
+    _commit_run(tmp_path, "run_jan", ["2026-01-01T00:00:00Z", "2026-01-05T00:00:00Z"])
+    _commit_run(tmp_path, "run_feb", ["2026-02-01T00:00:00Z"])
+    _commit_run(tmp_path, "run_empty", [])
+    monkeypatch.setattr(pd, "read_parquet", lambda *a, **k: pytest.fail("data file read"))
+
+    assert manifest.select_runs(tmp_path, "ob_orders") == ["run_feb", "run_jan"]
+    assert manifest.select_runs(tmp_path, "ob_orders", updated_from=pd.Timestamp("2026-01-10T00:00:00Z")) == ["run_feb"]
+    assert manifest.select_runs(tmp_path, "ob_orders", updated_to=pd.Timestamp("2026-01-02T00:00:00Z")) == ["run_jan"]
+    assert "run_empty" in manifest.select_runs(tmp_path, "ob_orders", skip_empty=False)
+
+
+def test_read_landing_runs_projects_columns_across_runs(tmp_path: Path) -> None:
+    from services.staging.app.reader_landing import reader_landing_runs
+
+    _commit_run(tmp_path, "run_a", ["2026-01-01T00:00:00Z", "2026-01-02T00:00:00Z"])
+    _commit_run(tmp_path, "run_b", ["2026-01-03T00:00:00Z"])
+    _commit_run(tmp_path, "run_empty", [])
+
+    df = reader_landing_runs(tmp_path, "ob_orders", ["run_a", "run_empty", "run_b"],
+                             columns=["id", "updated_at", "_run_id", "_extracted_at"])
+
+    assert list(df.columns) == ["id", "updated_at", "_run_id", "_extracted_at"]
+    assert df["_run_id"].astype(str).value_counts().to_dict() == {"run_a": 2, "run_b": 1}
+    assert str(df["updated_at"].dtype) == "datetime64[ns, UTC]"
+    assert isinstance(df["_run_id"].dtype, pd.CategoricalDtype)
+
+
+def test_read_landing_runs_unions_parquet_and_arrow_runs(tmp_path: Path) -> None:
+    from services.extractor.app.writer_landing import write_landing
+    from services.staging.app.reader_landing import reader_landing_runs
+
+    _commit_run(tmp_path, "run_parquet", ["2026-01-01T00:00:00Z"])
+    df = reader_landing(tmp_path, "ob_orders", "run_parquet")
+    df["_run_id"] = "run_arrow"
+    write_landing(df, tmp_path, "ob_orders", "run_arrow", output_format="arrow")
+
+    out = reader_landing_runs(tmp_path, "ob_orders", ["run_parquet", "run_arrow"])
+
+    assert sorted(out["_run_id"].astype(str)) == ["run_arrow", "run_parquet"]
+    assert str(out["updated_at"].dtype) == "datetime64[ns, UTC]"
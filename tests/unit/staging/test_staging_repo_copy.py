@@ -0,0 +1,40 @@
+import pandas as pd
+
+from services.staging.app.staging_repo import STG_COLUMNS, copy_buffer
+
+
+def test_copy_buffer_escapes_text_and_encodes_bytea_and_timestamps() -> None:
+    df = pd.DataFrame({
+        "id": ["550e8400-e29b-41d4-a716-446655440000"],
+        "updated_at": pd.to_datetime(["2026-01-23T10:00:00.5Z"], utc=True),
+        "payload": ['{"note":"a\\tb\\\\c"}'],
+        "payload_hash": [b"\x00\xff"],
+        "_run_id": ["r1\tx"],
+        "_extracted_at": pd.to_datetime(["2026-01-23T10:01:00Z"], utc=True),
+        "_watermark_effective": [None],
+        "status": ["ignored"],
+    })
+
+    line = copy_buffer(df, STG_COLUMNS).read()
+
+    assert line == (
+        "550e8400-e29b-41d4-a716-446655440000\t"
+        "2026-01-23T10:00:00.500000+00\t"
+        '{"note":"a\\\\tb\\\\\\\\c"}\t'
+        "\\\\x00ff\t"
+        "r1\\tx\t"
+        "2026-01-23T10:01:00.000000+00\t"
+        "\\N\n"
+    )
+
+
+def test_copy_buffer_writes_null_for_missing_timestamps() -> None:
+    df = pd.DataFrame({
+        "id": ["a", "b"],
+        "updated_at": pd.to_datetime(["2026-01-23T10:00:00Z", None], utc=True),
+    })
+
+    assert copy_buffer(df, ["id", "updated_at"]).read().splitlines() == [
+        "a\t2026-01-23T10:00:00.000000+00",
+        "b\t\\N",
+    ]